@@ -24,15 +24,17 @@ def handle_chat(req: ChatRequest) -> ChatResponse:
     )
     if m:
         prefix = m.group(1)
-        data = list_valves_by_prefix(prefix=prefix, limit=200)
+        # jen první stránka (50 tagů); total říká, kolik jich je celkem
+        data = list_valves_by_prefix(prefix=prefix, limit=50)
         if data.get("count", 0) > 0:
-            items = list(data["items"].items())[:50]
+            items = list(data["items"].items())
             lines = []
             for tag, io in items:
                 e = ", ".join([f"{i['io_type']} {i['address']}" for i in io.get("inputs", [])]) or "-"
                 a = ", ".join([f"{o['io_type']} {o['address']}" for o in io.get("outputs", [])]) or "-"
                 lines.append(f"{tag}: Vstupy [{e}] | Výstupy [{a}]")
-            tail = "" if data["count"] <= 50 else f"\n… zobrazeno 50 z {data['count']} tagů."
+            total = data.get("total", data["count"])
+            tail = "" if total <= len(items) else f"\n… zobrazeno {len(items)} z {total} tagů."
             return ChatResponse(status="ok", answer="\n".join(lines) + tail, tools_used=["list_valves_by_prefix"])
 
     # 1) Kontrola chybějících zdrojů
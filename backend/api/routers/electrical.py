@@ -0,0 +1,116 @@
+# backend/api/routers/electrical.py
+import json
+import os
+import threading
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, Optional
+
+from backend.services.tools import ROOT, iter_electrical_drawing
+from backend.services.drawing_index import get_drawing_index, norm_text, page_words_live, rel_path, transform_rect
+from backend.services.render import get_render_service
+
+router = APIRouter(prefix="/electrical", tags=["electrical"])
+
+
+def _encode(ev: Dict[str, Any], fmt: str) -> str:
+    data = json.dumps(ev, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {ev.get('type', 'message')}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+@router.get("/search/stream")
+async def search_stream(
+    request: Request,
+    tag: str = Query(..., min_length=1),
+    folder: Optional[str] = Query(None, description="Kořenová složka s PDF (default data/electrical)"),
+    max_files: int = Query(200, ge=1, le=5000),
+    max_pages_per_file: int = Query(300, ge=1, le=5000),
+    stop_after_matches: int = Query(20, ge=1, le=1000),
+    progress_every: int = Query(10, ge=1, le=1000, description="Progress událost po N souborech"),
+    fmt: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+):
+    """
+    Streamované hledání TAGu ve výkresech: každý nález se pošle hned, jak je nalezen
+    (nejdřív z indexu, pak z živého scanu), průběžně i progress (files_scanned/total).
+    Formát NDJSON (default) nebo SSE (`fmt=sse`). Odpojení klienta scan ukončí.
+    """
+    cancel = threading.Event()
+    gen = iter_electrical_drawing(tag, folder, max_files, max_pages_per_file,
+                                  stop_after_matches, progress_every, cancel)
+
+    async def body():
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                # generátor blokuje (SQLite/pool) → mimo event loop
+                ev = await run_in_threadpool(next, gen, None)
+                if ev is None:
+                    break
+                yield _encode(ev, fmt)
+        finally:
+            cancel.set()
+            try:
+                gen.close()
+            except ValueError:
+                # generátor ještě běží ve vlákně – skončí sám díky `cancel`
+                pass
+
+    media = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/words")
+def page_words(
+    file: str = Query(..., description="Relativní cesta k PDF (např. data/electrical/Schrank1.pdf)"),
+    page: int = Query(1, ge=1),
+    tag: Optional[str] = Query(None, description="Jen obdélníky výskytů tagu"),
+    limit: int = Query(5000, ge=1, le=100000, description="Max. slov bez `tag`"),
+):
+    """
+    Souřadnice pro overlay ve frontendu (PDF body, počátek vlevo nahoře; pixel = bod × scale
+    náhledu). S `tag` vrací obdélníky výskytů, jinak slova strany s obdélníky.
+    Obdélníky jsou v souřadnicích náhledu – u otočené strany (`rotation`) už otočené,
+    stejně jako `width`/`height`.
+    Primárně z indexu výkresů, pro neindexované/změněné PDF se vytěží živě.
+    """
+    pdf_path = os.path.normpath(os.path.join(ROOT, file))
+    if not pdf_path.startswith(ROOT):
+        raise HTTPException(status_code=400, detail="Invalid path")
+    if not os.path.isfile(pdf_path) or not pdf_path.lower().endswith(".pdf"):
+        raise HTTPException(status_code=404, detail="Soubor nenalezen")
+
+    rel = rel_path(pdf_path)
+    pw, source = get_drawing_index().page_words(rel, page - 1), "index"
+    if pw is None:
+        pw, source = page_words_live(pdf_path, page - 1), "live"
+    if pw is None:
+        raise HTTPException(status_code=404, detail="Strana mimo rozsah nebo bez textové vrstvy")
+
+    try:
+        rotation, m = get_render_service().page_rotation(pdf_path, page - 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF chyba: {e}")
+
+    def _rect(r):
+        # slova jsou v neotočené straně, náhled je otočený
+        return [round(v, 2) for v in (transform_rect(r, m) if rotation else r)]
+
+    out: Dict[str, Any] = {"file": rel, "page": page, "width": pw.width,
+                           "height": pw.height, "rotation": rotation, "source": source}
+    if tag:
+        rects = pw.find(norm_text(tag))
+        out.update(tag=tag, count=len(rects), rects=[_rect(r) for r in rects])
+    else:
+        n = min(len(pw.words), limit)
+        out.update(count=len(pw.words), truncated=n < len(pw.words), words=[
+            {"text": pw.words[i], "rect": _rect(pw.rect(i))} for i in range(n)
+        ])
+    return out
@@ -1,7 +1,14 @@
 from fastapi import APIRouter
 
+from backend.services.embeddings import get_embedding_service
+
 router = APIRouter()
 
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+@router.get("/health/embeddings")
+def embeddings_stats():
+    """Embedding služba: requesty, tokeny, cena, hity cache, latence p50/p95."""
+    return {"status": "ok", **get_embedding_service().stats()}
@@ -0,0 +1,42 @@
+# backend/api/routers/io_list.py
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+from backend.services.tools import MAX_BATCH_TAGS, find_valves, list_valves_by_prefix, search_io
+
+router = APIRouter(prefix="/io", tags=["io"])
+
+
+class BatchBody(BaseModel):
+    tags: List[str]
+
+
+@router.post("/batch")
+def io_batch(body: BatchBody) -> Dict[str, Any]:
+    """I/O adresy pro seznam tagů v jednom požadavku; výsledky klíčované tagem."""
+    if len(body.tags) > MAX_BATCH_TAGS:
+        raise HTTPException(status_code=413, detail=f"Maximálně {MAX_BATCH_TAGS} tagů na dávku")
+    res = find_valves(body.tags)
+    if res.get("error"):
+        raise HTTPException(status_code=400, detail=res["error"])
+    return {"status": "ok", **res}
+
+
+@router.get("/search")
+def io_search(
+    q: str = Query(..., min_length=1, description="Část tagu nebo popisu, např. 'VA05' / 'Spülventil'"),
+    limit: int = Query(20, ge=1, le=500),
+) -> Dict[str, Any]:
+    """Fulltext (substring + překlepy) nad I/O listem."""
+    return search_io(q, limit)
+
+
+@router.get("/valves")
+def io_valves(
+    prefix: str = Query(..., min_length=1, description="Začátek TAGu, např. '91002'"),
+    limit: int = Query(200, ge=1, le=1000, description="Počet TAGů na stránku"),
+    cursor: Optional[str] = Query(None, description="next_cursor z předchozí stránky"),
+) -> Dict[str, Any]:
+    """Stránkovaný seznam ventilů pro prefix (total + next_cursor)."""
+    return list_valves_by_prefix(prefix, limit, cursor)
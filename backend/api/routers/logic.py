@@ -1,8 +1,10 @@
 # backend/api/routers/logic.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import os, sqlite3
+import os
 import numpy as np
+from backend.services.embeddings import get_embedding_service
+from backend.services.iodb import get_pool
 
 # --- FAISS ---
 try:
@@ -35,8 +37,8 @@ class AskReq(BaseModel):
 def embed_one(q: str) -> np.ndarray:
     if _client is None:
         raise HTTPException(500, "OpenAI klient není inicializovaný (chybí OPENAI_API_KEY?).")
-    res = _client.embeddings.create(model=EMB_MODEL, input=[q])
-    x = np.array(res.data[0].embedding, dtype=np.float32)[None, :]
+    # LRU dotazů + perzistentní cache (services/embeddings.py)
+    x = get_embedding_service().embed_query(q, EMB_MODEL, client=_client)[None, :]
     if faiss is None:
         return x
     faiss.normalize_L2(x)  # cosine
@@ -46,11 +48,8 @@ def embed_one(q: str) -> np.ndarray:
 def fetch_fb_texts(ids):
     if not ids:
         return []
-    con = sqlite3.connect(SQLITE)
-    cur = con.cursor()
     q = f"SELECT id,name,body FROM fb_blocks WHERE id IN ({','.join('?'*len(ids))})"
-    rows = cur.execute(q, ids).fetchall()
-    con.close()
+    rows = get_pool(SQLITE).query_tuples(q, ids)
     mp = {rid: (name, body) for (rid, name, body) in rows}
     return [(rid, mp[rid][0], mp[rid][1]) for rid in ids if rid in mp]
 
@@ -1,9 +1,10 @@
 # backend/api/routers/pids.py
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Literal, Optional
 from backend.rag.pid_rag import PIDRAG
+from backend.rag.ocr_cache import get_ocr_cache
+from backend.services.http_cache import CACHE_PDF, cached_file_response
 import os, re
 
 router = APIRouter(prefix="/pids", tags=["pids"])
@@ -19,12 +20,18 @@ ALLOWED_EXTS = {".pdf"}
 class SearchBody(BaseModel):
     query: str = Field(..., min_length=2)
     top_k: int = 5
+    mode: Optional[Literal["auto", "hybrid", "dense", "lexical"]] = Field(
+        None, description="auto = tag → jen BM25 (bez embeddingu), jinak hybrid; bez = PID_SEARCH_MODE")
 
 class TagBody(BaseModel):
     tag: str = Field(..., min_length=1)
 
 class ReindexBody(BaseModel):
     force_ocr: bool = False
+    full: bool = Field(False, description="Přeindexovat vše (jinak jen přidané/změněné/odebrané PDF)")
+
+class OCRCachePurgeBody(BaseModel):
+    unused_days: Optional[float] = Field(None, ge=0, description="Jen záznamy nepoužité N dní; bez = vše")
 
 class OpenByQueryBody(BaseModel):
     text: str = Field(..., min_length=2, description="Volná věta, např. 'načti PID 91000 TSW CIP'")
@@ -116,7 +123,7 @@ def _search_by_tokens(text: str) -> List[str]:
 @router.post("/reindex")
 def reindex(body: ReindexBody = ReindexBody()) -> Dict[str, Any]:
     try:
-        stats = rag.reindex(force_ocr=bool(body.force_ocr))
+        stats = rag.reindex(force_ocr=bool(body.force_ocr), full=bool(body.full))
         return {"status": "ok", **stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -124,7 +131,7 @@ def reindex(body: ReindexBody = ReindexBody()) -> Dict[str, Any]:
 @router.post("/search")
 def search(body: SearchBody) -> Dict[str, Any]:
     try:
-        results = rag.search(body.query, body.top_k)
+        results = rag.search(body.query, body.top_k, body.mode)
         return {"status": "ok", "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -137,21 +144,37 @@ def find_tag(body: TagBody) -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/ocr_cache/stats")
+def ocr_cache_stats() -> Dict[str, Any]:
+    """Statistiky OCR cache (hity/missy, počet záznamů, velikost, verze Tesseractu)."""
+    try:
+        return {"status": "ok", **get_ocr_cache().stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ocr_cache/purge")
+def ocr_cache_purge(body: OCRCachePurgeBody = OCRCachePurgeBody()) -> Dict[str, Any]:
+    try:
+        n = get_ocr_cache().purge(body.unused_days)
+        return {"status": "ok", "purged": n}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/ocr_preview")
 def ocr_preview(page: int = Query(1, ge=1)) -> Dict[str, Any]:
     """
     Vrátí čistý OCR text z vybrané stránky PID PDF (pro debug).
     """
-    rag._lazy_load()
-    if not rag.meta:
+    meta = rag._lazy_load().meta
+    if not meta:
         return {"status": "empty_index"}
 
-    if page > len(rag.meta):
-        page = len(rag.meta)
+    if page > len(meta):
+        page = len(meta)
 
-    text = rag.meta[page - 1].get("text", "")
-    ocr_flag = rag.meta[page - 1].get("ocr", False)
-    tags = rag.meta[page - 1].get("tags", [])
+    text = meta[page - 1].get("text", "")
+    ocr_flag = meta[page - 1].get("ocr", False)
+    tags = meta[page - 1].get("tags", [])
     return {
         "status": "ok",
         "page": page,
@@ -164,13 +187,14 @@ def ocr_preview(page: int = Query(1, ge=1)) -> Dict[str, Any]:
 #   SERVÍROVÁNÍ PDF
 # =======================
 @router.get("/file/{name}")
-def get_pid_file(name: str):
+def get_pid_file(name: str, request: Request):
     """
     Stáhne/zobrazí konkrétní PDF podle názvu (bezpečně).
     Podporuje:
       /pids/file/91000_TSW_CIP_-_PID
       /pids/file/91000 TSW CIP - PID
       /pids/file/91000_TSW_CIP_-_PID.pdf
+    ETag/Last-Modified (opakované zobrazení = 304) a Range (PDF viewer načítá po částech).
     """
     # Přímá shoda
     fn = _match_exact_or_none(name)
@@ -187,7 +211,8 @@ def get_pid_file(name: str):
     if not os.path.isfile(path):
         raise HTTPException(status_code=404, detail=f"Soubor neexistuje: {fn}")
 
-    return FileResponse(path, media_type="application/pdf", filename=fn)
+    return cached_file_response(request.headers, path, media_type="application/pdf",
+                                cache_control=CACHE_PDF, filename=fn)
 
 @router.post("/open_by_query")
 def open_by_query(body: OpenByQueryBody) -> Dict[str, Any]:
@@ -1,9 +1,18 @@
 # backend/api/routers/preview.py
-import os, hashlib
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
-from typing import Optional
+import asyncio
+import os
+import urllib.parse as _up
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from typing import List, Optional, Sequence, Tuple
 from backend.services.tools import ELECTRICAL_DIR, ROOT
+from backend.services.drawing_index import get_drawing_index, norm_text, rel_path, transform_rect
+from backend.services.preview_cache import MEDIA_TYPES, get_preview_cache
+from backend.services.render import PageOutOfRange, get_render_service
+from backend.services.http_cache import CACHE_PREVIEW, cached_file_response, is_not_modified, not_modified_response
+from backend.services.tiles import TILE_SIZE, levels, max_zoom, tile_clip
 try:
     import fitz  # PyMuPDF
 except Exception:
@@ -11,8 +20,8 @@ except Exception:
 
 router = APIRouter(tags=["preview"])
 
-CACHE_DIR = os.path.join(ROOT, "data", "previews")
-os.makedirs(CACHE_DIR, exist_ok=True)
+# zvýšit při změně vzhledu náhledu (barva/tloušťka zvýraznění …) → staré položky cache se nepoužijí
+RENDER_VERSION = 3
 
 def _safe_join(base: str, rel: str) -> str:
     # zamezí ../ průnikům; povolujeme jen cesty relativní vůči ROOT
@@ -21,8 +30,49 @@ def _safe_join(base: str, rel: str) -> str:
         raise HTTPException(status_code=400, detail="Invalid path")
     return p
 
+HIGHLIGHT_RGB = (255, 0, 0)  # červená
+HIGHLIGHT_PX = 2              # tloušťka rámečku v pixelech
+
+
+def tag_rects(pg, rel: str, tag: str) -> List[Sequence[float]]:
+    """
+    Obdélníky výskytů tagu na stránce (PDF body, souřadnice náhledu po rotaci).
+    Primárně z předpočítaných souřadnic slov v indexu výkresů; když strana
+    v (aktuálním) indexu není, fallback na pg.search_for().
+    """
+    pw = get_drawing_index().page_words(rel, pg.number)
+    if pw is not None:
+        rects = pw.find(norm_text(tag))
+    else:
+        rects = [tuple(r) for r in pg.search_for(tag, flags=fitz.TEXT_DEHYPHENATE | fitz.TEXT_PRESERVE_LIGATURES)]
+    if not pg.rotation:
+        return rects
+    # slova jsou v neotočené straně, pixmapa je otočená (/Rotate 90 u ležatých listů)
+    m = tuple(pg.rotation_matrix)
+    return [transform_rect(r, m) for r in rects]
+
+
+def draw_rects(pix, rects: List[Sequence[float]], scale: float,
+               color=HIGHLIGHT_RGB, width: int = HIGHLIGHT_PX) -> None:
+    """Nakreslí rámečky přímo do pixmapy (bez anotací a druhého renderu)."""
+    # souřadnice pixmapy jsou absolutní (u výřezu `clip` nezačínají v 0,0);
+    # hrany se ořežou na pixmapu → rámeček přes více dlaždic nemá falešné okraje
+    bounds = pix.irect
+    for x0, y0, x1, y1 in rects:
+        # okraj kolem textu, aby rámeček nepřekrýval písmena
+        a, b = int(x0 * scale) - width, int(y0 * scale) - width
+        c, d = int(x1 * scale + 0.999) + width, int(y1 * scale + 0.999) + width
+        for edge in ((a, b, c, b + width), (a, d - width, c, d),
+                     (a, b, a + width, d), (c - width, b, c, d)):
+            r = fitz.IRect(*edge) & bounds
+            if r.is_empty:
+                continue
+            pix.set_rect(r, color)
+
+
 @router.get("/preview/electrical")
-def preview_electrical(
+async def preview_electrical(
+    request: Request,
     file: str = Query(..., description="Relativní cesta k PDF (např. data/electrical/Schrank1.pdf)"),
     page: int = Query(1, ge=1),
     tag: Optional[str] = Query(None, description="Volitelně zvýrazní výskyt tagu"),
@@ -36,61 +86,174 @@ def preview_electrical(
     if not os.path.isfile(pdf_path) or not pdf_path.lower().endswith(".pdf"):
         raise HTTPException(status_code=404, detail="Soubor nenalezen")
 
-    # cache klíč
-    key_src = f"{pdf_path}|p{page}|tag:{tag or ''}|s{scale}|{fmt}"
-    key = hashlib.sha1(key_src.encode("utf-8")).hexdigest()
-    out_path = os.path.join(CACHE_DIR, f"{key}.{ 'jpg' if fmt in ('jpg','jpeg') else 'png'}")
-    if os.path.exists(out_path):
-        return FileResponse(out_path, media_type=f"image/{'jpeg' if fmt!='png' else 'png'}")
+    # cache klíč – včetně mtime/velikosti PDF (změněný výkres = nové náhledy)
+    st = os.stat(pdf_path)
+    ext = "jpg" if fmt in ("jpg", "jpeg") else "png"
+    rel = rel_path(pdf_path)
+    cache = get_preview_cache()
+    key = cache.key("electrical", RENDER_VERSION, rel, st.st_mtime_ns, st.st_size,
+                    page, norm_text(tag or ""), scale, ext)
+    # klíč je obsahově adresovaný (mtime PDF, parametry) → poslouží i jako silný ETag
+    etag = f'"{key}"'
+    if is_not_modified(request.headers, etag):
+        return not_modified_response({"etag": etag, "cache-control": CACHE_PREVIEW})
+    cached = await run_in_threadpool(cache.get, key)
+    if cached:
+        resp = _serve_cached(request, cached, etag)
+        if resp is not None:
+            return resp
 
+    def decorate(pg, pix):
+        # zvýraznění tagu se kreslí rovnou do pixmapy (jediný render)
+        if tag:
+            rects = tag_rects(pg, rel, tag)
+            if rects:
+                draw_rects(pix, rects, scale)
+
+    def job() -> Tuple[str, bytes]:
+        data = renderer.render_page(pdf_path, page - 1, scale, ext, decorate=decorate)
+        # atomický zápis do cache (temp + rename), případně evikce
+        return cache.put(key, data, ext), data
+
+    renderer = get_render_service()
     try:
-        doc = fitz.open(pdf_path)
+        # souběžné požadavky na stejný náhled sdílí jeden render
+        out_path, data = await asyncio.wrap_future(renderer.submit(key, job))
+    except PageOutOfRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF chyba: {e}")
 
-    if page < 1 or page > len(doc):
-        doc.close()
-        raise HTTPException(status_code=400, detail=f"Strana mimo rozsah 1..{len(doc)}")
+    return _serve_rendered(request, out_path, data, ext, etag)
+
 
+def _serve_cached(request: Request, path: str, etag: str):
+    """
+    Odpověď ze souboru v cache; None když soubor mezitím zmizel (evikce
+    jiným requestem/procesem mezi get() a odesláním) → volající vyrenderuje znovu.
+    """
     try:
-        pg = doc.load_page(page - 1)
-        # vykreslení
-        mat = fitz.Matrix(scale, scale)
-        pix = pg.get_pixmap(matrix=mat, alpha=False)
+        return cached_file_response(request.headers, path, MEDIA_TYPES[path.rsplit(".", 1)[1]],
+                                    CACHE_PREVIEW, etag=etag)
+    except FileNotFoundError:
+        return None
+
+
+def _serve_rendered(request: Request, path: str, data: bytes, ext: str, etag: str) -> Response:
+    """Právě vyrenderovaný náhled; když ho evikce už stihla smazat, pošle se z paměti."""
+    resp = _serve_cached(request, path, etag)
+    if resp is None:
+        resp = Response(content=data, media_type=MEDIA_TYPES[ext],
+                        headers={"etag": etag, "cache-control": CACHE_PREVIEW})
+    return resp
+
+
+def _pdf_or_404(file: str) -> str:
+    pdf_path = _safe_join(ROOT, file)
+    if not os.path.isfile(pdf_path) or not pdf_path.lower().endswith(".pdf"):
+        raise HTTPException(status_code=404, detail="Soubor nenalezen")
+    return pdf_path
+
+
+@lru_cache(maxsize=4096)
+def _page_size(pdf_path: str, mtime_ns: int, size: int, page: int) -> Tuple[float, float]:
+    # mtime/velikost v klíči → změněné PDF se změří znovu
+    return get_render_service().page_size(pdf_path, page)
+
 
-        # zvýraznění tagu (pokud je)
+async def _sized_page(pdf_path: str, page: int) -> Tuple[os.stat_result, float, float]:
+    if fitz is None:
+        raise HTTPException(status_code=500, detail="PyMuPDF (pymupdf) není nainstalováno")
+    st = os.stat(pdf_path)
+    try:
+        w, h = await run_in_threadpool(_page_size, pdf_path, st.st_mtime_ns, st.st_size, page - 1)
+    except PageOutOfRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF chyba: {e}")
+    return st, w, h
+
+
+@router.get("/preview/tiles/{file:path}/{page:int}/manifest.json")
+async def preview_tiles_manifest(file: str, page: int,
+                                 fmt: str = Query("jpg", pattern="^(png|jpg|jpeg)$")):
+    """
+    Popis dlaždicové pyramidy strany: rozměr v PDF bodech, velikost dlaždice
+    a pro každou úroveň z měřítko, rozměr v px a počet sloupců/řádků.
+    z=0 = celá strana v jedné dlaždici (rychlý přehled).
+    """
+    pdf_path = _pdf_or_404(file)
+    _, w, h = await _sized_page(pdf_path, page)
+    ext = "jpg" if fmt in ("jpg", "jpeg") else "png"
+    base = f"/preview/tiles/{_up.quote(rel_path(pdf_path), safe='/')}/{page}"
+    return {
+        "file": rel_path(pdf_path),
+        "page": page,
+        "width": w,
+        "height": h,
+        "tile_size": TILE_SIZE,
+        "format": ext,
+        "min_zoom": 0,
+        "max_zoom": max_zoom(w, h),
+        "levels": levels(w, h),
+        "tile_url": base + "/{z}/{x}/{y}" + f"?fmt={ext}",
+        "overview_url": base + f"/0/0/0?fmt={ext}",
+    }
+
+
+@router.get("/preview/tiles/{file:path}/{page:int}/{z:int}/{x:int}/{y:int}")
+async def preview_tile(
+    request: Request,
+    file: str, page: int, z: int, x: int, y: int,
+    tag: Optional[str] = Query(None, description="Volitelně zvýrazní výskyt tagu"),
+    fmt: str = Query("jpg", pattern="^(png|jpg|jpeg)$"),
+):
+    """Jedna dlaždice TILE_SIZE×TILE_SIZE (krajní menší) renderovaná přes clip; cache jako náhledy."""
+    pdf_path = _pdf_or_404(file)
+    st, w, h = await _sized_page(pdf_path, page)
+    tc = tile_clip(w, h, z, x, y)
+    if tc is None:
+        raise HTTPException(status_code=404, detail="Dlaždice mimo pyramidu")
+    scale, clip = tc
+
+    ext = "jpg" if fmt in ("jpg", "jpeg") else "png"
+    rel = rel_path(pdf_path)
+    cache = get_preview_cache()
+    key = cache.key("tile", RENDER_VERSION, rel, st.st_mtime_ns, st.st_size,
+                    page, TILE_SIZE, z, x, y, norm_text(tag or ""), ext)
+    # klíč je obsahově adresovaný (mtime PDF, parametry) → poslouží i jako silný ETag
+    etag = f'"{key}"'
+    if is_not_modified(request.headers, etag):
+        return not_modified_response({"etag": etag, "cache-control": CACHE_PREVIEW})
+    cached = await run_in_threadpool(cache.get, key)
+    if cached:
+        resp = _serve_cached(request, cached, etag)
+        if resp is not None:
+            return resp
+
+    def decorate(pg, pix):
         if tag:
-            # hledání obdélníků – case-insensitive
-            rects = pg.search_for(tag, flags=fitz.TEXT_DEHYPHENATE | fitz.TEXT_PRESERVE_LIGATURES)
+            rects = tag_rects(pg, rel, tag)
             if rects:
-                # vytvoříme dočasnou anotaci, ať ji umí pixmap zohlednit
-                for r in rects:
-                    annot = pg.add_rect_annot(r)
-                    annot.set_colors(stroke=(1, 0, 0))  # červená
-                    annot.set_border(width=2)
-                    annot.update()
-                # znovu vyrenderujeme stránku se zvýrazněním
-                pix = pg.get_pixmap(matrix=mat, alpha=False)
-                # uklid: odstraníme anotace (neukládáme do PDF, jsou jen v paměti)
-                for a in pg.annots() or []:
-                    pg.delete_annot(a)
-
-        # uložení
-        if fmt == "png":
-            pix.save(out_path, output="png")
-        else:
-            # PyMuPDF ukládá do PNG; pro JPG použijeme PIL, když je k dispozici
-            try:
-                from PIL import Image
-                import io
-                buf = pix.tobytes("png")
-                im = Image.open(io.BytesIO(buf)).convert("RGB")
-                im.save(out_path, format="JPEG", quality=90)
-            except Exception:
-                pix.save(out_path, output="png")
-                out_path = out_path.rsplit(".",1)[0] + ".png"
-
-    finally:
-        doc.close()
-
-    return FileResponse(out_path, media_type=f"image/{'jpeg' if fmt!='png' else 'png'}")
+                draw_rects(pix, rects, scale)
+
+    def job() -> Tuple[str, bytes]:
+        data = renderer.render_page(pdf_path, page - 1, scale, ext, clip=clip, decorate=decorate)
+        return cache.put(key, data, ext), data
+
+    renderer = get_render_service()
+    try:
+        out_path, data = await asyncio.wrap_future(renderer.submit(key, job))
+    except PageOutOfRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF chyba: {e}")
+    return _serve_rendered(request, out_path, data, ext, etag)
+
+
+@router.get("/preview/cache/stats")
+def preview_cache_stats():
+    """Čítače cache náhledů (hits/misses/puts/evictions) a obsazení vůči rozpočtu + renderer."""
+    out = get_preview_cache().stats()
+    out["render"] = dict(get_render_service().stats)
+    return out
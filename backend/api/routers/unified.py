@@ -4,11 +4,10 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, Any, Dict
-import os, re, json, numpy as np, sqlite3, inspect
+import os, re, json, numpy as np, inspect
 
 # ---- config / paths ----
 LOGIC_URL_PATH = "/logic/ask"   # historický koment, voláme přímo funkci -> bez HTTP hopu
-SQLITE = os.getenv("IO_DB_PATH", "/app/data/io.db")
 HWF_IDX = os.getenv("RAG_HWF_INDEX_PATH", "/app/data/faiss_hwf.index")
 HWF_MAP = os.getenv("RAG_HWF_STORE_PATH", "/app/data/hwf_store.npy")
 
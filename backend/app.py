@@ -3,7 +3,6 @@ import os
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 # ==== Import routerů ====
 # Použijeme vždy relativní importy, aby fungovalo spolehlivě jak v Dockeru, tak při lokálním běhu.
@@ -16,7 +15,10 @@ from .api.routers import (
     logic,
     unified,
     hwf,
+    io_list,
+    electrical,
 )
+from .services.http_cache import CACHE_DATA, CACHE_STATIC_PREVIEW, CachedStaticFiles
 
 # ==== FastAPI app ====
 app = FastAPI(title="Edmund Chat API")
@@ -42,11 +44,13 @@ PREVIEWS_DIR = DATA_DIR / "previews"                   # .../data/previews
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 PREVIEWS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Silný ETag z obsahu + Last-Modified → opakované zobrazení = 304; Range pro PDF viewer.
 # 1) /data/... (doporučeno pro FE – kompatibilní s relativními cestami "data/...")
-app.mount("/data", StaticFiles(directory=str(DATA_DIR)), name="data")
+app.mount("/data", CachedStaticFiles(directory=str(DATA_DIR), cache_control=CACHE_DATA), name="data")
 
 # 2) /previews/... (alias – pokud FE posílá rovnou tato URL)
-app.mount("/previews", StaticFiles(directory=str(PREVIEWS_DIR)), name="previews")
+app.mount("/previews", CachedStaticFiles(directory=str(PREVIEWS_DIR), cache_control=CACHE_STATIC_PREVIEW),
+          name="previews")
 
 # ==== Routers ====
 app.include_router(health.router)
@@ -57,3 +61,5 @@ app.include_router(pids.router)
 app.include_router(logic.router)
 app.include_router(unified.router)
 app.include_router(hwf.router)
+app.include_router(io_list.router)
+app.include_router(electrical.router)
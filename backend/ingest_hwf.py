@@ -1,5 +1,5 @@
 # backend/ingest_hwf.py
-import os, glob, json, sqlite3
+import os, sys, glob, json, sqlite3
 from pathlib import Path
 from xml.etree import ElementTree as ET
 from typing import List, Dict
@@ -11,19 +11,15 @@ SQLITE = Path("/app/data/io.db")              # můžeš nechat i MSSQL přes SQ
 FAISS_VEC_PATH = Path("/app/data/faiss_hwf.index")
 FAISS_STORE_PATH = Path("/app/data/hwf_store.npy")
 
-# --- Embedding (OpenAI) ---
-import openai
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# --- Embedding (OpenAI přes sdílenou službu: cache + dávky) ---
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)  # spuštění jako `python backend/ingest_hwf.py`
+from backend.services.embeddings import get_embedding_service  # noqa: E402
 
 def embed(texts: List[str]) -> np.ndarray:
-    # sloučíme do batchů kvůli rychlosti
-    embs = []
-    B = 96
-    for i in range(0, len(texts), B):
-        chunk = texts[i:i+B]
-        res = openai.embeddings.create(model="text-embedding-3-large", input=chunk)
-        embs.extend([d.embedding for d in res.data])
-    return np.array(embs, dtype=np.float32)
+    # nezměněné FB bloky se berou z cache, zbytek po dávkách souběžně
+    return get_embedding_service().embed(texts, "text-embedding-3-large")
 
 # --- SQL init ---
 def init_db():
@@ -0,0 +1,222 @@
+# backend/rag/bm25.py
+"""
+BM25 (lexikální) index nad texty stran P&ID a chunků dokumentů + fúze s FAISS.
+
+Ukládá se jako colstore tabulka s různě dlouhými sloupci (vše mmap):
+  term     (V)      slovník, seřazený → term se hledá binárně
+  start    (V + 1)  offsety posting listů
+  doc      (P)      řádek dokumentu (= řádek tabulky stran / chunků)
+  tf       (P)      četnost termu v dokumentu
+  doc_len  (N)      délka dokumentu v tokenech
+extra: {"version", "docs", "avgdl", "source"}; source = generace colstore
+tabulky, ke které řádky patří → nesouhlasí-li (rozepsaný reindex), index se
+nepoužije a hledá se jen přes FAISS.
+
+Tokenizace: malá písmena bez diakritiky, úseky písmen/číslic; složené kódy
+(V-102, 91201-PU-001, 91000_TSW) dají části i spojený tvar → dotaz "V102"
+najde "V-102" a naopak.
+
+Režimy hledání (retrieve):
+  dense   jen FAISS,
+  lexical jen BM25 – bez volání embedding API,
+  hybrid  FAISS + BM25 přes reciprocal-rank fusion (RRF),
+  auto    dotaz jako tag / číslo zařízení (is_tag_query) → lexical
+          (bez výsledku → dense), jinak hybrid.
+"""
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import colstore
+
+BM25_VERSION = 1
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# kolik kandidátů z každé větve jde do fúze
+FUSION_DEPTH = int(os.getenv("RAG_FUSION_DEPTH", "50"))
+MODES = ("auto", "hybrid", "dense", "lexical")
+
+Hits = List[Tuple[int, float]]   # (řádek, skóre) seřazené od nejlepšího
+
+_WORD = re.compile(r"[^\W_]+(?:[-_/][^\W_]+)*")
+_SEP = re.compile(r"[-_/]")
+# slovo dotazu, které vypadá jako tag / číslo zařízení: obsahuje číslici
+_TAG_WORD = re.compile(r"(?=.*\d)[^\W_]+(?:[-_/][^\W_]+)*")
+
+
+def _fold(text: str) -> str:
+    text = text.lower()
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for m in _WORD.finditer(_fold(text)):
+        parts = _SEP.split(m.group(0))
+        out.extend(parts)
+        if len(parts) > 1:
+            out.append("".join(parts))
+    return out
+
+
+def is_tag_query(query: str, max_words: int = 4) -> bool:
+    """"91201PU001", "V-102", "TT101 TT102" → True; volná věta → False."""
+    words = [w.strip(".,;:?!()[]\"'") for w in query.split()]
+    return 0 < len(words) <= max_words and all(len(w) >= 3 and _TAG_WORD.fullmatch(w) for w in words)
+
+
+def write_bm25(path: str, texts: Iterable[str], source: str) -> str:
+    """Postaví index nad texty (řádek = pořadí) a zapíše ho jako novou generaci."""
+    vocab: Dict[str, int] = {}
+    term_parts: List[np.ndarray] = []
+    tf_parts: List[np.ndarray] = []
+    doc_parts: List[np.ndarray] = []
+    lens: List[int] = []
+    for d, text in enumerate(texts):
+        counts = Counter(tokenize(text or ""))
+        lens.append(sum(counts.values()))
+        if not counts:
+            continue
+        n = len(counts)
+        term_parts.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), dtype="int64", count=n))
+        tf_parts.append(np.fromiter(counts.values(), dtype="int64", count=n))
+        doc_parts.append(np.full(n, d, dtype="int32"))
+
+    terms = sorted(vocab)
+    remap = np.empty(len(terms), dtype="int64")
+    for new, t in enumerate(terms):
+        remap[vocab[t]] = new
+    if term_parts:
+        tid = remap[np.concatenate(term_parts)]
+        order = np.argsort(tid, kind="stable")        # v rámci termu zůstanou dokumenty vzestupně
+        doc = np.concatenate(doc_parts)[order]
+        tf = np.minimum(np.concatenate(tf_parts)[order], np.iinfo("uint16").max).astype("uint16")
+        df = np.bincount(tid, minlength=len(terms))
+    else:
+        doc, tf, df = np.zeros(0, "int32"), np.zeros(0, "uint16"), np.zeros(0, "int64")
+    start = np.zeros(len(terms) + 1, dtype="int64")
+    np.cumsum(df, out=start[1:])
+    doc_len = np.array(lens, dtype="int32")
+
+    return colstore.write_table(path, {
+        "term": terms,
+        "start": start,
+        "doc": doc,
+        "tf": tf,
+        "doc_len": doc_len,
+    }, extra={
+        "version": BM25_VERSION,
+        "docs": len(lens),
+        "avgdl": float(doc_len.mean()) if len(lens) else 0.0,
+        "source": source,
+    }, ragged=True)
+
+
+class BM25Index:
+    """Namapovaný BM25 index; skóruje se vektorově přes posting listy dotazových termů."""
+
+    def __init__(self, table: colstore.Table):
+        self.table = table
+        self.docs = int(table.extra.get("docs", 0))
+        self.avgdl = float(table.extra.get("avgdl") or 1.0)
+        self.source: Optional[str] = table.extra.get("source")
+        self._start = table.array("start")
+        self._doc = table.array("doc")
+        self._tf = table.array("tf")
+        self._len = table.array("doc_len")
+        self._terms = table.length("term")
+
+    def _find(self, term: str) -> int:
+        lo, hi = 0, self._terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.table.text("term", mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._terms and self.table.text("term", lo) == term else -1
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.docs, dtype="float32")
+        for term in set(tokenize(query)):
+            t = self._find(term)
+            if t < 0:
+                continue
+            a, b = int(self._start[t]), int(self._start[t + 1])
+            df = b - a
+            idf = math.log(1.0 + (self.docs - df + 0.5) / (df + 0.5))
+            docs = self._doc[a:b]
+            tf = self._tf[a:b].astype("float32")
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._len[docs] / self.avgdl)
+            scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> Hits:
+        if k <= 0 or not self.docs:
+            return []
+        s = self.scores(query)
+        hit = np.flatnonzero(s)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-s[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-s[hit], kind="stable")]
+        return [(int(i), float(s[i])) for i in hit]
+
+
+def open_bm25(path: str, source: Optional[str] = None) -> Optional[BM25Index]:
+    """Aktuální index, nebo None (chybí, jiná verze, nepatří ke generaci `source`)."""
+    table = colstore.open_table(path)
+    if table is None or table.extra.get("version") != BM25_VERSION:
+        return None
+    idx = BM25Index(table)
+    if source is not None and idx.source != source:
+        return None
+    return idx
+
+
+def rrf(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> Hits:
+    """Reciprocal-rank fusion: skóre = Σ 1 / (k + pořadí)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: -x[1])
+
+
+def resolve_mode(mode: Optional[str], query: str, has_lexical: bool) -> str:
+    mode = (mode or "auto").lower()
+    if mode not in MODES:
+        raise ValueError(f"Neznámý režim hledání: {mode} (povoleno: {', '.join(MODES)})")
+    if not has_lexical:
+        return "dense"
+    if mode == "auto":
+        return "lexical" if is_tag_query(query) else "hybrid"
+    return mode
+
+
+def retrieve(query: str, k: int, mode: Optional[str], lexical: Optional[BM25Index],
+             dense: Callable[[int], Hits], depth: int = FUSION_DEPTH) -> Tuple[str, Hits]:
+    """
+    Společná logika hledání pro PIDRAG i RagStore. dense(n) = top n z FAISS
+    (volá embedding); vrací (použitý režim, [(řádek, skóre)]).
+    """
+    auto = (mode or "auto").lower() == "auto"
+    used = resolve_mode(mode, query, lexical is not None)
+    if used == "lexical":
+        hits = lexical.search(query, k)
+        if hits or not auto:
+            return used, hits
+        used = "dense"
+    if used == "dense":
+        return used, dense(k)[:k]
+    n = max(k, depth)
+    fused = rrf([[r for r, _ in dense(n)], [r for r, _ in lexical.search(query, n)]])
+    return used, fused[:k]
@@ -0,0 +1,211 @@
+# backend/rag/colstore.py
+"""
+Sloupcové úložiště metadat RAG indexů (mmap), náhrada meta.json / store.npy.
+
+Adresář tabulky:
+  <path>/CURRENT                  jméno aktuální generace (zapisuje se atomicky jako poslední)
+  <path>/g<ns>/manifest.json      {"version", "rows", "columns": {jméno: druh}, "extra": {...}}
+  <path>/g<ns>/<sloupec>.npy      pevná šířka (int32/int64/uint8/float32 …), np.load(mmap_mode="r")
+  <path>/g<ns>/<sloupec>.off.npy  textový sloupec: offsety int64 (rows + 1)
+  <path>/g<ns>/<sloupec>.blob     … a UTF-8 data všech řádků za sebou (mmap)
+
+ragged=True → sloupce smí mít různou délku ("rows" = délka prvního), např.
+slovník a posting listy BM25 v jedné generaci.
+
+Otevření = přečtení manifestu a namapování souborů → skoro okamžité; do paměti
+se dostanou jen stránky, na které se skutečně sáhne. Zápis jde do nové generace,
+CURRENT se přepne přes os.replace a staré generace se smažou (už otevřené mmapy
+čtenářů na Linuxu zůstávají platné).
+"""
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+COLSTORE_VERSION = 1
+TEXT = "text"
+
+Column = Union[np.ndarray, Sequence[str]]
+
+
+def _atomic_write_bytes(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=".colstore.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _current(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, "CURRENT"), "r", encoding="utf-8") as f:
+            gen = f.read().strip()
+    except OSError:
+        return None
+    return gen or None
+
+
+def table_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) souboru CURRENT; None = tabulka neexistuje."""
+    try:
+        st = os.stat(os.path.join(path, "CURRENT"))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def exists(path: str) -> bool:
+    return _current(path) is not None
+
+
+def write_table(path: str, columns: Dict[str, Column], extra: Optional[Dict[str, Any]] = None,
+                ragged: bool = False) -> str:
+    """
+    Zapíše novou generaci tabulky. np.ndarray → sloupec pevné šířky,
+    jinak sekvence str → textový sloupec. Všechny sloupce musí mít stejně
+    řádků (kromě ragged=True). Vrací jméno generace.
+    """
+    rows = None
+    for name, col in columns.items():
+        if rows is None:
+            rows = len(col)
+        elif len(col) != rows and not ragged:
+            raise ValueError(f"Sloupec {name}: {len(col)} řádků, čekáno {rows}")
+    rows = rows or 0
+
+    os.makedirs(path, exist_ok=True)
+    gen = f"g{time.time_ns()}"
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=path)
+    try:
+        kinds: Dict[str, str] = {}
+        for name, col in columns.items():
+            if isinstance(col, np.ndarray):
+                arr = np.ascontiguousarray(col)
+                np.save(os.path.join(tmp, f"{name}.npy"), arr, allow_pickle=False)
+                kinds[name] = str(arr.dtype)
+                continue
+            offsets = np.zeros(len(col) + 1, dtype="int64")
+            with open(os.path.join(tmp, f"{name}.blob"), "wb") as f:
+                pos = 0
+                for i, text in enumerate(col):
+                    data = (text or "").encode("utf-8")
+                    f.write(data)
+                    pos += len(data)
+                    offsets[i + 1] = pos
+            np.save(os.path.join(tmp, f"{name}.off.npy"), offsets, allow_pickle=False)
+            kinds[name] = TEXT
+        manifest = {"version": COLSTORE_VERSION, "rows": rows, "columns": kinds, "extra": extra or {}}
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, gen))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    _atomic_write_bytes(os.path.join(path, "CURRENT"), gen.encode("utf-8"))
+    for name in os.listdir(path):
+        if name != gen and (name.startswith("g") or name.startswith(".tmp-")):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    return gen
+
+
+def remove_table(path: str) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class Table:
+    """Namapovaná generace tabulky; řádky se dekódují až při přístupu."""
+
+    def __init__(self, path: str, gen: str):
+        self.path = path
+        self.gen = gen
+        base = os.path.join(path, gen)
+        with open(os.path.join(base, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != COLSTORE_VERSION:
+            raise ValueError(f"Nepodporovaná verze colstore: {manifest.get('version')}")
+        self.rows: int = int(manifest["rows"])
+        self.kinds: Dict[str, str] = manifest["columns"]
+        self.extra: Dict[str, Any] = manifest.get("extra", {})
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._offsets: Dict[str, np.ndarray] = {}
+        self._blobs: Dict[str, Union[mmap.mmap, bytes]] = {}
+        for name, kind in self.kinds.items():
+            if kind != TEXT:
+                self._arrays[name] = np.load(os.path.join(base, f"{name}.npy"), mmap_mode="r")
+                continue
+            self._offsets[name] = np.load(os.path.join(base, f"{name}.off.npy"), mmap_mode="r")
+            with open(os.path.join(base, f"{name}.blob"), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                # mmap nulové délky neexistuje
+                self._blobs[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def has(self, name: str) -> bool:
+        return name in self.kinds
+
+    def array(self, name: str) -> np.ndarray:
+        """Sloupec pevné šířky (read-only memmap)."""
+        return self._arrays[name]
+
+    def length(self, name: str) -> int:
+        """Počet řádků sloupce (liší se od rows jen u ragged tabulek)."""
+        if name in self._offsets:
+            return len(self._offsets[name]) - 1
+        return len(self._arrays[name])
+
+    def text(self, name: str, i: int) -> str:
+        off = self._offsets[name]
+        a, b = int(off[i]), int(off[i + 1])
+        return bytes(self._blobs[name][a:b]).decode("utf-8")
+
+    def texts(self, name: str) -> Iterator[str]:
+        for i in range(self.length(name)):
+            yield self.text(name, i)
+
+
+class TextColumn:
+    """Textový sloupec jako read-only sekvence str (len, [i], iterace)."""
+
+    def __init__(self, table: Table, name: str):
+        self.table = table
+        self.name = name
+
+    def __len__(self) -> int:
+        return self.table.length(self.name)
+
+    def __getitem__(self, i: int) -> str:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self.table.text(self.name, i)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.table.texts(self.name)
+
+
+def open_table(path: str) -> Optional[Table]:
+    """Aktuální generace, nebo None (neexistuje / právě se přepíná → zkusit znovu)."""
+    gen = _current(path)
+    if gen is None:
+        return None
+    try:
+        return Table(path, gen)
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,248 @@
+# backend/rag/ocr_cache.py
+"""
+Obsahově adresovaný cache výsledků OCR stran P&ID (SQLite).
+
+Klíč = sha256(otisk obsahu strany | nastavení OCR (dpi, jazyky, upscale,
+threshold, median, …) | verze Tesseractu | verze OCR pipeline). Otisk obsahu strany = syrová data
+content streamů + všech obrázků/form XObjectů strany + rozměr a rotace
+(PyMuPDF) → přejmenované nebo znovu uložené PDF se stejným obsahem cache
+využije, změna výkresu ho zneplatní.
+
+Uložený výsledek: text zvolený OCR (A/B), tagy a hodnoty, se kterými vznikl
+(vítězná strategie, použité jazyky). Ty v klíči nejsou – profil dokumentu se
+během reindexu učí, takže by se další běh s naučenou strategií netrefil.
+Reindex nezměněných výkresů tak přeskočí rasterizaci i Tesseract a jde rovnou
+na embedding.
+
+Profily dokumentů (adaptivní OCR): pro každé PDF vítězná strategie a detekovaný
+jazyk → další reindex (i nové revize výkresu) je zkusí první.
+
+Statistiky a úklid: GET /pids/ocr_cache/stats, POST /pids/ocr_cache/purge,
+nebo scripts/ocr_cache.py.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    fitz = None  # type: ignore
+
+import pytesseract
+
+PID_OCR_CACHE_PATH = os.getenv(
+    "PID_OCR_CACHE_PATH", os.path.join(os.getenv("PIDS_DIR", "/app/data/pids"), "ocr_cache.db")
+)
+PID_OCR_CACHE_ENABLE = os.getenv("PID_OCR_CACHE_ENABLE", "true").lower() == "true"
+# zvýšit při změně OCR logiky (předzpracování, výběr textu) → staré záznamy se nepoužijí
+OCR_PIPELINE_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr (
+  key       TEXT PRIMARY KEY,
+  text      TEXT NOT NULL,
+  tags      TEXT NOT NULL,          -- JSON seznam
+  strategy  TEXT,                   -- vítězná strategie (adaptivní OCR)
+  langs     TEXT,                   -- jazyky, se kterými OCR běželo
+  created   REAL NOT NULL,
+  last_used REAL NOT NULL,
+  hits      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_last_used ON ocr(last_used);
+CREATE TABLE IF NOT EXISTS profiles (
+  doc       TEXT PRIMARY KEY,       -- cesta k PDF
+  strategy  TEXT,
+  langs     TEXT,
+  updated   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+  name  TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("hits", "misses", "puts", "purged")
+
+_TESS_VERSION: Optional[str] = None
+
+
+def tesseract_version() -> Optional[str]:
+    """Verze Tesseractu (jednou na proces); None když binárka chybí."""
+    global _TESS_VERSION
+    if _TESS_VERSION is None:
+        try:
+            _TESS_VERSION = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _TESS_VERSION = ""
+    return _TESS_VERSION or None
+
+
+def page_fingerprints(pdf_path: str, pages: List[int]) -> Dict[int, str]:
+    """0-index strana → sha256 obsahu (content streamy + XObjecty + geometrie)."""
+    out: Dict[int, str] = {}
+    if fitz is None or not pages:
+        return out
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception:
+        return out
+    try:
+        for i in pages:
+            try:
+                pg = doc.load_page(i)
+                h = hashlib.sha256()
+                h.update(f"{tuple(pg.mediabox)}|{pg.rotation}".encode())
+                for xref in pg.get_contents():
+                    h.update(doc.xref_stream_raw(xref) or b"")
+                xrefs = {img[0] for img in pg.get_images(full=True)}
+                xrefs.update(x[0] for x in pg.get_xobjects())
+                for xref in sorted(xrefs):
+                    h.update(b"|x|")
+                    h.update(doc.xref_stream_raw(xref) or b"")
+                out[i] = h.hexdigest()
+            except Exception:
+                continue
+    finally:
+        doc.close()
+    return out
+
+
+class OCRCache:
+    """SQLite cache OCR výsledků stran; bezpečný pro více vláken i procesů."""
+
+    def __init__(self, db_path: str = PID_OCR_CACHE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                  check_same_thread=False)
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+            con.executescript(SCHEMA)
+            cols = {r[1] for r in con.execute("PRAGMA table_info(ocr)")}
+            for col in ("strategy", "langs"):
+                if col not in cols:  # cache ze starší verze
+                    con.execute(f"ALTER TABLE ocr ADD COLUMN {col} TEXT")
+            con.executemany("INSERT OR IGNORE INTO counters(name, value) VALUES(?, 0)",
+                            [(c,) for c in COUNTERS])
+            self._local.con = con
+        return con
+
+    def _bump(self, con: sqlite3.Connection, name: str, n: int = 1) -> None:
+        if n:
+            con.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    @staticmethod
+    def key(fingerprint: str, settings: Any, tess_version: str) -> str:
+        # jen obsah + nastavení + verze; naučené jazyky / strategie jsou hodnoty záznamu
+        parts = (fingerprint, settings.dpi, settings.langs, settings.upscale, settings.threshold,
+                 settings.median, settings.adaptive, settings.min_conf, settings.min_words,
+                 settings.detect_lang, settings.tiled, settings.mem_budget_mb, settings.tile_overlap,
+                 tess_version, OCR_PIPELINE_VERSION)
+        return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[str, List[str], Optional[str], Optional[str]]]:
+        """key → (text, tags, strategy, langs) pro nalezené klíče; zaznamená hity/missy."""
+        if not keys:
+            return {}
+        con = self._con()
+        found: Dict[str, Tuple[str, List[str], Optional[str], Optional[str]]] = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            q = f"SELECT key, text, tags, strategy, langs FROM ocr WHERE key IN ({','.join('?' * len(chunk))})"
+            for k, text, tags, strategy, langs in con.execute(q, chunk):
+                found[k] = (text, json.loads(tags), strategy, langs)
+        con.execute("BEGIN")
+        if found:
+            now = time.time()
+            con.executemany("UPDATE ocr SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                            [(now, k) for k in found])
+        self._bump(con, "hits", len(found))
+        self._bump(con, "misses", len(keys) - len(found))
+        con.execute("COMMIT")
+        return found
+
+    def put(self, key: str, text: str, tags: List[str], strategy: Optional[str] = None,
+            langs: Optional[str] = None) -> None:
+        now = time.time()
+        con = self._con()
+        con.execute("BEGIN")
+        con.execute(
+            "INSERT OR REPLACE INTO ocr(key, text, tags, strategy, langs, created, last_used, hits) "
+            "VALUES(?,?,?,?,?,?,?,0)",
+            (key, text, json.dumps(tags, ensure_ascii=False), strategy or None, langs or None, now, now),
+        )
+        self._bump(con, "puts")
+        con.execute("COMMIT")
+
+    def get_profile(self, doc: str) -> Optional[Dict[str, Any]]:
+        row = self._con().execute("SELECT strategy, langs FROM profiles WHERE doc = ?", (doc,)).fetchone()
+        return {"strategy": row[0], "langs": row[1]} if row else None
+
+    def put_profile(self, doc: str, strategy: Optional[str], langs: Optional[str]) -> None:
+        self._con().execute(
+            "INSERT OR REPLACE INTO profiles(doc, strategy, langs, updated) VALUES(?,?,?,?)",
+            (doc, strategy, langs, time.time()),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        con = self._con()
+        out: Dict[str, Any] = dict(con.execute("SELECT name, value FROM counters").fetchall())
+        n, size, oldest = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(text) + LENGTH(tags)), 0), MIN(last_used) FROM ocr"
+        ).fetchone()
+        lookups = out.get("hits", 0) + out.get("misses", 0)
+        strategies = dict(con.execute(
+            "SELECT COALESCE(strategy, ''), COUNT(*) FROM profiles GROUP BY strategy").fetchall())
+        out.update(
+            profiles=sum(strategies.values()),
+            profile_strategies=strategies,
+            path=self.db_path,
+            entries=n,
+            text_bytes=size,
+            db_bytes=os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            oldest_last_used=oldest,
+            hit_ratio=round(out.get("hits", 0) / lookups, 4) if lookups else None,
+            tesseract_version=tesseract_version(),
+            pipeline_version=OCR_PIPELINE_VERSION,
+        )
+        return out
+
+    def purge(self, unused_days: Optional[float] = None) -> int:
+        """Smaže vše, nebo jen záznamy nepoužité `unused_days` dní. Vrací počet smazaných."""
+        con = self._con()
+        con.execute("BEGIN")
+        if unused_days is None:
+            n = con.execute("DELETE FROM ocr").rowcount
+        else:
+            cutoff = time.time() - unused_days * 86400
+            n = con.execute("DELETE FROM ocr WHERE last_used < ?", (cutoff,)).rowcount
+        self._bump(con, "purged", n)
+        con.execute("COMMIT")
+        if unused_days is None:
+            con.execute("VACUUM")
+        return n
+
+
+_CACHE: Optional[OCRCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """Sdílená instance (jedna na proces)."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = OCRCache()
+    return _CACHE
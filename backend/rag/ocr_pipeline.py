@@ -0,0 +1,775 @@
+# backend/rag/ocr_pipeline.py
+"""
+Paralelní OCR pipeline pro PIDRAG.reindex.
+
+- text z PDF (pypdf); stránky bez textu (nebo vše při force_ocr) jdou do OCR,
+- rasterizace jednou na PDF po dávkách souvislých stran (PID_OCR_RASTER_BATCH):
+  jedno volání poppleru na dávku, obrázky jen na disk (paths_only) → RAM drží
+  nanejvýš ~2× workers stran,
+- OCR stran běží v ProcessPoolExecutor (PID_OCR_WORKERS, default počet jader);
+  Tesseract ve workerech jede s OMP_THREAD_LIMIT=1, ať se procesy nepřetahují o jádra,
+- hotové stránky se průběžně generují (iter_pages) → indexer může embedovat,
+  zatímco OCR dalších stran pokračuje,
+- výsledky OCR se ukládají do obsahově adresovaného cache (ocr_cache) →
+  nezměněné strany se při dalším reindexu vůbec nerasterizují,
+- adaptivní OCR (PID_OCR_ADAPTIVE): kandidáty (předzpracování × psm) se hodnotí
+  podle konfidence slov z image_to_data a počtu nalezených tagů, po prvním
+  dostatečně kvalitním průchodu se končí; vítězná strategie a jazyk se učí
+  pro každý dokument (profil v ocr_cache) a zkouší se u dalších stran první,
+- jazyk stran se detekuje jednou na PDF (z textové vrstvy, jinak z prvního OCR)
+  místo pevného eng+ces+deu,
+- velkoformátové výkresy (A0 při 600 dpi) se OCRují po dlaždicích s překryvem
+  (PID_OCR_TILED, PID_OCR_MEM_BUDGET_MB): každá dlaždice se renderuje přes
+  PyMuPDF clip rovnou do odstínů šedi a běží jako samostatná úloha v poolu;
+  slova se slučují podle souřadnic – slovo patří dlaždici, v jejímž jádru
+  (bez překryvu) leží jeho střed → žádné duplicity, špička paměti na úlohu
+  je omezena rozpočtem bez ohledu na velikost listu,
+- stats: stránky, OCR stránky, cache hity, čas, pages/sec.
+
+Funkce pro OCR obrázku jsou na úrovni modulu (picklovatelné pro worker procesy)
+a řídí je OCRSettings.
+"""
+
+import os
+import re
+import io
+import math
+import time
+import shutil
+import tempfile
+import multiprocessing
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pypdf import PdfReader
+
+# OCR stack
+from pdf2image import convert_from_path
+import pytesseract
+from PIL import Image, ImageOps, ImageFilter
+
+try:
+    import fitz  # PyMuPDF – dlaždicové renderování
+except Exception:
+    fitz = None  # type: ignore
+
+from .ocr_cache import PID_OCR_CACHE_ENABLE, OCRCache, get_ocr_cache, page_fingerprints, tesseract_version
+
+PID_OCR_WORKERS = int(os.getenv("PID_OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+PID_OCR_RASTER_BATCH = int(os.getenv("PID_OCR_RASTER_BATCH", "8"))
+
+# konfigurace Tesseractu – bere se nejdelší (nejbohatší) výstup
+TESSERACT_CONFIGS = (
+    "--oem 1 --psm 6",    # jeden blok textu
+    "--oem 1 --psm 11",   # rozptýlený text
+    "--oem 1 --psm 4",    # sloupec(y) textu
+)
+
+# adaptivní OCR: strategie "předzpracování/psm" v pořadí podle typické úspěšnosti
+# na výkresech (bin = preprocess_image, gray = jen odstíny šedi)
+OCR_STRATEGIES = ("bin/11", "gray/11", "bin/6", "gray/6", "bin/4", "gray/4")
+TAG_SCORE_WEIGHT = 25.0   # jeden nalezený tag ≈ 25 znaků jistého textu
+
+Box = Tuple[float, float, float, float, str]   # x0, y0, x1, y1, slovo
+Rect = Tuple[float, float, float, float]
+
+# jazyky rozpoznatelné z textu (diakritika + častá slova); "eng" je vždy základ
+LANG_HINTS = {
+    "ces": (set("ěščřžůťďňĚŠČŘŽŮŤĎŇ"),
+            {"a", "na", "je", "se", "pro", "do", "ze", "od", "nebo", "čerpadlo", "ventil", "nádrž"}),
+    "deu": (set("äöüßÄÖÜ"),
+            {"der", "die", "das", "und", "mit", "für", "von", "nicht", "pumpe", "behälter"}),
+}
+
+# rozšířený regex pro čísla + písmena + čísla (např. 91201PU001)
+TAG_PATTERNS = [
+    re.compile(p, flags=re.IGNORECASE) for p in (
+        r"\bV-?\d{2,4}\b",                 # V102, V-102
+        r"\bP-?\d{2,4}\b",                 # P301, P-301
+        r"\bT[IT]C?-?\d{2,4}\b",           # TT101, TIC-201
+        r"\bPI-?\d{2,4}\b",                # PI102
+        r"\bFI-?\d{2,4}\b",                # FI302
+        r"\bLT-?\d{2,4}\b",                # LT101
+        r"\b[0-9]{4,6}[A-Z]{2,3}[0-9]{2,4}\b",  # 91201PU001 apod.
+    )
+]
+
+
+@dataclass(frozen=True)
+class OCRSettings:
+    langs: str = "eng+ces+deu"
+    dpi: int = 300
+    enable: bool = True
+    max_pages: Optional[int] = None
+    upscale: float = 1.8      # ~1.5–2.5 obvykle pomáhá
+    threshold: int = 180      # 0–255, vyšší = více bílého
+    median: int = 3           # 0 = vypnuto; jinak velikost filtru (3/5)
+    adaptive: bool = True     # False = všech 6 průchodů, vítězí nejdelší text
+    min_conf: float = 70.0    # průměrná konfidence slov (0–100) pro předčasný konec
+    min_words: int = 8        # … a aspoň tolik slov, nebo jeden tag
+    detect_lang: bool = True  # jazyk jednou na PDF místo celého `langs`
+    tiled: str = "auto"       # auto = dlaždice, když strana přesáhne rozpočet; always / off
+    mem_budget_mb: int = 512  # strop paměti na jednu OCR úlohu (stranu / dlaždici)
+    tile_overlap: float = 48.0  # překryv dlaždic v bodech PDF (> nejdelší tag)
+
+    @classmethod
+    def from_env(cls) -> "OCRSettings":
+        return cls(
+            langs=os.getenv("PID_OCR_LANGS", "eng+ces+deu"),
+            dpi=int(os.getenv("PID_OCR_DPI", "300")),
+            enable=os.getenv("PID_OCR_ENABLE", "true").lower() == "true",
+            max_pages=int(os.getenv("PID_OCR_MAX_PAGES", "0")) if os.getenv("PID_OCR_MAX_PAGES") else None,
+            upscale=max(1.0, float(os.getenv("PID_OCR_UPSCALE", "1.8"))),
+            threshold=max(0, min(255, int(os.getenv("PID_OCR_THRESHOLD", "180")))),
+            median=max(0, int(os.getenv("PID_OCR_MEDIAN", "3"))),
+            adaptive=os.getenv("PID_OCR_ADAPTIVE", "true").lower() == "true",
+            min_conf=float(os.getenv("PID_OCR_MIN_CONF", "70")),
+            min_words=int(os.getenv("PID_OCR_MIN_WORDS", "8")),
+            detect_lang=os.getenv("PID_OCR_DETECT_LANG", "true").lower() == "true",
+            tiled=os.getenv("PID_OCR_TILED", "auto").lower(),
+            mem_budget_mb=max(16, int(os.getenv("PID_OCR_MEM_BUDGET_MB", "512"))),
+            tile_overlap=max(0.0, float(os.getenv("PID_OCR_TILE_OVERLAP", "48"))),
+        )
+
+
+# ===== Tagy =====
+def extract_tags(text: str) -> List[str]:
+    tags: List[str] = []
+    for pat in TAG_PATTERNS:
+        tags.extend(pat.findall(text))
+    return sorted({t.upper().replace("--", "-") for t in tags})
+
+
+# ===== Předzpracování obrazu pro OCR =====
+def preprocess_image(im: Image.Image, s: OCRSettings) -> Image.Image:
+    """
+    Kroky:
+    - převod do odstínů šedi,
+    - upscale (bicubic),
+    - autokontrast,
+    - volitelně median filter na odšum,
+    - pevný threshold do binární podoby.
+    """
+    out = im.convert("L")
+
+    if s.upscale and s.upscale > 1.0:
+        w, h = out.size
+        out = out.resize((int(w * s.upscale), int(h * s.upscale)), Image.BICUBIC)
+
+    # autokontrast (zvedne separaci znak/pozadí)
+    out = ImageOps.autocontrast(out)
+
+    if s.median and s.median >= 3 and s.median % 2 == 1:
+        try:
+            out = out.filter(ImageFilter.MedianFilter(s.median))
+        except Exception:
+            pass
+
+    # threshold (binarizace)
+    thr = s.threshold
+    return out.point(lambda x: 255 if x >= thr else 0).convert("L")
+
+
+def tesseract_try(image: Image.Image, langs: str) -> str:
+    """Zkus více konfigurací Tesseractu – vezmi nejdelší (nejbohatší) čitelný výstup."""
+    candidates = []
+    for cfg in TESSERACT_CONFIGS:
+        try:
+            txt = " ".join(pytesseract.image_to_string(image, lang=langs, config=cfg).split())
+            if txt:
+                candidates.append(txt)
+        except Exception:
+            pass
+    return max(candidates, key=len) if candidates else ""
+
+
+def ocr_image_exhaustive(im: Image.Image, s: OCRSettings, langs: Optional[str] = None) -> str:
+    """Dvě cesty: (A) heavy preprocess, (B) jen grayscale (fallback) – vezme delší."""
+    langs = langs or s.langs
+    try:
+        txt_a = tesseract_try(preprocess_image(im, s), langs)
+    except Exception:
+        txt_a = ""
+    try:
+        txt_b = tesseract_try(im.convert("L"), langs)
+    except Exception:
+        txt_b = ""
+    return txt_a if len(txt_a) >= len(txt_b) else txt_b
+
+
+# ===== Adaptivní OCR =====
+class Candidate(NamedTuple):
+    strategy: str
+    text: str
+    conf: float        # průměrná konfidence slov vážená délkou (0–100)
+    words: int
+    tags: int
+    score: float
+    boxes: Optional[List[Box]] = None   # jen na vyžádání (dlaždice), v px obrázku
+
+
+class OCRResult(NamedTuple):
+    text: str
+    strategy: str      # vítězná strategie ("" = bez výsledku, "exhaustive" = 6 průchodů)
+    langs: str
+    passes: int        # počet volání Tesseractu
+    conf: float
+    early: bool        # skončilo se před vyčerpáním strategií
+    boxes: Optional[List[Box]] = None   # slova se souřadnicemi (dlaždice: v bodech strany)
+
+
+def tesseract_data(image: Image.Image, langs: str, psm: str, strategy: str = "",
+                   boxes: bool = False) -> Candidate:
+    """Jeden průchod přes image_to_data → text + konfidence + skóre (+ rámečky slov)."""
+    data = pytesseract.image_to_data(image, lang=langs, config=f"--oem 1 --psm {psm}",
+                                     output_type=pytesseract.Output.DICT)
+    words: List[str] = []
+    rects: List[Box] = []
+    weighted = chars = sure = 0.0
+    n = len(data.get("text", []))
+    for k, (w, c) in enumerate(zip(data.get("text", []), data.get("conf", []))):
+        w = (w or "").strip()
+        try:
+            c = float(c)
+        except (TypeError, ValueError):
+            c = -1.0
+        if not w or c < 0:
+            continue
+        words.append(w)
+        if boxes and len(data.get("left", [])) == n:
+            x, y = float(data["left"][k]), float(data["top"][k])
+            rects.append((x, y, x + float(data["width"][k]), y + float(data["height"][k]), w))
+        weighted += c * len(w)
+        chars += len(w)
+        if c >= 50:
+            sure += len(w) * c / 100.0
+    text = " ".join(" ".join(words).split())
+    conf = weighted / chars if chars else 0.0
+    n_tags = len(extract_tags(text)) if text else 0
+    return Candidate(strategy, text, conf, len(words), n_tags, sure + TAG_SCORE_WEIGHT * n_tags,
+                     rects if boxes else None)
+
+
+def good_enough(c: Candidate, s: OCRSettings) -> bool:
+    return c.conf >= s.min_conf and (c.tags >= 1 or c.words >= s.min_words)
+
+
+def strategy_order(prefer: Optional[str] = None) -> List[str]:
+    order = list(OCR_STRATEGIES)
+    if prefer in order:
+        order.remove(prefer)
+        order.insert(0, prefer)
+    return order
+
+
+def ocr_image_adaptive(im: Image.Image, s: OCRSettings, langs: Optional[str] = None,
+                       prefer: Optional[str] = None, boxes: bool = False) -> OCRResult:
+    """
+    Strategie postupně (naučená `prefer` první); konec po prvním kandidátovi
+    nad prahem kvality (good_enough), jinak vítězí nejvyšší skóre.
+    boxes=True → OCRResult.boxes v px vstupního obrázku.
+    """
+    langs = langs or s.langs
+    images: Dict[str, Image.Image] = {}
+    best: Optional[Candidate] = None
+    passes = 0
+    order = strategy_order(prefer)
+
+    def _result(c: Candidate, early: bool) -> OCRResult:
+        rects = None
+        if boxes:
+            # preprocess zvětšuje (upscale) → zpět do souřadnic vstupu
+            f = images[c.strategy.split("/")[0]].size[0] / float(im.size[0] or 1)
+            rects = [(x0 / f, y0 / f, x1 / f, y1 / f, w) for x0, y0, x1, y1, w in c.boxes or []]
+        return OCRResult(c.text, c.strategy, langs, passes, round(c.conf, 1), early, rects)
+
+    for n, strategy in enumerate(order):
+        prep, psm = strategy.split("/")
+        try:
+            if prep not in images:
+                if prep == "bin":
+                    images[prep] = preprocess_image(im, s)
+                else:
+                    images[prep] = im if im.mode == "L" else im.convert("L")
+            passes += 1
+            c = tesseract_data(images[prep], langs, psm, strategy, boxes)
+        except Exception:
+            continue
+        if best is None or c.score > best.score:
+            best = c
+        if good_enough(c, s):
+            return _result(c, n < len(order) - 1)
+    if best is None:
+        return OCRResult("", "", langs, passes, 0.0, False, [] if boxes else None)
+    return _result(best, False)
+
+
+def ocr_image(im: Image.Image, s: OCRSettings) -> str:
+    """Text strany podle nastavení (adaptivně, nebo všech 6 průchodů)."""
+    if s.adaptive:
+        return ocr_image_adaptive(im, s).text
+    return ocr_image_exhaustive(im, s)
+
+
+def detect_langs(text: str, configured: str, min_letters: int = 40) -> Optional[str]:
+    """
+    Jazyk(y) pro Tesseract odhadnuté z textu, podmnožina `configured`
+    (eng vždy, pokud je nakonfigurována – tagy a zkratky). None = málo textu.
+    """
+    letters = sum(1 for ch in text if ch.isalpha())
+    if letters < min_letters:
+        return None
+    allowed = configured.split("+")
+    words = re.findall(r"\w+", text.lower())
+    found = []
+    for lang, (chars, stop) in LANG_HINTS.items():
+        if lang not in allowed:
+            continue
+        n_chars = sum(1 for ch in text if ch in chars)
+        n_words = sum(1 for w in words if w in stop)
+        if n_chars >= max(2, letters // 200) or n_words >= max(2, len(words) // 50):
+            found.append(lang)
+    base = ["eng"] if "eng" in allowed else allowed[:1]
+    out = base + [lang for lang in allowed if lang in found and lang not in base]
+    return "+".join(out)
+
+
+def ocr_page_image(path: str, s: OCRSettings, langs: Optional[str] = None,
+                   prefer: Optional[str] = None) -> OCRResult:
+    """Worker: OCR obrázku strany z disku; obrázek pak smaže."""
+    try:
+        with Image.open(path) as im:
+            im.load()
+            if s.adaptive:
+                return ocr_image_adaptive(im, s, langs, prefer)
+            langs = langs or s.langs
+            return OCRResult(ocr_image_exhaustive(im, s, langs), "exhaustive", langs,
+                             2 * len(TESSERACT_CONFIGS), 0.0, False)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ===== Dlaždicové OCR =====
+def bytes_per_pixel(s: OCRSettings) -> float:
+    """
+    Odhad špičky paměti na pixel renderu během OCR jedné úlohy: render v odstínech
+    šedi (1 B) + kopie preprocess (resize/autokontrast/median/threshold, ~2 živé
+    najednou po upscale²) + interní obraz Tesseractu (~4 B/px zpracovávaného obrázku).
+    """
+    up = max(1.0, s.upscale) ** 2
+    return 2.0 + 6.0 * up
+
+
+def needs_tiles(width_pt: float, height_pt: float, s: OCRSettings) -> bool:
+    if fitz is None or s.tiled == "off":
+        return False
+    if s.tiled == "always":
+        return True
+    zoom = s.dpi / 72.0
+    return width_pt * height_pt * zoom * zoom * bytes_per_pixel(s) > s.mem_budget_mb * 1024 * 1024
+
+
+def plan_tiles(width_pt: float, height_pt: float, s: OCRSettings) -> List[Tuple[Rect, Rect]]:
+    """
+    Rozdělí stranu na mřížku (clip, jádro) v bodech PDF. Jádra se nepřekrývají
+    a pokrývají celou stranu (krajní jsou otevřená do nekonečna); clip = jádro
+    rozšířené o tile_overlap, aby slovo na hranici bylo v některé dlaždici celé.
+    """
+    zoom = s.dpi / 72.0
+    ov = s.tile_overlap
+    side_pt = math.sqrt(s.mem_budget_mb * 1024 * 1024 / bytes_per_pixel(s)) / zoom
+    core_pt = max(side_pt - 2 * ov, ov, 72.0)
+    nx = max(1, math.ceil(width_pt / core_pt))
+    ny = max(1, math.ceil(height_pt / core_pt))
+    cw, ch = width_pt / nx, height_pt / ny
+    inf = float("inf")
+    out: List[Tuple[Rect, Rect]] = []
+    for iy in range(ny):
+        for ix in range(nx):
+            x0, y0, x1, y1 = ix * cw, iy * ch, (ix + 1) * cw, (iy + 1) * ch
+            clip = (max(0.0, x0 - ov), max(0.0, y0 - ov), min(width_pt, x1 + ov), min(height_pt, y1 + ov))
+            core = (x0 if ix else -inf, y0 if iy else -inf,
+                    x1 if ix < nx - 1 else inf, y1 if iy < ny - 1 else inf)
+            out.append((clip, core))
+    return out
+
+
+def page_sizes(pdf_path: str, pages: List[int]) -> Dict[int, Tuple[float, float]]:
+    """0-index strana → (šířka, výška) v bodech; prázdné bez PyMuPDF."""
+    out: Dict[int, Tuple[float, float]] = {}
+    if fitz is None or not pages:
+        return out
+    try:
+        with fitz.open(pdf_path) as doc:
+            for i in pages:
+                try:
+                    r = doc.load_page(i).rect
+                    out[i] = (r.width, r.height)
+                except Exception:
+                    continue
+    except Exception:
+        pass
+    return out
+
+
+def ocr_pdf_tile(pdf_path: str, page_index: int, clip: Rect, core: Rect, s: OCRSettings,
+                 langs: Optional[str] = None, prefer: Optional[str] = None) -> OCRResult:
+    """
+    Worker: vyrenderuje výřez strany (odstíny šedi) a OCRuje ho. Vrací jen slova,
+    jejichž střed leží v jádru dlaždice; boxes v bodech strany.
+    """
+    zoom = s.dpi / 72.0
+    with fitz.open(pdf_path) as doc:
+        pix = doc.load_page(page_index).get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(*clip),
+                                                   colorspace=fitz.csGRAY, alpha=False)
+        im = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+        del pix
+    # bez adaptivního režimu: všechny strategie, vítězí nejvyšší skóre
+    res = ocr_image_adaptive(im, s if s.adaptive else replace(s, min_conf=101.0), langs, prefer, boxes=True)
+    del im
+    words: List[Box] = []
+    for x0, y0, x1, y1, w in res.boxes or []:
+        bx0, by0 = clip[0] + x0 / zoom, clip[1] + y0 / zoom
+        bx1, by1 = clip[0] + x1 / zoom, clip[1] + y1 / zoom
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        if core[0] <= cx < core[2] and core[1] <= cy < core[3]:
+            words.append((bx0, by0, bx1, by1, w))
+    return res._replace(text=" ".join(w[4] for w in words), boxes=words)
+
+
+def merge_words(words: List[Box]) -> str:
+    """Slova z dlaždic (souřadnice strany) → text po řádcích shora dolů, zleva doprava."""
+    if not words:
+        return ""
+    words = sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    heights = sorted(w[3] - w[1] for w in words)
+    tol = max(1.0, heights[len(heights) // 2] * 0.5)
+    lines: List[List[Box]] = []
+    line_y = 0.0
+    for w in words:
+        yc = (w[1] + w[3]) / 2
+        if lines and abs(yc - line_y) <= tol:
+            lines[-1].append(w)
+        else:
+            lines.append([w])
+            line_y = yc
+    return " ".join(" ".join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+
+def merge_tile_results(results: List[OCRResult]) -> OCRResult:
+    """Výsledky dlaždic jedné strany → jeden OCRResult (text ze sloučených slov)."""
+    words = [w for r in results for w in (r.boxes or [])]
+    wins = Counter(r.strategy for r in results if r.strategy)
+    confs = [r.conf for r in results if r.boxes]
+    return OCRResult(
+        merge_words(words),
+        wins.most_common(1)[0][0] if wins else "",
+        results[0].langs if results else "",
+        sum(r.passes for r in results),
+        round(sum(confs) / len(confs), 1) if confs else 0.0,
+        bool(results) and all(r.early for r in results),
+    )
+
+
+def ocr_pdf_page(pdf_path: str, page_index: int, s: OCRSettings) -> str:
+    """OCR jedné strany (0-index) bez poolu – pro jednotlivé dotazy."""
+    size = page_sizes(pdf_path, [page_index]).get(page_index)
+    if size and needs_tiles(size[0], size[1], s):
+        return merge_tile_results([ocr_pdf_tile(pdf_path, page_index, clip, core, s)
+                                   for clip, core in plan_tiles(size[0], size[1], s)]).text
+    images = convert_from_path(pdf_path, dpi=s.dpi, first_page=page_index + 1,
+                               last_page=page_index + 1, fmt="png")
+    return " ".join(t for t in (ocr_image(im, s) for im in images) if t)
+
+
+def _init_worker() -> None:
+    # Tesseract (OpenMP) jednovláknově – paralelizuje pool
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def read_pdf_text(pdf_path: str) -> List[str]:
+    """Text všech stran (pypdf, whitespace sjednocený); nečitelná strana = ""."""
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(io.BytesIO(f.read()))
+    out = []
+    for page in reader.pages:
+        try:
+            raw = page.extract_text() or ""
+        except Exception:
+            raw = ""
+        out.append(" ".join(raw.split()))
+    return out
+
+
+def _runs(pages: List[int], batch: int) -> List[Tuple[int, int]]:
+    """Seřazené 0-index strany → dávky souvislých rozsahů [first, last] po max `batch`."""
+    out: List[Tuple[int, int]] = []
+    for p in pages:
+        if out and p == out[-1][1] + 1 and p - out[-1][0] < batch:
+            out[-1] = (out[-1][0], p)
+        else:
+            out.append((p, p))
+    return out
+
+
+class OCRPipeline:
+    """Streamovaná extrakce stran (text + OCR) z více PDF přes pool procesů."""
+
+    def __init__(self, settings: OCRSettings, workers: int = PID_OCR_WORKERS,
+                 raster_batch: int = PID_OCR_RASTER_BATCH, use_cache: bool = PID_OCR_CACHE_ENABLE):
+        self.settings = settings
+        self.workers = max(1, workers)
+        self.raster_batch = max(1, raster_batch)
+        self.use_cache = use_cache
+        self.stats: Dict[str, Any] = {}
+
+    def _cache(self) -> Tuple[Optional[OCRCache], str]:
+        # bez Tesseractu by se cachovaly prázdné výsledky → cache vypnout
+        tess = tesseract_version() if self.use_cache else None
+        if not tess:
+            return None, ""
+        try:
+            return get_ocr_cache(), tess
+        except Exception:
+            return None, ""
+
+    def _page(self, pdf_path: str, i: int, text: str, ocr: bool) -> Dict[str, Any]:
+        return {
+            "file": os.path.basename(pdf_path),
+            "path": pdf_path,
+            "page": i + 1,
+            "text": text,
+            "tags": extract_tags(text) if text else [],
+            "ocr": ocr,
+        }
+
+    def iter_pages(self, pdf_paths: List[str], force_ocr: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Generuje stránky {"file", "path", "page", "text", "tags", "ocr"} v pořadí
+        dokončení (textové hned, OCR jak doběhnou). force_ocr → OCR všech stran bez limitu.
+        """
+        s = self.settings
+        t0 = time.perf_counter()
+        self.stats = {"files": 0, "pages": 0, "ocr_pages": 0, "ocr_failed": 0,
+                      "cache_hits": 0, "cache_misses": 0, "ocr_passes": 0, "early_stops": 0,
+                      "tiled_pages": 0, "tiles": 0,
+                      "strategies": {}, "langs": {},
+                      "workers": self.workers, "elapsed_sec": 0.0, "pages_per_sec": 0.0}
+        cache, tess = self._cache()
+        self.stats["cache"] = cache is not None
+        tmp = tempfile.mkdtemp(prefix="pid_ocr_")
+        pool: Optional[ProcessPoolExecutor] = None
+        # future → (pdf, strana, text z pypdf, klíč cache, skupina dlaždic strany | None)
+        inflight: Dict[Future, Tuple[str, int, str, Optional[str], Optional[Dict[str, Any]]]] = {}
+        max_inflight = self.workers * 2
+        # profil dokumentu: jazyk (detekovaný jednou na PDF) + vítězné strategie jeho stran
+        profiles: Dict[str, Dict[str, Any]] = {}
+        strategies: Counter = Counter()
+
+        def _profile(pdf: str, texts: List[str]) -> Dict[str, Any]:
+            prof: Dict[str, Any] = {"langs": None, "wins": Counter(), "stored": None}
+            if cache is not None:
+                try:
+                    prof["stored"] = cache.get_profile(pdf)
+                except Exception:
+                    pass
+            if s.detect_lang:
+                prof["langs"] = detect_langs(" ".join(texts), s.langs)
+                if prof["langs"] is None and prof["stored"]:
+                    prof["langs"] = prof["stored"].get("langs")
+            return prof
+
+        def _prefer(prof: Dict[str, Any]) -> Optional[str]:
+            if prof["wins"]:
+                return prof["wins"].most_common(1)[0][0]
+            return (prof["stored"] or {}).get("strategy")
+
+        def _narrow(prof: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+            # jazyky + preferovaná strategie pro další stranu (mění se, jak se profil učí)
+            return (prof["langs"], _prefer(prof)) if prof else (None, None)
+
+        def _learn(pdf: str, res: OCRResult) -> None:
+            prof = profiles.get(pdf)
+            self.stats["ocr_passes"] += res.passes
+            self.stats["early_stops"] += int(res.early)
+            if res.strategy:
+                strategies[res.strategy] += 1
+            if prof is None or not res.strategy:
+                return
+            prof["wins"][res.strategy] += 1
+            if s.detect_lang and prof["langs"] is None:
+                # textová vrstva nestačila → jazyk z prvního OCR výsledku
+                prof["langs"] = detect_langs(res.text, s.langs)
+
+        def _learn_cached(prof: Optional[Dict[str, Any]], strategy: Optional[str],
+                          langs: Optional[str]) -> None:
+            # hit z cache: strategie a jazyky, se kterými strana OCR kdysi prošla
+            if prof is None or not strategy:
+                return
+            prof["wins"][strategy] += 1
+            if s.detect_lang and prof["langs"] is None and langs and langs != s.langs:
+                prof["langs"] = langs
+
+        def _ocr_result(pdf: str, i: int, text: str, ocr_text: str) -> Dict[str, Any]:
+            if len(ocr_text) >= 2:
+                self.stats["ocr_pages"] += 1
+                return self._page(pdf, i, ocr_text, True)
+            self.stats["ocr_failed"] += 1
+            return self._page(pdf, i, text, False)
+
+        def _finished(fut: Future) -> Optional[Dict[str, Any]]:
+            pdf, i, text, key, group = inflight.pop(fut)
+            try:
+                res = fut.result()
+            except Exception:
+                res = None
+            if group is not None:
+                # dlaždice: strana je hotová až s poslední dlaždicí
+                group["left"] -= 1
+                if res is not None:
+                    group["results"].append(res)
+                if group["left"]:
+                    return None
+                res = merge_tile_results(group["results"]) if group["results"] else None
+            if res is None:
+                return _ocr_result(pdf, i, text, "")
+            _learn(pdf, res)
+            ocr_text = res.text
+            if key is not None:
+                try:
+                    cache.put(key, ocr_text, extract_tags(ocr_text), res.strategy, res.langs)
+                except Exception:
+                    pass
+            if len(ocr_text) >= 2:
+                self.stats["ocr_pages"] += 1
+                return self._page(pdf, i, ocr_text, True)
+            self.stats["ocr_failed"] += 1
+            return self._page(pdf, i, text, False)
+
+        def _drain(block_until: int) -> Iterator[Dict[str, Any]]:
+            # počkej, dokud v běhu nezbude < block_until úloh; hotové vydej
+            while inflight and len(inflight) >= block_until:
+                done = wait(list(inflight), return_when=FIRST_COMPLETED).done
+                for fut in done:
+                    page = _finished(fut)
+                    if page is not None:
+                        self.stats["pages"] += 1
+                        yield page
+
+        def _pool() -> ProcessPoolExecutor:
+            nonlocal pool
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_worker)
+            return pool
+
+        try:
+            for pdf in pdf_paths:
+                try:
+                    texts = read_pdf_text(pdf)
+                except Exception:
+                    continue
+                self.stats["files"] += 1
+
+                need: List[int] = []
+                for i, text in enumerate(texts):
+                    wants_ocr = force_ocr or (s.enable and len(text) < 5 and
+                                              (s.max_pages is None or i < s.max_pages))
+                    if wants_ocr:
+                        need.append(i)
+                    else:
+                        self.stats["pages"] += 1
+                        yield self._page(pdf, i, text, False)
+
+                if need and s.adaptive:
+                    profiles[pdf] = _profile(pdf, texts)
+                prof = profiles.get(pdf)
+
+                # cache: strany se stejným obsahem a nastavením už OCR mají
+                keys: Dict[int, str] = {}
+                if cache is not None and need:
+                    fps = page_fingerprints(pdf, need)
+                    keys = {i: cache.key(fps[i], s, tess) for i in need if i in fps}
+                    try:
+                        found = cache.get_many(list(keys.values()))
+                    except Exception:
+                        found = {}
+                    rest = []
+                    for i in need:
+                        hit = found.get(keys.get(i, ""))
+                        if hit is None:
+                            rest.append(i)
+                            continue
+                        self.stats["cache_hits"] += 1
+                        self.stats["pages"] += 1
+                        _learn_cached(prof, hit[2], hit[3])
+                        yield _ocr_result(pdf, i, texts[i], hit[0])
+                    self.stats["cache_misses"] += len(rest)
+                    need = rest
+
+                # velkoformátové strany → dlaždice (každá samostatná úloha v poolu)
+                if need and s.tiled != "off":
+                    sizes = page_sizes(pdf, need)
+                    tiled = [i for i in need if i in sizes and needs_tiles(sizes[i][0], sizes[i][1], s)]
+                    for i in tiled:
+                        tiles = plan_tiles(sizes[i][0], sizes[i][1], s)
+                        yield from _drain(max(1, max_inflight))
+                        langs, prefer = _narrow(prof)
+                        group = {"left": len(tiles), "results": []}
+                        for clip, core in tiles:
+                            fut = _pool().submit(ocr_pdf_tile, pdf, i, clip, core, s, langs, prefer)
+                            inflight[fut] = (pdf, i, texts[i], keys.get(i), group)
+                        self.stats["tiled_pages"] += 1
+                        self.stats["tiles"] += len(tiles)
+                    if tiled:
+                        need = [i for i in need if i not in set(tiled)]
+
+                for first, last in _runs(need, self.raster_batch):
+                    # místo v poolu → teprve pak rasterizuj další dávku (omezená paměť/disk)
+                    yield from _drain(max(1, max_inflight - (last - first)))
+                    try:
+                        paths = convert_from_path(pdf, dpi=s.dpi, first_page=first + 1, last_page=last + 1,
+                                                  fmt="png", output_folder=tmp, paths_only=True)
+                    except Exception:
+                        paths = []
+                    if len(paths) != last - first + 1:
+                        # rasterizace selhala → strany zůstanou s textem z pypdf
+                        for p in paths:
+                            try:
+                                os.remove(p)
+                            except OSError:
+                                pass
+                        for i in range(first, last + 1):
+                            self.stats["pages"] += 1
+                            self.stats["ocr_failed"] += 1
+                            yield self._page(pdf, i, texts[i], False)
+                        continue
+                    langs, prefer = _narrow(prof)
+                    for i, path in zip(range(first, last + 1), sorted(paths)):
+                        fut = _pool().submit(ocr_page_image, path, s, langs, prefer)
+                        inflight[fut] = (pdf, i, texts[i], keys.get(i), None)
+
+            yield from _drain(1)
+        finally:
+            for fut in inflight:
+                fut.cancel()
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(tmp, ignore_errors=True)
+            for pdf, prof in profiles.items():
+                self.stats["langs"][os.path.basename(pdf)] = prof["langs"] or s.langs
+                if cache is not None and prof["wins"]:
+                    try:
+                        cache.put_profile(pdf, _prefer(prof), prof["langs"])
+                    except Exception:
+                        pass
+            self.stats["strategies"] = dict(strategies)
+            dt = time.perf_counter() - t0
+            self.stats["elapsed_sec"] = round(dt, 3)
+            self.stats["pages_per_sec"] = round(self.stats["pages"] / dt, 2) if dt > 0 else 0.0
@@ -1,23 +1,158 @@
 import os
-import io
-import re
 import json
+import hashlib
+import tempfile
+import threading
+from dataclasses import replace
 import faiss
 import numpy as np
-from typing import List, Dict, Any, Optional
-from pypdf import PdfReader
+from typing import Callable, Iterable, List, Dict, Any, NamedTuple, Optional, Tuple, Union
 from openai import OpenAI
 
-# OCR stack
-from pdf2image import convert_from_path
-import pytesseract
-from PIL import Image, ImageOps, ImageFilter
+from PIL import Image
+
+from ..services.embeddings import get_embedding_service
+from . import colstore
+from .bm25 import BM25Index, open_bm25, retrieve, write_bm25
+from .ocr_pipeline import (
+    PID_OCR_WORKERS, OCRPipeline, OCRSettings, extract_tags, ocr_pdf_page,
+    preprocess_image, tesseract_try,
+)
 
 # ======== Nastavení modelu a cest ========
 EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+PID_EMBED_BATCH = int(os.getenv("PID_EMBED_BATCH", "256"))
+# metadata stran: sloupcová tabulka (colstore) v PID_COLS_PATH; extra = {"version",
+# "model", "next_id", "files": {rel: {sha1, size, mtime_ns}}}. Vektory jsou jen ve faiss.index.
+# Starší meta.json (seznam stran, nebo {"pages", "files", …}) se ještě načte; store.npy netřeba.
+META_VERSION = 3
+# auto | hybrid | dense | lexical (viz bm25.retrieve); BM25 index v PID_BM25_PATH vedle faiss.index
+PID_SEARCH_MODE = os.getenv("PID_SEARCH_MODE", "auto")
+
+
+def _sha1_file(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write(path: str, write: Callable[[str], None], suffix: str = ".tmp") -> None:
+    """write(tmp) do dočasného souboru vedle cíle, pak os.replace."""
+    fd, tmp = tempfile.mkstemp(prefix=".pidrag.", suffix=suffix, dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+FileSig = Optional[Tuple[Optional[Tuple[int, int]], ...]]
+
+
+def _embed_text(d: Dict[str, Any]) -> str:
+    # prázdná strana (bez textu i OCR) → aspoň název souboru a číslo strany
+    return d["text"] if d.get("text") else f"{d['file']} page {d['page']}"
+
+
+def _tag_index(tag_lists: Iterable[List[str]]) -> Dict[str, Tuple[int, ...]]:
+    inv: Dict[str, List[int]] = {}
+    for i, tags in enumerate(tag_lists):
+        for t in {t.upper() for t in tags}:
+            inv.setdefault(t, []).append(i)
+    return {t: tuple(v) for t, v in inv.items()}
+
+
+class PageTable:
+    """
+    Stránky indexu nad colstore tabulkou (mmap). Řádek se dekóduje na dict
+    až při přístupu → načtení je okamžité a paměť roste jen s použitými stranami.
+    """
+
+    def __init__(self, table: colstore.Table):
+        self.table = table
+        self.ids = table.array("id")
+        self._order = table.array("id_order")    # argsort(ids) → hledání id binárně
+        self._page = table.array("page")
+        self._ocr = table.array("ocr")
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        t = self.table
+        tags = t.text("tags", i)
+        return {
+            "id": int(self.ids[i]),
+            "file": t.text("file", i),
+            "path": t.text("path", i),
+            "page": int(self._page[i]),
+            "text": t.text("text", i),
+            "tags": tags.split("\n") if tags else [],
+            "ocr": bool(self._ocr[i]),
+        }
+
+    def id_of(self, i: int) -> int:
+        return int(self.ids[i])
+
+    def path_of(self, i: int) -> str:
+        return self.table.text("path", i)
+
+    def row_of(self, pid: int) -> Optional[int]:
+        k = int(np.searchsorted(self.ids, pid, sorter=self._order))
+        if k < len(self._order) and int(self.ids[self._order[k]]) == pid:
+            return int(self._order[k])
+        return None
+
+    def tag_index(self) -> Dict[str, Tuple[int, ...]]:
+        return _tag_index(t.split("\n") if t else [] for t in self.table.texts("tags"))
+
+
+class PageList(list):
+    """Stránky v paměti (starší meta.json) se stejným rozhraním jako PageTable."""
+
+    def __init__(self, pages: List[Dict[str, Any]]):
+        super().__init__(pages)
+        self.ids = np.array([p["id"] for p in pages], dtype="int64")
+        self._pos = {p["id"]: i for i, p in enumerate(pages)}
+
+    def id_of(self, i: int) -> int:
+        return self[i]["id"]
+
+    def path_of(self, i: int) -> Optional[str]:
+        return self[i].get("path")
+
+    def row_of(self, pid: int) -> Optional[int]:
+        return self._pos.get(pid)
+
+    def tag_index(self) -> Dict[str, Tuple[int, ...]]:
+        return _tag_index(p.get("tags", []) for p in self)
+
+
+Pages = Union[PageTable, PageList]
+
+
+class IndexState(NamedTuple):
+    """Načtený index – mění se jen výměnou celé n-tice (čtenáři drží snímek)."""
+    index: Any                              # faiss.IndexIDMap2 | None
+    meta: Pages                             # stránky (každá s "id" ve FAISS a "path")
+    files: Dict[str, Dict[str, Any]]        # rel PDF → sha1, size, mtime_ns
+    model: Optional[str]
+    next_id: int
+    tags: Dict[str, Tuple[int, ...]]        # TAG (upper) → řádky v meta
+    lexical: Optional[BM25Index]            # BM25 nad řádky meta; None = jen FAISS
+    sig: FileSig                            # (mtime_ns, size) index / colstore / meta.json / bm25; None = nenačteno
+    generation: int
+
+
+EMPTY_STATE = IndexState(None, PageList([]), {}, None, 0, {}, None, None, 0)
 
-def _unique(seq: List[str]) -> List[str]:
-    return sorted(list(set(seq)))
 
 class PIDRAG:
     """
@@ -25,14 +160,25 @@ class PIDRAG:
     - PDF text (pypdf) + fallback OCR (Tesseract)
     - předzpracování obrazu: upscale, autokontrast, odšum, threshold
     - regex detekce tagů (Vxxx, Pxxx, TTxxx, PIxxx, FIxxx, LTxxx, 91201PU001 apod.)
+    - reindex: rasterizace po dávkách + OCR stran paralelně v procesech (ocr_pipeline)
+    - inkrementální reindex: embedují se jen stránky přidaných/změněných PDF (sha1),
+      FAISS IndexIDMap2 se upraví přes add_with_ids/remove_ids
+    - stav (index, meta, tag → stránky) je neměnná n-tice IndexState: načítá se pod
+      zámkem, znovu když se změní mtime/velikost souborů (reindex v jiném workeru),
+      a vyměňuje se atomicky → find_tag je O(1) a search/find_tag vidí konzistentní snímek
+    - metadata stran v colstore (mmap, texty jako offsety + UTF-8 blob), vektory jen ve faiss.index
+    - hybridní hledání: BM25 nad texty stran (bm25.py) + FAISS přes RRF; dotaz jako
+      tag ("91201PU001") jde jen přes BM25 bez volání embeddingu
     """
 
     def __init__(
         self,
         pids_dir: str = os.getenv("PIDS_DIR", "/app/data/pids"),
         index_path: str = os.getenv("PID_INDEX_PATH", "/app/data/pids/faiss.index"),
-        store_path: str = os.getenv("PID_STORE_PATH", "/app/data/pids/store.npy"),
-        meta_path: str = os.getenv("PID_META_PATH", "/app/data/pids/meta.json"),
+        store_path: str = os.getenv("PID_STORE_PATH", "/app/data/pids/store.npy"),  # starší formát, jen úklid
+        meta_path: str = os.getenv("PID_META_PATH", "/app/data/pids/meta.json"),    # jen starší formát
+        cols_path: Optional[str] = os.getenv("PID_COLS_PATH"),                    # default vedle faiss.index
+        bm25_path: Optional[str] = os.getenv("PID_BM25_PATH"),                    # default vedle faiss.index
         openai_api_key: str = os.getenv("OPENAI_API_KEY", ""),
         ocr_langs: str = os.getenv("PID_OCR_LANGS", "eng+ces+deu"),
         ocr_dpi: int = int(os.getenv("PID_OCR_DPI", "300")),
@@ -41,15 +187,19 @@ class PIDRAG:
         ocr_upscale: float = float(os.getenv("PID_OCR_UPSCALE", "1.8")),   # ~1.5–2.5 obvykle pomáhá
         ocr_threshold: int = int(os.getenv("PID_OCR_THRESHOLD", "180")),   # 0–255, vyšší = více bílého
         ocr_median: int = int(os.getenv("PID_OCR_MEDIAN", "3")),           # 0 = vypnuto; jinak velikost filtru (3/5)
+        ocr_workers: int = PID_OCR_WORKERS,                                  # procesy pro OCR stran
     ):
         self.pids_dir = pids_dir
         self.index_path = index_path
         self.store_path = store_path
         self.meta_path = meta_path
+        self.cols_path = cols_path or os.path.join(os.path.dirname(os.path.abspath(index_path)), "meta.cols")
+        self.bm25_path = bm25_path or os.path.join(os.path.dirname(os.path.abspath(index_path)), "bm25.cols")
         self.client = OpenAI(api_key=openai_api_key)
-        self.index = None
-        self.vectors = None
-        self.meta: List[Dict[str, Any]] = []
+        self._state = EMPTY_STATE
+        self._load_lock = threading.Lock()
+        self._bad_sig: FileSig = None      # podpis souborů, které se nepodařilo načíst
+        self._reindex_lock = threading.Lock()
 
         self.ocr_langs = ocr_langs
         self.ocr_dpi = ocr_dpi
@@ -58,259 +208,426 @@ class PIDRAG:
         self.ocr_upscale = max(1.0, ocr_upscale)
         self.ocr_threshold = max(0, min(255, ocr_threshold))
         self.ocr_median = max(0, ocr_median)
+        self.ocr_workers = max(1, ocr_workers)
 
-    # ===== Embedding =====
-    def _embed(self, texts: List[str]) -> np.ndarray:
-        resp = self.client.embeddings.create(model=EMBED_MODEL, input=texts)
-        vecs = [d.embedding for d in resp.data]
-        return np.array(vecs, dtype="float32")
+    # ===== Stav (zpětně kompatibilní atributy) =====
+    @property
+    def index(self):
+        return self._state.index
 
-    # ===== Tagy =====
-    def _extract_tags(self, text: str) -> List[str]:
-        # rozšířený regex pro čísla + písmena + čísla (např. 91201PU001)
-        patterns = [
-            r"\bV-?\d{2,4}\b",                 # V102, V-102
-            r"\bP-?\d{2,4}\b",                 # P301, P-301
-            r"\bT[IT]C?-?\d{2,4}\b",           # TT101, TIC-201
-            r"\bPI-?\d{2,4}\b",                # PI102
-            r"\bFI-?\d{2,4}\b",                # FI302
-            r"\bLT-?\d{2,4}\b",                # LT101
-            r"\b[0-9]{4,6}[A-Z]{2,3}[0-9]{2,4}\b",  # 91201PU001 apod.
-        ]
-        tags: List[str] = []
-        for pat in patterns:
-            tags.extend(re.findall(pat, text, flags=re.IGNORECASE))
-        norm = [t.upper().replace("--", "-") for t in tags]
-        return _unique(norm)
-
-    # ===== Předzpracování obrazu pro OCR =====
-    def _preprocess_image(self, im: Image.Image) -> Image.Image:
-        """
-        Kroky:
-        - převod do odstínů šedi,
-        - upscale (bicubic),
-        - autokontrast,
-        - volitelně median filter na odšum,
-        - pevný threshold do binární podoby.
-        """
-        # grayscale
-        out = im.convert("L")
+    @property
+    def meta(self) -> Pages:
+        return self._state.meta
 
-        # upscale
-        if self.ocr_upscale and self.ocr_upscale > 1.0:
-            w, h = out.size
-            out = out.resize((int(w * self.ocr_upscale), int(h * self.ocr_upscale)), Image.BICUBIC)
+    @property
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        return self._state.files
 
-        # autokontrast (zvedne separaci znak/pozadí)
-        out = ImageOps.autocontrast(out)
+    @property
+    def generation(self) -> int:
+        return self._state.generation
 
-        # volitelně odšum median filtrem
-        if self.ocr_median and self.ocr_median >= 3 and self.ocr_median % 2 == 1:
-            try:
-                out = out.filter(ImageFilter.MedianFilter(self.ocr_median))
-            except Exception:
-                pass
+    # ===== Embedding (sdílená služba s cache, viz services/embeddings.py) =====
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return get_embedding_service().embed(texts, EMBED_MODEL, client=self.client)
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        return get_embedding_service().embed_query(text, EMBED_MODEL, client=self.client)[None, :]
+
+    @property
+    def ocr_settings(self) -> OCRSettings:
+        # adaptivní parametry (PID_OCR_ADAPTIVE, PID_OCR_MIN_CONF, …) z env
+        return replace(
+            OCRSettings.from_env(),
+            langs=self.ocr_langs,
+            dpi=self.ocr_dpi,
+            enable=self.ocr_enable,
+            max_pages=self.ocr_max_pages,
+            upscale=self.ocr_upscale,
+            threshold=self.ocr_threshold,
+            median=self.ocr_median,
+        )
 
-        # threshold (binarizace)
-        thr = self.ocr_threshold
-        out = out.point(lambda x: 255 if x >= thr else 0).convert("L")
+    # ===== Tagy =====
+    def _extract_tags(self, text: str) -> List[str]:
+        return extract_tags(text)
 
-        return out
+    # ===== OCR (implementace v ocr_pipeline, sdílená s worker procesy) =====
+    def _preprocess_image(self, im: Image.Image) -> Image.Image:
+        return preprocess_image(im, self.ocr_settings)
 
     def _tesseract_try(self, image: Image.Image) -> str:
-        """
-        Zkus více konfigurací Tesseractu – vezmi nejdelší (nejbohatší) čitelný výstup.
-        """
-        candidates = []
-        configs = [
-            "--oem 1 --psm 6",    # jeden blok textu
-            "--oem 1 --psm 11",   # rozptýlený text
-            "--oem 1 --psm 4",    # sloupec(y) textu
-        ]
-        for cfg in configs:
-            try:
-                txt = pytesseract.image_to_string(image, lang=self.ocr_langs, config=cfg)
-                txt = " ".join(txt.split())
-                if txt:
-                    candidates.append(txt)
-            except Exception:
-                pass
-        if not candidates:
-            return ""
-        # heuristika: vezmi nejdelší (typicky nejlepší pokrytí)
-        return max(candidates, key=len)
+        return tesseract_try(image, self.ocr_langs)
 
-    # ===== OCR jedné stránky =====
     def _ocr_text_from_page(self, pdf_path: str, page_index: int) -> str:
-        # pdf2image indexuje od 1
-        images = convert_from_path(pdf_path, dpi=self.ocr_dpi,
-                                   first_page=page_index + 1,
-                                   last_page=page_index + 1,
-                                   fmt="png")
-        texts: List[str] = []
-        for im in images:
-            # dvě cesty: (A) heavy preprocess, (B) jen grayscale (fallback)
-            try:
-                pre = self._preprocess_image(im)
-                txtA = self._tesseract_try(pre)
-            except Exception:
-                txtA = ""
-
-            try:
-                gray = im.convert("L")
-                txtB = self._tesseract_try(gray)
-            except Exception:
-                txtB = ""
+        return ocr_pdf_page(pdf_path, page_index, self.ocr_settings)
 
-            # vyber lepší
-            chosen = txtA if len(txtA) >= len(txtB) else txtB
-            texts.append(chosen)
+    # ===== PDF loading =====
+    def _pdf_files(self) -> List[str]:
+        out = []
+        for root, _, files in os.walk(self.pids_dir):
+            for fn in files:
+                if fn.lower().endswith(".pdf"):
+                    out.append(os.path.join(root, fn))
+        return out
 
-        joined = " ".join(t for t in texts if t)
-        return joined
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.pids_dir).replace("\\", "/")
 
-    # ===== PDF loading =====
     def _load_pdf_pages(self, pdf_path: str) -> List[Dict[str, Any]]:
-        pages = []
-        with open(pdf_path, "rb") as f:
-            reader = PdfReader(io.BytesIO(f.read()))
+        pipe = OCRPipeline(self.ocr_settings, self.ocr_workers)
+        return sorted(pipe.iter_pages([pdf_path]), key=lambda d: d["page"])
 
-        for i, page in enumerate(reader.pages):
+    # ===== Indexace =====
+    def _classify(self, files: Dict[str, Dict[str, Any]],
+                  full: bool) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str], List[str]]:
+        """
+        Porovná PDF v pids_dir se záznamy souborů z metadat indexu.
+        Vrací (záznamy souborů, rel → abs cesta ke změněným/novým, odebrané rel).
+        Stejná velikost + mtime → beze změny bez čtení; jinak rozhodne sha1.
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        changed: Dict[str, str] = {}
+        for path in self._pdf_files():
+            rel = self._rel(path)
             try:
-                raw = page.extract_text() or ""
-            except Exception:
-                raw = ""
-
-            text = " ".join(raw.split())
-            did_ocr = False
-
-            if self.ocr_enable and (len(text) < 5):
-                if self.ocr_max_pages is None or i < self.ocr_max_pages:
-                    try:
-                        ocr_text = self._ocr_text_from_page(pdf_path, i)
-                        if len(ocr_text) >= 2:
-                            text = ocr_text
-                            did_ocr = True
-                    except Exception:
-                        pass
-
-            tags = self._extract_tags(text) if text else []
-            pages.append({
-                "file": os.path.basename(pdf_path),
-                "page": i + 1,
-                "text": text,
-                "tags": tags,
-                "ocr": did_ocr,
-            })
-        return pages
+                st = os.stat(path)
+            except OSError:
+                continue
+            prev = None if full else files.get(rel)
+            if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+                records[rel] = prev
+                continue
+            sha = _sha1_file(path)
+            if prev and prev.get("sha1") == sha:
+                # jen touch/kopie → obsah stejný, aktualizujeme stat
+                records[rel] = dict(prev, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+            records[rel] = {"sha1": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            changed[rel] = path
+        removed = [rel for rel in files if rel not in records]
+        return records, changed, removed
 
-    # ===== Indexace =====
-    def reindex(self, force_ocr: bool = False) -> Dict[str, Any]:
+    def _embed_pages(self, paths: List[str], force_ocr: bool,
+                     pipe: OCRPipeline) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
         """
-        Vytvoří embedding index pro všechny PDF v pids_dir.
-        force_ocr=True → vynutí OCR i u textových PDF.
+        Stránky z OCR pipeline přichází průběžně (paralelní OCR) a embedují se
+        po dávkách PID_EMBED_BATCH, zatímco OCR dalších stran běží.
         """
         docs: List[Dict[str, Any]] = []
-        for root, _, files in os.walk(self.pids_dir):
-            for fn in files:
-                if fn.lower().endswith(".pdf"):
-                    full = os.path.join(root, fn)
-                    if force_ocr:
-                        prev_enable, prev_max = self.ocr_enable, self.ocr_max_pages
-                        self.ocr_enable, self.ocr_max_pages = True, None
-                        docs.extend(self._load_pdf_pages(full))
-                        self.ocr_enable, self.ocr_max_pages = prev_enable, prev_max
-                    else:
-                        docs.extend(self._load_pdf_pages(full))
+        vec_parts: List[np.ndarray] = []
+        pending: List[Dict[str, Any]] = []
+
+        def _flush():
+            if pending:
+                vec_parts.append(self._embed([_embed_text(d) for d in pending]))
+                docs.extend(pending)
+                pending.clear()
+
+        for d in pipe.iter_pages(paths, force_ocr=force_ocr):
+            d["path"] = self._rel(d["path"])
+            pending.append(d)
+            if len(pending) >= PID_EMBED_BATCH:
+                _flush()
+        _flush()
+        if not docs:
+            return docs, None
+        vecs = np.vstack(vec_parts).astype("float32")
+        faiss.normalize_L2(vecs)
+        return docs, vecs
+
+    def _reembed(self, docs: List[Dict[str, Any]]) -> np.ndarray:
+        """Nové vektory pro stránky, jejichž text (OCR) už je v metadatech."""
+        parts = [self._embed([_embed_text(d) for d in docs[i:i + PID_EMBED_BATCH]])
+                 for i in range(0, len(docs), PID_EMBED_BATCH)]
+        vecs = np.vstack(parts).astype("float32")
+        faiss.normalize_L2(vecs)
+        return vecs
 
+    def reindex(self, force_ocr: bool = False, full: bool = False) -> Dict[str, Any]:
+        """
+        Inkrementální indexace PDF v pids_dir.
+        - přidané/změněné/odebrané PDF se poznají podle sha1 (stat jako rychlá zkratka),
+        - embedují se jen stránky změněných a nových PDF; jejich vektory se do
+          FAISS (IndexIDMap2) vloží přes add_with_ids, stránky změněných
+          a odebraných PDF se odeberou přes remove_ids,
+        - full=True (nebo force_ocr=True) → vše znovu včetně OCR,
+        - jiný embedding model či dimenze → nezměněné stránky se jen přeembedují
+          z textu v metadatech (OCR se neopakuje).
+        force_ocr=True → vynutí OCR i u textových PDF.
+        Souběžné reindexy v procesu se řadí za sebe; čtenáři dál používají starý
+        stav, dokud se nový nezapíše a nevymění.
+        """
+        with self._reindex_lock:
+            return self._reindex(self._lazy_load(), force_ocr, full)
+
+    def _reindex(self, st: IndexState, force_ocr: bool, full: bool) -> Dict[str, Any]:
+        full = full or force_ocr
+        # jiný model → staré vektory neplatí, text stran ano
+        reembed = not full and st.model not in (None, EMBED_MODEL)
+        records, changed, removed = self._classify(st.files, full)
+        n_added = sum(1 for rel in changed if rel not in st.files)
+        stats: Dict[str, Any] = {
+            "full": full,
+            "files_added": n_added,
+            "files_changed": len(changed) - n_added,
+            "files_removed": len(removed),
+            "files_unchanged": len(records) - len(changed),
+        }
+
+        # stránky nezměněných PDF zůstávají; ostatní (změněné, odebrané, ze starého
+        # meta.json bez záznamu souboru) jdou z indexu pryč
+        keep_rels = {rel for rel in records if rel not in changed}
+        keep = [i for i in range(len(st.meta)) if st.meta.path_of(i) in keep_rels]
+        kept = set(keep)
+        drop_ids = [st.meta.id_of(i) for i in range(len(st.meta)) if i not in kept]
+
+        pipe = OCRPipeline(self.ocr_settings, self.ocr_workers)
+        if not changed and not drop_ids and st.index is not None and not reembed:
+            if records != st.files:
+                self._save_pages(records, [st.meta[i] for i in range(len(st.meta))], st.next_id)
+                self._swap(st.index)
+            ocr_used = sum(1 for i in range(len(st.meta)) if st.meta[i].get("ocr"))
+            return {**stats, "pages_embedded": 0, "pages_reembedded": 0, "pages_removed": 0,
+                    "pages_indexed": len(st.meta), "ocr_used_pages": ocr_used, "ocr": pipe.stats}
+
+        new_docs, new_vecs = self._embed_pages(list(changed.values()), force_ocr, pipe)
+        if new_vecs is not None and st.index is not None and keep and new_vecs.shape[1] != st.index.d:
+            # jiná dimenze embeddingů → staré vektory nejsou použitelné, text ano
+            reembed = True
+
+        next_id = st.next_id
+        for d in new_docs:
+            d["id"] = next_id
+            next_id += 1
+
+        docs = [st.meta[i] for i in keep] + new_docs
         if not docs:
             for p in [self.index_path, self.store_path, self.meta_path]:
                 try:
                     os.remove(p)
-                except:
+                except OSError:
                     pass
-            self.index = None
-            self.meta = []
-            return {"pages_indexed": 0, "ocr_used_pages": 0}
-
-        texts = [d["text"] if d["text"] else f"{d['file']} page {d['page']}" for d in docs]
-        vecs = self._embed(texts)
-        dim = vecs.shape[1]
-
-        faiss.normalize_L2(vecs)
-        index = faiss.IndexFlatIP(dim)
-        index.add(vecs)
+            colstore.remove_table(self.cols_path)
+            colstore.remove_table(self.bm25_path)
+            self._swap(None)
+            return {**stats, "pages_embedded": 0, "pages_reembedded": 0, "pages_removed": len(drop_ids),
+                    "pages_indexed": 0, "ocr_used_pages": 0, "ocr": pipe.stats}
+
+        new_ids = np.array([d["id"] for d in new_docs], dtype="int64")
+        n_reembedded = 0
+        if reembed and keep:
+            # zachované stránky: text z metadat → jen nové vektory (stejná id)
+            kept_docs = docs[:len(keep)]
+            vecs = self._reembed(kept_docs)
+            ids = np.array([d["id"] for d in kept_docs], dtype="int64")
+            if new_vecs is not None:
+                vecs, ids = np.vstack([vecs, new_vecs]), np.concatenate([ids, new_ids])
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(vecs.shape[1]))
+            index.add_with_ids(vecs, ids)
+            n_reembedded = len(kept_docs)
+        elif st.index is None or not keep:
+            # bez zachovaných stran jsou všechny stránky nové
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(new_vecs.shape[1]))
+            index.add_with_ids(new_vecs, new_ids)
+        else:
+            # kopie → souběžné search() pracuje se starým indexem až do výměny
+            index = faiss.clone_index(st.index)
+            if drop_ids:
+                index.remove_ids(np.array(drop_ids, dtype="int64"))
+            if len(new_ids):
+                index.add_with_ids(new_vecs, new_ids)
+
+        # stabilní pořadí (soubor, strana) nezávislé na pořadí dokončení OCR
+        order = sorted(range(len(docs)), key=lambda i: (docs[i]["path"], docs[i]["page"]))
+        docs = [docs[i] for i in order]
 
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(index, self.index_path)
-        np.save(self.store_path, vecs)
-        with open(self.meta_path, "w", encoding="utf-8") as fw:
-            json.dump(docs, fw, ensure_ascii=False, indent=2)
+        _atomic_write(self.index_path, lambda tmp: faiss.write_index(index, tmp))
+        self._save_pages(records, docs, next_id)
 
-        self.index = index
-        self.vectors = vecs
-        self.meta = docs
+        self._swap(index)
 
         ocr_used = sum(1 for d in docs if d.get("ocr"))
-        return {"pages_indexed": len(docs), "ocr_used_pages": ocr_used}
-
-    # ===== Lazy load =====
-    def _lazy_load(self):
-        if self.index is None:
-            if (os.path.exists(self.index_path)
-                and os.path.exists(self.store_path)
-                and os.path.exists(self.meta_path)):
-                self.index = faiss.read_index(self.index_path)
-                self.vectors = np.load(self.store_path)
-                with open(self.meta_path, "r", encoding="utf-8") as fr:
-                    self.meta = json.load(fr)
-            else:
-                self.index = None
-                self.vectors = None
-                self.meta = []
+        return {**stats, "pages_embedded": len(new_docs), "pages_reembedded": n_reembedded,
+                "pages_removed": len(drop_ids), "pages_indexed": len(docs), "ocr_used_pages": ocr_used,
+                "ocr": pipe.stats}
+
+    def _save_pages(self, files: Dict[str, Dict[str, Any]], pages: List[Dict[str, Any]], next_id: int) -> None:
+        """Stránky → colstore tabulka + BM25 nad ní; starší meta.json/store.npy se pak smažou."""
+        ids = np.array([p["id"] for p in pages], dtype="int64")
+        gen = colstore.write_table(self.cols_path, {
+            "id": ids,
+            "id_order": np.argsort(ids, kind="stable").astype("int64"),
+            "page": np.array([p["page"] for p in pages], dtype="int32"),
+            "ocr": np.array([bool(p.get("ocr")) for p in pages], dtype="uint8"),
+            "file": [p["file"] for p in pages],
+            "path": [p.get("path") or "" for p in pages],
+            "text": [p.get("text") or "" for p in pages],
+            "tags": ["\n".join(p.get("tags", [])) for p in pages],
+        }, extra={"version": META_VERSION, "model": EMBED_MODEL, "next_id": next_id, "files": files})
+        # název souboru nese číslo výkresu (91000_TSW_CIP) → hledá se i podle něj
+        write_bm25(self.bm25_path, (f"{p['file']}\n{p.get('text') or ''}" for p in pages), source=gen)
+        for legacy in (self.meta_path, self.store_path):
+            try:
+                os.remove(legacy)
+            except OSError:
+                pass
 
-    # ===== Vyhledávání =====
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        self._lazy_load()
-        if not self.index or self.vectors is None or not len(self.meta):
-            return []
+    # ===== Načtení / výměna stavu =====
+    def _sig(self) -> FileSig:
+        out = []
+        for p in (self.index_path, self.meta_path):
+            try:
+                st = os.stat(p)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        out.insert(1, colstore.table_signature(self.cols_path))
+        out.append(colstore.table_signature(self.bm25_path))
+        return tuple(out)
+
+    def _make_state(self, index, pages: Pages, files, model, next_id, sig: FileSig) -> IndexState:
+        # BM25 jen když patří k právě načtené generaci stran (starší meta.json → bez BM25)
+        lexical = None
+        if isinstance(pages, PageTable):
+            lexical = open_bm25(self.bm25_path, source=pages.table.gen)
+            if lexical is not None and lexical.docs != len(pages):
+                lexical = None
+        return IndexState(index, pages, files, model, next_id, pages.tag_index(), lexical,
+                          sig, self._state.generation + 1)
+
+    def _swap(self, index) -> None:
+        """Po zápisu souborů: nový stav z právě zapsané tabulky (index už v paměti)."""
+        with self._load_lock:
+            sig = self._sig()
+            table = colstore.open_table(self.cols_path) if index is not None else None
+            if table is None:
+                self._state = self._make_state(None, PageList([]), {}, None, 0, sig)
+                return
+            extra = table.extra
+            self._state = self._make_state(index, PageTable(table), extra.get("files", {}),
+                                           extra.get("model"), int(extra.get("next_id", 0)), sig)
+
+    def _load_legacy(self) -> Optional[Tuple[PageList, Dict[str, Any]]]:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as fr:
+                data = json.load(fr)
+        except Exception:
+            return None
+        if isinstance(data, list):
+            # seznam stran, id = pozice; soubory bez sha1 se při příštím
+            # reindexu jednou přeembedují
+            for i, p in enumerate(data):
+                p.setdefault("id", i)
+            return PageList(data), {}
+        return PageList(data.get("pages", [])), data
+
+    def _load(self, sig: FileSig) -> Optional[IndexState]:
+        """Načte soubory indexu; None = rozepsané/nekonzistentní (zkusí se při dalším volání)."""
+        if sig[0] is None or (sig[1] is None and sig[2] is None):
+            return self._make_state(None, PageList([]), {}, None, 0, sig)
+        try:
+            index = faiss.read_index(self.index_path)
+        except Exception:
+            return None
+        if sig[1] is not None:
+            table = colstore.open_table(self.cols_path)
+            if table is None:
+                return None
+            pages: Pages = PageTable(table)
+            extra = table.extra
+        else:
+            legacy = self._load_legacy()
+            if legacy is None:
+                return None
+            pages, extra = legacy
+        if not isinstance(index, faiss.IndexIDMap2):
+            # starý IndexFlatIP (id = pozice) → vektory přímo z indexu, store.npy netřeba
+            flat = index
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(flat.d))
+            if flat.ntotal == len(pages):
+                index.add_with_ids(flat.reconstruct_n(0, flat.ntotal), pages.ids)
+        # index a metadata se zapisují postupně (jiný worker) → ověř, že k sobě patří
+        if index.ntotal != len(pages):
+            return None
+        if not np.array_equal(np.sort(faiss.vector_to_array(index.id_map)), np.sort(pages.ids)):
+            return None
+        next_id = max(int(pages.ids.max()) + 1 if len(pages) else 0, int(extra.get("next_id", 0)))
+        return self._make_state(index, pages, extra.get("files", {}), extra.get("model"), next_id, sig)
+
+    def _lazy_load(self) -> IndexState:
+        """
+        Aktuální stav; znovu načte (jednou, pod zámkem), když se soubory změnily.
+        Nekonzistentní soubory se nečtou znovu, dokud se jejich podpis nezmění –
+        do té doby se vrací starý stav.
+        """
+        st = self._state
+        sig = self._sig()
+        if st.sig == sig or sig == self._bad_sig:
+            return st
+        with self._load_lock:
+            st = self._state
+            if st.sig == sig or sig == self._bad_sig:
+                return st
+            loaded = self._load(sig)
+            if loaded is None:
+                self._bad_sig = sig
+                return st
+            self._bad_sig = None
+            self._state = loaded
+            return loaded
 
-        qvec = self._embed([query]).astype("float32")
+    # ===== Vyhledávání =====
+    def _dense(self, st: IndexState, query: str, k: int) -> List[Tuple[int, float]]:
+        qvec = self._embed_query(query).astype("float32")
         faiss.normalize_L2(qvec)
-        scores, idxs = self.index.search(qvec, top_k)
+        scores, ids = st.index.search(qvec, k)
+        out = []
+        for score, pid in zip(scores[0].tolist(), ids[0].tolist()):
+            row = st.meta.row_of(pid) if pid != -1 else None
+            if row is not None:
+                out.append((row, float(score)))
+        return out
 
+    def search(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        mode: auto (default PID_SEARCH_MODE) | hybrid | dense | lexical.
+        score = kosinová podobnost (dense), BM25 (lexical), RRF (hybrid).
+        """
+        st = self._lazy_load()
+        if st.index is None or not len(st.meta):
+            return []
+
+        used, hits = retrieve(query, top_k, mode or PID_SEARCH_MODE, st.lexical,
+                              lambda k: self._dense(st, query, k))
         out = []
-        for score, idx in zip(scores[0].tolist(), idxs[0].tolist()):
-            if idx == -1:
-                continue
-            m = self.meta[idx]
+        for row, score in hits:
+            m = st.meta[row]
             snippet = (m["text"][:220] + "…") if len(m["text"]) > 240 else m["text"]
             out.append({
                 "file": m["file"],
                 "page": m["page"],
-                "score": float(score),
+                "score": score,
                 "snippet": snippet,
                 "tags": m.get("tags", []),
                 "ocr": m.get("ocr", False),
+                "mode": used,
             })
         return out
 
     # ===== Najdi tag =====
     def find_tag(self, tag: str) -> List[Dict[str, Any]]:
-        self._lazy_load()
-        if not self.meta:
-            return []
-
+        st = self._lazy_load()
         matches = []
-        tag_upper = tag.strip().upper()
-        for page in self.meta:
-            if tag_upper in [t.upper() for t in page.get("tags", [])]:
-                snippet = (page["text"][:220] + "…") if len(page["text"]) > 240 else page["text"]
-                matches.append({
-                    "file": page["file"],
-                    "page": page["page"],
-                    "snippet": snippet,
-                    "ocr": page.get("ocr", False),
-                    "tags": page.get("tags", []),
-                })
+        for i in st.tags.get(tag.strip().upper(), ()):
+            page = st.meta[i]
+            snippet = (page["text"][:220] + "…") if len(page["text"]) > 240 else page["text"]
+            matches.append({
+                "file": page["file"],
+                "page": page["page"],
+                "snippet": snippet,
+                "ocr": page.get("ocr", False),
+                "tags": page.get("tags", []),
+            })
         return matches
@@ -0,0 +1,441 @@
+# backend/services/drawing_index.py
+"""
+Perzistentní index textu elektro výkresů (data/electrical) v SQLite.
+
+Tabulky:
+- files    : PDF (cesta relativní k ROOT), velikost, mtime_ns, sha1, počet stran
+- pages    : text každé strany + normalizovaný text (bez whitespace, uppercase)
+- postings : invertovaný index token → (soubor, strana, offset v textu strany)
+- words    : slova strany + jejich obdélníky (PDF body) jako float32 pole →
+             zvýraznění tagu v náhledu bez search_for()
+
+Obnova je inkrementální: nezměněná velikost+mtime → soubor se přeskočí;
+změněné metadata, ale stejný sha1 → jen se aktualizují metadata; jinak se
+strany soubor znovu vytěží. Smazané PDF se z indexu odstraní.
+
+Indexaci spouští scripts/build_drawing_index.py; tools.find_electrical_drawing
+čte z indexu a živě prohledává jen soubory, které v něm (aktuální) nejsou.
+"""
+
+import hashlib
+import json
+import os
+from array import array
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .iodb import SQLiteReadPool, file_signature
+from .pdf_text import iter_pdf_page_layout
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ELECTRICAL_DIR = os.getenv("ELECTRICAL_DIR", os.path.join(ROOT, "data", "electrical"))
+ELECTRICAL_INDEX_PATH = os.getenv(
+    "ELECTRICAL_INDEX_PATH", os.path.join(ROOT, "data", "electrical_index.db")
+)
+
+# tokeny: alfanumerické úseky spojené - _ . (např. 91002VA005, -K1.2, X1_3)
+TOKEN_RE = re.compile(r"[0-9A-Za-z]+(?:[-_.][0-9A-Za-z]+)*")
+
+# zvýšit při změně schématu → starý index se při další obnově postaví znovu
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  id         INTEGER PRIMARY KEY,
+  path       TEXT NOT NULL UNIQUE,   -- relativně k ROOT, '/' oddělovače
+  size       INTEGER NOT NULL,
+  mtime_ns   INTEGER NOT NULL,
+  sha1       TEXT NOT NULL,
+  pages      INTEGER NOT NULL,
+  indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+  file_id INTEGER NOT NULL,
+  page    INTEGER NOT NULL,          -- 0-index
+  text    TEXT NOT NULL,
+  norm    TEXT NOT NULL,
+  PRIMARY KEY (file_id, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+  token   TEXT NOT NULL,
+  file_id INTEGER NOT NULL,
+  page    INTEGER NOT NULL,
+  offset  INTEGER NOT NULL,
+  PRIMARY KEY (token, file_id, page, offset)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_file ON postings(file_id);
+CREATE TABLE IF NOT EXISTS words (
+  file_id INTEGER NOT NULL,
+  page    INTEGER NOT NULL,
+  width   REAL NOT NULL,             -- rozměr stránky v PDF bodech
+  height  REAL NOT NULL,
+  words   TEXT NOT NULL,             -- slova (uppercase), jedno na řádek
+  boxes   BLOB NOT NULL,             -- array('f'): x0,y0,x1,y1 pro každé slovo
+  PRIMARY KEY (file_id, page)
+) WITHOUT ROWID;
+"""
+
+
+def norm_text(s: str) -> str:
+    """Stejná normalizace jako tools._norm_tag (bez whitespace, uppercase)."""
+    return "".join((s or "").split()).upper()
+
+
+def rel_path(abs_path: str) -> str:
+    return os.path.relpath(abs_path, ROOT).replace("\\", "/")
+
+
+def sha1_file(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bufsize), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def iter_pdfs(base: str) -> Iterator[str]:
+    """Absolutní cesty PDF pod `base` (stejné pořadí jako os.walk)."""
+    for root, _, files in os.walk(base):
+        for fn in files:
+            if fn.lower().endswith(".pdf"):
+                yield os.path.join(root, fn)
+
+
+Rect = Tuple[float, float, float, float]
+Matrix = Tuple[float, float, float, float, float, float]  # (a, b, c, d, e, f) jako fitz.Matrix
+
+
+def transform_rect(r: Rect, m: Matrix) -> Rect:
+    """
+    Obálka obdélníku po afinní transformaci `m`. Slova i pg.search_for() jsou
+    v neotočených souřadnicích strany, náhled (pixmapa, dlaždice) je otočený
+    podle /Rotate → přepočet přes pg.rotation_matrix.
+    """
+    a, b, c, d, e, f = m
+    xs = [a * x + c * y + e for x in (r[0], r[2]) for y in (r[1], r[3])]
+    ys = [b * x + d * y + f for x in (r[0], r[2]) for y in (r[1], r[3])]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class PageWords:
+    """Slova jedné strany s obdélníky (z tabulky words)."""
+
+    __slots__ = ("width", "height", "words", "boxes")
+
+    def __init__(self, width: float, height: float, words: List[str], boxes: array):
+        self.width = width
+        self.height = height
+        self.words = words
+        self.boxes = boxes
+
+    def rect(self, i: int) -> Rect:
+        b = self.boxes
+        return (b[4 * i], b[4 * i + 1], b[4 * i + 2], b[4 * i + 3])
+
+    def find(self, needle_norm: str) -> List[Rect]:
+        """
+        Obdélníky výskytů normalizovaného tagu. Tag může být uvnitř slova
+        (např. '=A1-91002VA005') nebo rozdělený mezerou do více slov – pak se
+        vrátí sjednocení jejich obdélníků.
+        """
+        out: List[Rect] = []
+        if not needle_norm:
+            return out
+        words = self.words
+        n = len(words)
+        for i, w in enumerate(words):
+            if needle_norm in w:
+                out.append(self.rect(i))
+                continue
+            # nejdelší přípona slova, která je začátkem tagu → zkus navázat další slova
+            acc = next((w[k:] for k in range(len(w)) if needle_norm.startswith(w[k:])), "")
+            j = i
+            while acc and len(acc) < len(needle_norm) and j + 1 < n:
+                j += 1
+                acc += words[j]
+                if acc.startswith(needle_norm):
+                    x0, y0, x1, y1 = self.rect(i)
+                    for t in range(i + 1, j + 1):
+                        r = self.rect(t)
+                        x0, y0 = min(x0, r[0]), min(y0, r[1])
+                        x1, y1 = max(x1, r[2]), max(y1, r[3])
+                    out.append((x0, y0, x1, y1))
+                    break
+                if not needle_norm.startswith(acc):
+                    break
+        return out
+
+
+def _pack_words(words: List[Tuple[float, float, float, float, str]]) -> Tuple[str, bytes]:
+    boxes = array("f")
+    texts = []
+    for x0, y0, x1, y1, t in words:
+        t = norm_text(t)
+        if not t:
+            continue
+        texts.append(t)
+        boxes.extend((x0, y0, x1, y1))
+    return "\n".join(texts), boxes.tobytes()
+
+
+class DrawingIndex:
+    """Čtení i inkrementální obnova indexu výkresů."""
+
+    def __init__(self, db_path: str = ELECTRICAL_INDEX_PATH):
+        self.db_path = db_path
+        # index se přepisuje na místě (WAL) → bez immutable
+        self._pool = SQLiteReadPool(db_path, immutable=False)
+        self._write_lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return file_signature(self.db_path) is not None
+
+    # =======================
+    #        ZÁPIS
+    # =======================
+    def _connect_rw(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+        ver = con.execute("PRAGMA user_version").fetchone()[0]
+        if ver < SCHEMA_VERSION:
+            # starší index (bez words) → zahodit, obnova vše vytěží znovu
+            con.executescript(
+                "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS pages;"
+                "DROP TABLE IF EXISTS words; DROP TABLE IF EXISTS files;"
+            )
+        con.executescript(SCHEMA)
+        if ver < SCHEMA_VERSION:
+            con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return con
+
+    @staticmethod
+    def _delete_file(cur: sqlite3.Cursor, file_id: int) -> None:
+        cur.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        cur.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+        cur.execute("DELETE FROM words WHERE file_id = ?", (file_id,))
+        cur.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    @staticmethod
+    def _index_pages(cur: sqlite3.Cursor, file_id: int, pdf: str,
+                     max_pages: Optional[int]) -> int:
+        n = 0
+        for pidx, text, layout in iter_pdf_page_layout(pdf, max_pages):
+            cur.execute(
+                "INSERT INTO pages(file_id, page, text, norm) VALUES(?,?,?,?)",
+                (file_id, pidx, text, norm_text(text)),
+            )
+            if layout is not None:
+                width, height, words = layout
+                wtext, boxes = _pack_words(words)
+                cur.execute(
+                    "INSERT INTO words(file_id, page, width, height, words, boxes) VALUES(?,?,?,?,?,?)",
+                    (file_id, pidx, width, height, wtext, boxes),
+                )
+            postings = {}
+            for m in TOKEN_RE.finditer(text):
+                postings.setdefault((m.group(0).upper(), m.start()), None)
+            cur.executemany(
+                "INSERT OR IGNORE INTO postings(token, file_id, page, offset) VALUES(?,?,?,?)",
+                [(tok, file_id, pidx, off) for tok, off in postings],
+            )
+            n += 1
+        return n
+
+    def refresh(self, base: Optional[str] = None, max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """Inkrementálně sesynchronizuje index s PDF pod `base` (default data/electrical)."""
+        base = os.path.abspath(base or ELECTRICAL_DIR)
+        base_rel = rel_path(base)
+        stats = {"scanned": 0, "added": 0, "updated": 0, "touched": 0,
+                 "unchanged": 0, "removed": 0, "pages": 0}
+        t0 = time.perf_counter()
+
+        with self._write_lock:
+            con = self._connect_rw()
+            try:
+                cur = con.cursor()
+                known: Dict[str, Tuple[int, int, int, str]] = {
+                    p: (fid, size, mt, sha)
+                    for fid, p, size, mt, sha in cur.execute(
+                        "SELECT id, path, size, mtime_ns, sha1 FROM files"
+                    )
+                }
+                seen = set()
+                for pdf in iter_pdfs(base):
+                    rel = rel_path(pdf)
+                    seen.add(rel)
+                    stats["scanned"] += 1
+                    try:
+                        st = os.stat(pdf)
+                    except OSError:
+                        continue
+                    prev = known.get(rel)
+                    if prev and prev[1] == st.st_size and prev[2] == st.st_mtime_ns:
+                        stats["unchanged"] += 1
+                        continue
+
+                    sha = sha1_file(pdf)
+                    if prev and prev[3] == sha:
+                        cur.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?",
+                                    (st.st_size, st.st_mtime_ns, prev[0]))
+                        con.commit()
+                        stats["touched"] += 1
+                        continue
+
+                    # nový nebo změněný obsah → (pře)indexuj v jedné transakci
+                    if prev:
+                        self._delete_file(cur, prev[0])
+                    cur.execute(
+                        "INSERT INTO files(path, size, mtime_ns, sha1, pages, indexed_at) VALUES(?,?,?,?,0,?)",
+                        (rel, st.st_size, st.st_mtime_ns, sha, time.time()),
+                    )
+                    fid = cur.lastrowid
+                    n = self._index_pages(cur, fid, pdf, max_pages)
+                    cur.execute("UPDATE files SET pages = ? WHERE id = ?", (n, fid))
+                    con.commit()
+                    stats["pages"] += n
+                    stats["updated" if prev else "added"] += 1
+
+                # smazané soubory (jen pod aktuální `base`)
+                for rel, (fid, *_rest) in known.items():
+                    under = base_rel in (".", "") or rel == base_rel or rel.startswith(base_rel + "/")
+                    if under and rel not in seen:
+                        self._delete_file(cur, fid)
+                        stats["removed"] += 1
+                con.commit()
+            finally:
+                con.close()
+
+        stats["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+        return stats
+
+    # =======================
+    #        ČTENÍ
+    # =======================
+    def file_stats(self) -> Dict[str, Tuple[int, int]]:
+        """rel cesta → (size, mtime_ns) indexovaných souborů."""
+        if not self.exists():
+            return {}
+        return {
+            p: (size, mt)
+            for p, size, mt in self._pool.query_tuples("SELECT path, size, mtime_ns FROM files")
+        }
+
+    def page_words(self, rel: str, page: int, check_fresh: bool = True) -> Optional[PageWords]:
+        """
+        Slova + obdélníky strany (0-index) nebo None – soubor není v indexu,
+        strana nemá souřadnice (pypdf fallback) nebo se PDF od indexace změnilo.
+        """
+        if not self.exists():
+            return None
+        try:
+            rows = self._pool.query_tuples(
+                """
+                SELECT f.size, f.mtime_ns, w.width, w.height, w.words, w.boxes
+                FROM files f JOIN words w ON w.file_id = f.id
+                WHERE f.path = ? AND w.page = ?
+                """,
+                (rel, page),
+            )
+        except sqlite3.Error:
+            return None
+        if not rows:
+            return None
+        size, mt, width, height, wtext, blob = rows[0]
+        if check_fresh:
+            try:
+                st = os.stat(os.path.join(ROOT, rel))
+            except OSError:
+                return None
+            if (st.st_size, st.st_mtime_ns) != (size, mt):
+                return None
+        boxes = array("f")
+        boxes.frombytes(blob)
+        return PageWords(width, height, wtext.split("\n") if wtext else [], boxes)
+
+    def lookup(self, needle_norm: str, files: Optional[set] = None,
+               limit: int = 20, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Strany, kde se vyskytuje normalizovaný tag.
+        1) token z invertovaného indexu (+ offset pro snippet): přesně tag,
+           nebo tag s příponou za oddělovačem (TOKEN_RE drží -_. uvnitř
+           tokenu, takže "91002VA005-Y1" i "91002VA005.S1" jsou samostatné
+           tokeny) – rozsahový dotaz nad PK postings,
+        2) jen když 1) nic nenajde: podřetězec v normalizovaném textu (tag
+           rozdělený mezerou apod.) – sken stran, ukončený po `limit` nálezech.
+        `files` omezí výsledky na dané rel cesty (např. jen aktuální soubory),
+        `max_pages` na strany 0 … max_pages-1; oba filtry jdou do SQL, takže
+        `limit` platí až pro vyhovující strany.
+        """
+        if not needle_norm or not self.exists() or limit <= 0:
+            return []
+        where: List[str] = []
+        params: List[Any] = []
+        if files is not None:
+            if not files:
+                return []
+            where.append("f.path IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(sorted(files)))
+        if max_pages is not None:
+            where.append("p.page < ?")
+            params.append(int(max_pages))
+        extra = "".join(f" AND {w}" for w in where)
+
+        rows = self._pool.query(
+            f"""
+            SELECT f.path AS file, p.page AS page, p.text AS text, MIN(ps.offset) AS offset
+            FROM postings ps
+            JOIN files f ON f.id = ps.file_id
+            JOIN pages p ON p.file_id = ps.file_id AND p.page = ps.page
+            WHERE ps.token >= ? AND ps.token < ? || char(0x10FFFF)
+              AND (length(ps.token) = ? OR substr(ps.token, ?, 1) IN ('-', '_', '.')){extra}
+            GROUP BY ps.file_id, ps.page
+            ORDER BY f.path, p.page
+            LIMIT ?
+            """,
+            (needle_norm, needle_norm, len(needle_norm), len(needle_norm) + 1, *params, int(limit)),
+        )
+        if rows:
+            return rows
+
+        return self._pool.query(
+            f"""
+            SELECT f.path AS file, p.page AS page, p.text AS text, NULL AS offset
+            FROM pages p JOIN files f ON f.id = p.file_id
+            WHERE instr(p.norm, ?) > 0{extra}
+            ORDER BY f.path, p.page
+            LIMIT ?
+            """,
+            (needle_norm, *params, int(limit)),
+        )
+
+
+def page_words_live(pdf: str, page: int) -> Optional[PageWords]:
+    """Slova + obdélníky strany (0-index) přímo z PDF – pro soubory mimo index."""
+    for _, _, layout in iter_pdf_page_layout(pdf, page + 1, page):
+        if layout is None:
+            return None
+        width, height, words = layout
+        wtext, blob = _pack_words(words)
+        boxes = array("f")
+        boxes.frombytes(blob)
+        return PageWords(width, height, wtext.split("\n") if wtext else [], boxes)
+    return None
+
+
+_INDEX: Optional[DrawingIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_drawing_index() -> DrawingIndex:
+    """Sdílená instance indexu (jedna na proces)."""
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = DrawingIndex()
+    return _INDEX
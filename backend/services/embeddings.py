@@ -0,0 +1,462 @@
+# backend/services/embeddings.py
+"""
+Sdílená embedding služba pro všechny indexery i dotazy (PIDRAG, RagStore,
+/logic, ingest_hwf, scripts/build_rag.py).
+
+- perzistentní cache vektorů v SQLite (data/embed_cache.db, WAL + mmap),
+  klíč (model, dimenze, sha256 textu) → opakovaný rebuild platí jen za
+  změněné texty; read-only data/ → cache jen v paměti procesu,
+- LRU v paměti pro dotazy (embed_query) → opakovaná otázka nejde ani do SQLite,
+- souběžné dotazy (víc chatů najednou) sdružuje EmbeddingCoalescer: čeká
+  EMBED_COALESCE_WINDOW_MS od prvního dotazu nebo do EMBED_COALESCE_MAX_BATCH
+  dotazů a pošle je jedním requestem → méně round tripů a requestů pod zátěží,
+- dávky podle počtu vstupů (EMBED_BATCH_SIZE) i tokenů (EMBED_BATCH_TOKENS;
+  tokeny přes tiktoken, bez něj odhad z délky textu), dávky běží souběžně
+  (EMBED_CONCURRENCY vláken),
+- statistiky: requesty, tokeny, cena v USD, hity cache, ušetřené tokeny,
+  latence requestů p50/p95 (GET /health/embeddings).
+
+Použití: get_embedding_service().embed(texts, model) → (n, d) float32,
+embed_query(text, model) → (d,) float32 (aembed_query pro async kód).
+Vrácená pole jsou kopie (volající je smí normalizovat na místě).
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import tiktoken  # type: ignore
+except Exception:
+    tiktoken = None
+
+from openai import OpenAI
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(ROOT, "data", "embed_cache.db"))
+EMBED_CACHE_ENABLE = os.getenv("EMBED_CACHE_ENABLE", "true").lower() == "true"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))           # API max 2048 vstupů
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))    # API max 300k tokenů / request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_QUERY_LRU = int(os.getenv("EMBED_QUERY_LRU", "2048"))
+EMBED_STATS_WINDOW = int(os.getenv("EMBED_STATS_WINDOW", "1000"))      # latence posledních N requestů
+EMBED_COALESCE_WINDOW_MS = float(os.getenv("EMBED_COALESCE_WINDOW_MS", "5"))   # 0 = vypnuto
+EMBED_COALESCE_MAX_BATCH = int(os.getenv("EMBED_COALESCE_MAX_BATCH", "64"))
+
+# USD za 1M tokenů (ceník OpenAI); neznámý model se počítá za 0
+PRICE_PER_MTOK = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+  model   TEXT NOT NULL,
+  dims    INTEGER NOT NULL,         -- 0 = výchozí dimenze modelu
+  sha     TEXT NOT NULL,            -- sha256 textu
+  vec     BLOB NOT NULL,            -- float32
+  created REAL NOT NULL,
+  PRIMARY KEY (model, dims, sha)
+) WITHOUT ROWID;
+"""
+
+
+def text_sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+QueryKey = Tuple[str, int, int]    # (model, dims, id klienta)
+
+
+class EmbeddingCoalescer:
+    """
+    Micro-batching dotazových embeddingů: vlákna volající submit() dostanou
+    Future; dispečer (daemon vlákno) čeká window_ms od prvního čekajícího
+    dotazu nebo do max_batch dotazů, pak je po skupinách (model, dims, klient)
+    pošle jedním voláním EmbeddingService.embed a vektory rozdá čekajícím.
+    """
+
+    def __init__(self, service: "EmbeddingService", window_ms: float = EMBED_COALESCE_WINDOW_MS,
+                 max_batch: int = EMBED_COALESCE_MAX_BATCH, workers: int = EMBED_CONCURRENCY):
+        self.service = service
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[QueryKey, str, Optional[OpenAI], Future]] = []
+        self._first = 0.0
+        self._thread: Optional[threading.Thread] = None
+        # odeslání dávky neblokuje sbírání další
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed-coalesce")
+        self._stats = {"batches": 0, "queries": 0, "requests_saved": 0, "max_seen": 0}
+
+    def submit(self, text: str, model: str, dims: Optional[int] = None,
+               client: Optional[OpenAI] = None) -> "Future[np.ndarray]":
+        fut: "Future[np.ndarray]" = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-coalescer", daemon=True)
+                self._thread.start()
+            if not self._queue:
+                self._first = time.monotonic()
+            self._queue.append(((model, int(dims or 0), id(client)), text, client, fut))
+            self._cond.notify()
+        return fut
+
+    def embed(self, text: str, model: str, dims: Optional[int] = None,
+              client: Optional[OpenAI] = None) -> np.ndarray:
+        return self.submit(text, model, dims, client).result()
+
+    async def aembed(self, text: str, model: str, dims: Optional[int] = None,
+                     client: Optional[OpenAI] = None) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(text, model, dims, client))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = self._first + self.window
+                while len(self._queue) < self.max_batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                items = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+                if self._queue:
+                    self._first = time.monotonic()
+            self._pool.submit(self._flush, items)
+
+    def _flush(self, items: List[Tuple[QueryKey, str, Optional[OpenAI], Future]]) -> None:
+        groups: Dict[QueryKey, List[Tuple[QueryKey, str, Optional[OpenAI], Future]]] = {}
+        for it in items:
+            # zrušené (aembed s cancel) přeskočit; ostatní přejdou do RUNNING → už nejdou zrušit
+            if it[3].set_running_or_notify_cancel():
+                groups.setdefault(it[0], []).append(it)
+        for (model, dims, _), group in groups.items():
+            try:
+                texts = list(dict.fromkeys(text for _, text, _, _ in group))
+                vecs = self.service.embed(texts, model, dims, group[0][2])
+                pos = {t: i for i, t in enumerate(texts)}
+                for _, text, _, fut in group:
+                    fut.set_result(vecs[pos[text]].copy())
+            except BaseException as e:
+                # každý čekající musí dostat výsledek, jinak embed() visí na .result()
+                for _, _, _, fut in group:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["queries"] += len(group)
+                self._stats["requests_saved"] += len(group) - 1
+                self._stats["max_seen"] = max(self._stats["max_seen"], len(group))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            st = dict(self._stats)
+            pending = len(self._queue)
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "pending": pending,
+            **st,
+            "avg_batch": round(st["queries"] / st["batches"], 2) if st["batches"] else None,
+        }
+
+
+class EmbeddingService:
+    """Embeddingy přes OpenAI API s cache; bezpečná pro více vláken."""
+
+    def __init__(
+        self,
+        db_path: str = EMBED_CACHE_PATH,
+        enable_cache: bool = EMBED_CACHE_ENABLE,
+        batch_size: int = EMBED_BATCH_SIZE,
+        batch_tokens: int = EMBED_BATCH_TOKENS,
+        concurrency: int = EMBED_CONCURRENCY,
+        query_lru: int = EMBED_QUERY_LRU,
+        coalesce_window_ms: float = EMBED_COALESCE_WINDOW_MS,
+        coalesce_max_batch: int = EMBED_COALESCE_MAX_BATCH,
+        client: Optional[OpenAI] = None,
+    ):
+        self.db_path = db_path
+        self.enable_cache = enable_cache
+        self.batch_size = max(1, min(2048, batch_size))
+        self.batch_tokens = max(1, batch_tokens)
+        self.concurrency = max(1, concurrency)
+        self.query_lru = max(0, query_lru)
+        self._client = client
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[Tuple[str, int, str], np.ndarray]" = OrderedDict()
+        self._enc: Any = None
+        self._enc_lock = threading.Lock()
+        self._enc_ok = tiktoken is not None
+        self._latency: Deque[float] = deque(maxlen=EMBED_STATS_WINDOW)
+        self._models: Dict[str, Dict[str, float]] = {}
+        self._counts = {"lru_hits": 0, "db_hits": 0, "misses": 0, "saved_tokens": 0, "saved_cost_usd": 0.0}
+        self.coalescer: Optional[EmbeddingCoalescer] = None
+        if coalesce_window_ms > 0 and coalesce_max_batch > 1:
+            self.coalescer = EmbeddingCoalescer(self, coalesce_window_ms, coalesce_max_batch, self.concurrency)
+
+    # ===== OpenAI klient / tokeny =====
+    def client(self) -> OpenAI:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI()
+        return self._client
+
+    def count_tokens(self, text: str) -> int:
+        if self._enc_ok and self._enc is None:
+            with self._enc_lock:
+                if self._enc_ok and self._enc is None:
+                    try:
+                        # text-embedding-3-* i ada-002 používají cl100k_base
+                        self._enc = tiktoken.get_encoding("cl100k_base")
+                    except Exception:
+                        # bez sítě se BPE soubor nestáhne → odhad
+                        self._enc_ok = False
+        if self._enc is not None:
+            return len(self._enc.encode(text, disallowed_special=()))
+        return len(text) // 3 + 1
+
+    # ===== SQLite cache =====
+    def _con(self) -> Optional[sqlite3.Connection]:
+        if not self.enable_cache:
+            return None
+        con = getattr(self._local, "con", None)
+        if con is None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+                con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                      check_same_thread=False)
+                con.execute("PRAGMA journal_mode = WAL")
+                con.execute("PRAGMA synchronous = NORMAL")
+                con.execute("PRAGMA mmap_size = 268435456")
+                con.executescript(SCHEMA)
+            except (OSError, sqlite3.Error):
+                # read-only data/ → bez perzistentní cache
+                return None
+            self._local.con = con
+        return con
+
+    def _db_get(self, model: str, dims: int, shas: List[str]) -> Dict[str, np.ndarray]:
+        con = self._con()
+        found: Dict[str, np.ndarray] = {}
+        if con is None or not shas:
+            return found
+        try:
+            for i in range(0, len(shas), 500):
+                chunk = shas[i:i + 500]
+                q = (f"SELECT sha, vec FROM embeddings WHERE model = ? AND dims = ? "
+                     f"AND sha IN ({','.join('?' * len(chunk))})")
+                for sha, blob in con.execute(q, [model, dims, *chunk]):
+                    found[sha] = np.frombuffer(blob, dtype="float32")
+        except sqlite3.Error:
+            pass
+        return found
+
+    def _db_put(self, model: str, dims: int, items: List[Tuple[str, np.ndarray]]) -> None:
+        con = self._con()
+        if con is None or not items:
+            return
+        now = time.time()
+        try:
+            con.execute("BEGIN")
+            con.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, dims, sha, vec, created) VALUES(?,?,?,?,?)",
+                [(model, dims, sha, v.astype("float32").tobytes(), now) for sha, v in items],
+            )
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            try:
+                con.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    # ===== API =====
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        out: List[List[int]] = []
+        cur: List[int] = []
+        cur_tokens = 0
+        for i, text in enumerate(texts):
+            n = self.count_tokens(text)
+            if cur and (len(cur) >= self.batch_size or cur_tokens + n > self.batch_tokens):
+                out.append(cur)
+                cur, cur_tokens = [], 0
+            cur.append(i)
+            cur_tokens += n
+        if cur:
+            out.append(cur)
+        return out
+
+    def _request(self, client: OpenAI, model: str, dims: int, batch: List[str]) -> np.ndarray:
+        kwargs: Dict[str, Any] = {"model": model, "input": batch}
+        if dims:
+            kwargs["dimensions"] = dims
+        t0 = time.perf_counter()
+        resp = client.embeddings.create(**kwargs)
+        dt = (time.perf_counter() - t0) * 1000.0
+        data = sorted(resp.data, key=lambda d: getattr(d, "index", 0))
+        usage = getattr(resp, "usage", None)
+        tokens = getattr(usage, "prompt_tokens", None) or sum(self.count_tokens(t) for t in batch)
+        with self._lock:
+            self._latency.append(dt)
+            m = self._models.setdefault(model, {"requests": 0, "inputs": 0, "tokens": 0, "cost_usd": 0.0})
+            m["requests"] += 1
+            m["inputs"] += len(batch)
+            m["tokens"] += tokens
+            m["cost_usd"] += tokens * PRICE_PER_MTOK.get(model, 0.0) / 1e6
+        return np.array([d.embedding for d in data], dtype="float32")
+
+    def _fetch(self, client: OpenAI, model: str, dims: int, texts: List[str], shas: List[str]) -> Dict[str, np.ndarray]:
+        """Embedding textů z API po dávkách (souběžně); každá dávka se hned uloží do cache."""
+        batches = self._batches(texts)
+        out: Dict[str, np.ndarray] = {}
+
+        def _store(idx: List[int], vecs: np.ndarray) -> None:
+            items = [(shas[i], vecs[j]) for j, i in enumerate(idx)]
+            out.update(items)
+            self._db_put(model, dims, items)
+
+        if len(batches) == 1 or self.concurrency == 1:
+            for idx in batches:
+                _store(idx, self._request(client, model, dims, [texts[i] for i in idx]))
+            return out
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as ex:
+            futs = [(idx, ex.submit(self._request, client, model, dims, [texts[i] for i in idx]))
+                    for idx in batches]
+            # zápis do SQLite z volajícího vlákna (spojení jsou per-thread)
+            for idx, fut in futs:
+                _store(idx, fut.result())
+        return out
+
+    def embed(self, texts: Sequence[str], model: str, dims: Optional[int] = None,
+              client: Optional[OpenAI] = None) -> np.ndarray:
+        """(n, d) float32 v pořadí `texts`; z API jdou jen texty, které nejsou v cache."""
+        dims = int(dims or 0)
+        if not texts:
+            return np.zeros((0, dims), dtype="float32")
+        shas = [text_sha(t) for t in texts]
+        uniq: Dict[str, str] = dict(zip(shas, texts))
+        cached = self._db_get(model, dims, list(uniq))
+        missing = [s for s in uniq if s not in cached]
+        with self._lock:
+            self._counts["db_hits"] += len(cached)
+            self._counts["misses"] += len(missing)
+        if cached:
+            saved = sum(self.count_tokens(uniq[s]) for s in cached)
+            with self._lock:
+                self._counts["saved_tokens"] += saved
+                self._counts["saved_cost_usd"] += saved * PRICE_PER_MTOK.get(model, 0.0) / 1e6
+        if missing:
+            cached.update(self._fetch(client or self.client(), model, dims,
+                                      [uniq[s] for s in missing], missing))
+        return np.vstack([cached[s] for s in shas]).astype("float32")
+
+    def _lru_get(self, key: Tuple[str, int, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is None:
+                return None
+            self._lru.move_to_end(key)
+            self._counts["lru_hits"] += 1
+            return vec.copy()
+
+    def _lru_put(self, key: Tuple[str, int, str], vec: np.ndarray) -> None:
+        if self.query_lru:
+            with self._lock:
+                self._lru[key] = vec.copy()
+                while len(self._lru) > self.query_lru:
+                    self._lru.popitem(last=False)
+
+    def embed_query(self, text: str, model: str, dims: Optional[int] = None,
+                    client: Optional[OpenAI] = None) -> np.ndarray:
+        """Jeden dotaz (d,) float32; LRU v paměti → (coalescer) → SQLite → API."""
+        key = (model, int(dims or 0), text)
+        vec = self._lru_get(key)
+        if vec is not None:
+            return vec
+        if self.coalescer is not None:
+            vec = self.coalescer.embed(text, model, dims, client)
+        else:
+            vec = self.embed([text], model, dims, client)[0]
+        self._lru_put(key, vec)
+        return vec
+
+    async def aembed_query(self, text: str, model: str, dims: Optional[int] = None,
+                           client: Optional[OpenAI] = None) -> np.ndarray:
+        """embed_query pro async kód – neblokuje event loop."""
+        key = (model, int(dims or 0), text)
+        vec = self._lru_get(key)
+        if vec is not None:
+            return vec
+        if self.coalescer is not None:
+            vec = await self.coalescer.aembed(text, model, dims, client)
+        else:
+            vec = (await asyncio.to_thread(self.embed, [text], model, dims, client))[0]
+        self._lru_put(key, vec)
+        return vec
+
+    # ===== Statistiky =====
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {m: dict(v, cost_usd=round(v["cost_usd"], 6)) for m, v in self._models.items()}
+            counts = dict(self._counts)
+            lat = list(self._latency)
+            lru = len(self._lru)
+        lookups = counts["lru_hits"] + counts["db_hits"] + counts["misses"]
+        entries = db_bytes = None
+        con = self._con()
+        if con is not None:
+            try:
+                entries = con.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                db_bytes = os.path.getsize(self.db_path)
+            except (OSError, sqlite3.Error):
+                pass
+        return {
+            "path": self.db_path,
+            "cache_enabled": con is not None,
+            "entries": entries,
+            "db_bytes": db_bytes,
+            "lru_entries": lru,
+            "requests": sum(int(m["requests"]) for m in models.values()),
+            "tokens": sum(int(m["tokens"]) for m in models.values()),
+            "cost_usd": round(sum(m["cost_usd"] for m in models.values()), 6),
+            **counts,
+            "saved_cost_usd": round(counts["saved_cost_usd"], 6),
+            "hit_ratio": round((counts["lru_hits"] + counts["db_hits"]) / lookups, 4) if lookups else None,
+            "latency_ms": {
+                "p50": round(float(np.percentile(lat, 50)), 1) if lat else None,
+                "p95": round(float(np.percentile(lat, 95)), 1) if lat else None,
+                "max": round(max(lat), 1) if lat else None,
+            },
+            "tokenizer": "tiktoken" if self._enc is not None else "estimate",
+            "models": models,
+            "coalescer": self.coalescer.stats() if self.coalescer is not None else None,
+        }
+
+
+_SERVICE: Optional[EmbeddingService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Sdílená instance (jedna na proces)."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = EmbeddingService()
+    return _SERVICE
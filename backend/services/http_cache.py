@@ -0,0 +1,192 @@
+# backend/services/http_cache.py
+"""
+HTTP cache validátory pro PDF a náhledy.
+
+- silný ETag = sha1 obsahu souboru; hashe se drží v manifestu (SQLite
+  data/http_etags.db, klíč cesta + velikost + mtime_ns) a v paměti →
+  soubor se hashuje jen jednou po každé změně (jen v sync endpointech,
+  které běží v threadpoolu),
+- mounty /data a /previews (CachedStaticFiles) běží na event loopu → ETag
+  jen z velikosti + mtime_ns (stat_etag), žádné čtení souboru,
+- Last-Modified, odpověď 304 na If-None-Match / If-Modified-Since,
+- Range / If-Range (206) obsluhuje starlette FileResponse – dostane náš ETag,
+- Cache-Control podle typu obsahu (CACHE_PDF, CACHE_PREVIEW, … přes env).
+
+Použití: cached_file_response() v endpointech, CachedStaticFiles pro mounty
+/data a /previews.
+"""
+
+import calendar
+import os
+import sqlite3
+import threading
+from email.utils import formatdate, parsedate
+from typing import Dict, Mapping, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+from .drawing_index import sha1_file
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+HTTP_ETAG_DB = os.getenv("HTTP_ETAG_DB", os.path.join(ROOT, "data", "http_etags.db"))
+
+# politiky Cache-Control (no-cache = smí se cachovat, ale vždy revalidovat → 304)
+CACHE_PDF = os.getenv("HTTP_CACHE_PDF", "public, no-cache")
+CACHE_PREVIEW = os.getenv("HTTP_CACHE_PREVIEW", "public, max-age=300, must-revalidate")
+CACHE_STATIC_PREVIEW = os.getenv("HTTP_CACHE_STATIC_PREVIEW", "public, max-age=3600, must-revalidate")
+CACHE_DATA = os.getenv("HTTP_CACHE_DATA", "public, no-cache")
+
+# hlavičky, které se posílají i s 304 (RFC 9110 §15.4.5)
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary", "last-modified")
+
+
+class ETagStore:
+    """sha1 obsahu souborů; paměť → SQLite manifest → výpočet."""
+
+    def __init__(self, db_path: str = HTTP_ETAG_DB):
+        self.db_path = db_path
+        self._mem: Dict[str, Tuple[int, int, str]] = {}
+        self._local = threading.local()
+
+    def _con(self) -> Optional[sqlite3.Connection]:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                con = sqlite3.connect(self.db_path, timeout=5, isolation_level=None,
+                                      check_same_thread=False)
+                con.execute("PRAGMA journal_mode = WAL")
+                con.execute(
+                    "CREATE TABLE IF NOT EXISTS etags ("
+                    " path TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+                    " mtime_ns INTEGER NOT NULL, sha1 TEXT NOT NULL)"
+                )
+            except (OSError, sqlite3.Error):
+                # read-only data/ → jen paměťový cache
+                return None
+            self._local.con = con
+        return con
+
+    def sha1(self, path: str, st: Optional[os.stat_result] = None) -> str:
+        path = os.path.abspath(path)
+        st = st or os.stat(path)
+        m = self._mem.get(path)
+        if m is not None and m[0] == st.st_size and m[1] == st.st_mtime_ns:
+            return m[2]
+        con = self._con()
+        sha = None
+        if con is not None:
+            try:
+                row = con.execute("SELECT size, mtime_ns, sha1 FROM etags WHERE path = ?", (path,)).fetchone()
+                if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                    sha = row[2]
+            except sqlite3.Error:
+                pass
+        if sha is None:
+            sha = sha1_file(path)
+            if con is not None:
+                try:
+                    con.execute("INSERT OR REPLACE INTO etags(path, size, mtime_ns, sha1) VALUES(?,?,?,?)",
+                                (path, st.st_size, st.st_mtime_ns, sha))
+                except sqlite3.Error:
+                    pass
+        self._mem[path] = (st.st_size, st.st_mtime_ns, sha)
+        return sha
+
+
+_STORE: Optional[ETagStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_etag_store() -> ETagStore:
+    """Sdílená instance (jedna na proces)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = ETagStore()
+    return _STORE
+
+
+def stat_etag(st: os.stat_result) -> str:
+    """ETag z velikosti a mtime_ns – bez čtení souboru (pro async handlery)."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def file_etag(path: str, st: Optional[os.stat_result] = None) -> str:
+    """Silný ETag (v uvozovkách) z obsahu souboru."""
+    return f'"{get_etag_store().sha1(path, st)}"'
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: Optional[str],
+                    last_modified: Optional[float] = None) -> bool:
+    """If-None-Match má přednost; If-Modified-Since jen když klient ETag neposlal."""
+    inm = request_headers.get("if-none-match")
+    if inm:
+        if inm.strip() == "*":
+            return True
+        if etag is None:
+            return False
+        # slabé porovnání (RFC 9110 §13.1.2) – W/ prefix ignorujeme
+        return etag in [t.strip().removeprefix("W/") for t in inm.split(",")]
+    ims = request_headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        t = parsedate(ims)
+        if t is not None:
+            return int(last_modified) <= calendar.timegm(t)
+    return False
+
+
+def not_modified_response(headers: Mapping[str, str]) -> Response:
+    return Response(status_code=304,
+                    headers={k: v for k, v in headers.items() if k.lower() in NOT_MODIFIED_HEADERS})
+
+
+def cached_file_response(
+    request_headers: Mapping[str, str],
+    path: str,
+    media_type: Optional[str] = None,
+    cache_control: str = CACHE_PDF,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    content_disposition_type: str = "inline",
+) -> Response:
+    """
+    FileResponse s ETag/Last-Modified/Cache-Control, nebo 304 když klient
+    má aktuální verzi. `etag` lze předat (např. obsahově adresovaný klíč cache),
+    jinak se vezme sha1 obsahu. Range/If-Range řeší FileResponse.
+    """
+    st = os.stat(path)
+    etag = etag or file_etag(path, st)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+    if is_not_modified(request_headers, etag, st.st_mtime):
+        return not_modified_response(headers)
+    return FileResponse(path, media_type=media_type, headers=headers, filename=filename,
+                        stat_result=st, content_disposition_type=content_disposition_type)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles s ETagem z velikosti + mtime a danou Cache-Control politikou.
+    file_response volá starlette synchronně na event loopu → hash obsahu
+    (file_etag) by u studeného cache zablokoval všechny ostatní requesty.
+    """
+
+    def __init__(self, *args, cache_control: str = CACHE_DATA, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        etag = stat_etag(stat_result)
+        headers = {"etag": etag, "cache-control": self.cache_control}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if status_code == 200 and is_not_modified(request_headers, etag, stat_result.st_mtime):
+            return not_modified_response(response.headers)
+        return response
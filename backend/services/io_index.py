@@ -0,0 +1,148 @@
+# backend/services/io_index.py
+"""
+In-memory index tagů z tabulky `io` (data/io.db).
+
+- seřazené pole tagů (uppercase) → prefixové rozsahy přes bisect,
+- dict tag → předpočítané rozdělení na inputs/outputs (dříve _split_io při každém dotazu),
+- při změně io.db (mtime/inode/velikost) se index při dalším přístupu znovu postaví.
+
+Na horké cestě (exact/prefix lookup) se SQLite vůbec nedotýká.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+from .iodb import IO_DB, FileSig, get_pool
+
+IO_COLUMNS = ("tag", "io_type", "address", "datatype", "desc1", "desc2", "comment")
+
+
+def split_io_rows(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Rozdělí I/O řádky na vstupy (E*) a výstupy (A*)."""
+    ins = [r for r in rows if str(r.get("io_type", "")).upper().startswith("E")]
+    outs = [r for r in rows if str(r.get("io_type", "")).upper().startswith("A")]
+
+    def pick(r: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "tag": r.get("tag"),
+            "io_type": r.get("io_type"),
+            "address": r.get("address"),
+            "datatype": r.get("datatype"),
+            "desc1": r.get("desc1"),
+            "desc2": r.get("desc2"),
+            "comment": r.get("comment"),
+        }
+
+    return {"inputs": [pick(r) for r in ins], "outputs": [pick(r) for r in outs]}
+
+
+class _Snapshot:
+    """Neměnný stav indexu – swapuje se atomicky jako celek."""
+
+    __slots__ = ("sig", "keys", "tags", "by_tag", "by_upper", "valves")
+
+    def __init__(self, sig: Optional[FileSig], rows: List[Dict[str, Any]]):
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for r in rows:
+            grouped.setdefault(r["tag"], []).append(r)
+
+        by_upper: Dict[str, List[str]] = {}
+        for t in grouped:
+            by_upper.setdefault(t.upper(), []).append(t)
+
+        pairs: List[Tuple[str, str]] = sorted((t.upper(), t) for t in grouped)
+        self.sig = sig
+        self.keys: List[str] = [u for u, _ in pairs]      # uppercase, seřazené
+        self.tags: List[str] = [t for _, t in pairs]      # originální tvar, stejné pořadí
+        self.by_tag: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+            t: split_io_rows(v) for t, v in grouped.items()
+        }
+        self.by_upper = by_upper
+        # ventily (tag obsahuje 'VA') zvlášť → total i stránky přes bisect bez filtrování
+        self.valves: List[Tuple[str, str]] = [p for p in pairs if "VA" in p[0]]
+
+
+class IOTagIndex:
+    """Tag index nad tabulkou `io` s hot-reloadem podle souboru DB."""
+
+    def __init__(self, db_path: str = IO_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._snap: Optional[_Snapshot] = None
+
+    # ----- načtení / reload -----
+    def _build(self, sig: Optional[FileSig]) -> _Snapshot:
+        pool = get_pool(self.db_path)
+        rows = pool.query(
+            f"SELECT {', '.join(IO_COLUMNS)} FROM io "
+            "WHERE tag IS NOT NULL AND tag <> '' ORDER BY tag, io_type, address"
+        )
+        return _Snapshot(sig, rows)
+
+    def snapshot(self) -> _Snapshot:
+        sig = get_pool(self.db_path).signature()
+        snap = self._snap
+        if snap is not None and snap.sig == sig:
+            return snap
+        with self._lock:
+            snap = self._snap
+            if snap is None or snap.sig != sig:
+                snap = self._build(sig)
+                self._snap = snap
+        return snap
+
+    # ----- dotazy -----
+    def get(self, tag: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Přesná (case-sensitive) shoda tagu → {inputs, outputs} nebo None."""
+        return self.snapshot().by_tag.get(tag)
+
+    def get_ci(self, tag: str) -> List[str]:
+        """Tagy, které se s dotazem shodují bez ohledu na velikost písmen."""
+        return list(self.snapshot().by_upper.get(tag.upper(), []))
+
+    def prefix(self, prefix: str) -> List[str]:
+        """Seřazené tagy začínající na prefix (case-insensitive)."""
+        snap = self.snapshot()
+        p = prefix.upper()
+        lo = bisect_left(snap.keys, p)
+        hi = bisect_left(snap.keys, p + "\U0010ffff", lo)
+        return snap.tags[lo:hi]
+
+    def valve_page(
+        self, prefix: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[str], int, Optional[str]]:
+        """
+        Stránka ventilových tagů (obsahují 'VA') s daným prefixem.
+        Kurzor = poslední tag předchozí stránky. Vrací (tagy, total, next_cursor).
+        """
+        vals = self.snapshot().valves
+        p = prefix.upper()
+        lo = bisect_left(vals, (p, ""))
+        hi = bisect_left(vals, (p + "\U0010ffff", ""), lo)
+        start = lo
+        if cursor:
+            start = max(lo, bisect_right(vals, (cursor.upper(), cursor), lo, hi))
+        end = min(hi, start + max(1, limit))
+        tags = [t for _, t in vals[start:end]]
+        next_cursor = tags[-1] if tags and end < hi else None
+        return tags, hi - lo, next_cursor
+
+    def __len__(self) -> int:
+        return len(self.snapshot().tags)
+
+
+_INDEXES: Dict[str, IOTagIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_tag_index(db_path: str = IO_DB) -> IOTagIndex:
+    """Sdílený index pro danou DB (jeden na proces)."""
+    idx = _INDEXES.get(db_path)
+    if idx is None:
+        with _INDEXES_LOCK:
+            idx = _INDEXES.get(db_path)
+            if idx is None:
+                idx = IOTagIndex(db_path)
+                _INDEXES[db_path] = idx
+    return idx
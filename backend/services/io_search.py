@@ -0,0 +1,165 @@
+# backend/services/io_search.py
+"""
+Substring / typo-tolerantní vyhledávání v I/O listu přes FTS5 trigram index `io_fts`
+(staví ho scripts/build_io_db.py).
+
+- dotaz ≥ 3 znaky: phrase MATCH = přesný podřetězec (case-insensitive), řazeno bm25,
+- málo výsledků: fuzzy fáze – dotaz se rozdělí na 2–3 souvislé kusy (≥ 3 znaky);
+  při 1–2 překlepech aspoň jeden kus sedí přesně (pigeonhole), takže OR přes kusy
+  vybere malou množinu kandidátů i na statisících řádků; ti se pak přeskórují
+  podle sdílených trigramů a podobnosti řetězců,
+- kratší dotaz nebo starší DB bez `io_fts`: fallback na LIKE.
+"""
+
+import os
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .iodb import IO_DB, get_pool
+
+FTS_TABLE = "io_fts"
+SEARCH_COLUMNS = ("tag", "desc1", "desc2", "comment")
+# váhy sloupců pro bm25 (tag je nejdůležitější)
+BM25_WEIGHTS = (10.0, 2.0, 2.0, 1.0)
+FUZZY_MIN_SIMILARITY = float(os.getenv("IO_SEARCH_FUZZY_MIN", "0.6"))
+FUZZY_CANDIDATES = int(os.getenv("IO_SEARCH_FUZZY_CANDIDATES", "200"))
+
+_ROW_COLS = "io.tag, io.io_type, io.address, io.datatype, io.desc1, io.desc2, io.comment"
+
+
+def _fts_phrase(s: str) -> str:
+    return '"' + s.replace('"', '""') + '"'
+
+
+def _trigrams(s: str) -> Set[str]:
+    s = s.lower()
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _pieces(q: str) -> List[str]:
+    """Souvislé kusy dotazu pro fuzzy pre-filtr (každý ≥ 3 znaky)."""
+    n = 3 if len(q) >= 9 else 2 if len(q) >= 6 else 1
+    if n == 1:
+        return sorted(_trigrams(q))
+    step = len(q) / n
+    return [q[round(i * step):round((i + 1) * step)] for i in range(n)]
+
+
+def _similarity(q: str, qgrams: Set[str], row: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    (podíl trigramů dotazu v nejlépe sedícím sloupci, kombinované skóre).
+    Kombinace s SequenceMatcher.ratio rozliší kandidáty se stejným počtem trigramů.
+    """
+    if not qgrams:
+        return 0.0, 0.0
+    best: Tuple[float, float] = (0.0, 0.0)
+    ql = q.lower()
+    for col in SEARCH_COLUMNS:
+        val = row.get(col) or ""
+        if not val:
+            continue
+        contain = len(qgrams & _trigrams(val)) / len(qgrams)
+        if contain < best[0]:
+            continue
+        ratio = SequenceMatcher(None, ql, val.lower()).ratio()
+        best = max(best, (contain, (contain + ratio) / 2))
+    return best
+
+
+def has_fts(db_path: str = IO_DB) -> bool:
+    try:
+        return get_pool(db_path).has_table(FTS_TABLE)
+    except Exception:
+        return False
+
+
+def _like_search(q: str, limit: int, columns, db_path: str) -> List[Dict[str, Any]]:
+    like = f"%{q}%"
+    where = " OR ".join(f"{c} LIKE ?" for c in columns)
+    rows = get_pool(db_path).query(
+        f"SELECT {_ROW_COLS} FROM io WHERE {where} "
+        "ORDER BY (tag LIKE ?) DESC, tag, io_type, address LIMIT ?",
+        (*([like] * len(columns)), like, limit),
+    )
+    for r in rows:
+        r["match"] = "substring"
+        r["score"] = 1.0
+    return rows
+
+
+def _fts_query(match: str, limit: int, db_path: str) -> List[Dict[str, Any]]:
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return get_pool(db_path).query(
+        f"SELECT io.rowid AS _rid, {_ROW_COLS}, bm25({FTS_TABLE}, {weights}) AS _bm25 "
+        f"FROM {FTS_TABLE} JOIN io ON io.rowid = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? ORDER BY _bm25 LIMIT ?",
+        (match, limit),
+    )
+
+
+def search_rows(
+    text: str,
+    limit: int = 20,
+    columns: Optional[List[str]] = None,
+    fuzzy: bool = True,
+    db_path: str = IO_DB,
+) -> List[Dict[str, Any]]:
+    """Seřazené I/O řádky pro dotaz; každý má navíc `match` a `score`."""
+    q = (text or "").strip()
+    if not q:
+        return []
+    cols = [c for c in (columns or SEARCH_COLUMNS) if c in SEARCH_COLUMNS] or list(SEARCH_COLUMNS)
+
+    if len(q) < 3 or not has_fts(db_path):
+        return _like_search(q, limit, cols, db_path)
+
+    colspec = "{" + " ".join(cols) + "}"
+    out: List[Dict[str, Any]] = []
+    seen: Set[int] = set()
+
+    # 1) přesný podřetězec
+    for r in _fts_query(f"{colspec} : {_fts_phrase(q)}", limit, db_path):
+        seen.add(r.pop("_rid"))
+        bm = r.pop("_bm25")
+        r["match"] = "substring"
+        r["score"] = round(-bm, 4)
+        out.append(r)
+
+    # 2) překlepy – OR přes kusy dotazu, přeskórování podobností
+    qgrams = _trigrams(q)
+    if fuzzy and len(out) < limit and len(q) >= 4:
+        match = f"{colspec} : (" + " OR ".join(_fts_phrase(p) for p in _pieces(q)) + ")"
+        fuzzy_hits = []
+        for r in _fts_query(match, max(limit * 10, FUZZY_CANDIDATES), db_path):
+            rid = r.pop("_rid")
+            r.pop("_bm25")
+            if rid in seen:
+                continue
+            contain, score = _similarity(q, qgrams, r)
+            if contain >= FUZZY_MIN_SIMILARITY:
+                r["match"] = "fuzzy"
+                r["score"] = round(score, 4)
+                fuzzy_hits.append(r)
+        fuzzy_hits.sort(key=lambda r: -r["score"])  # stabilní → při shodě drží bm25 pořadí
+        out.extend(fuzzy_hits[: limit - len(out)])
+
+    return out
+
+
+def search_tags(text: str, db_path: str = IO_DB) -> List[str]:
+    """Seřazené distinct tagy obsahující `text` (case-insensitive), bez limitu."""
+    q = (text or "").strip()
+    if not q:
+        return []
+    pool = get_pool(db_path)
+    if len(q) >= 3 and has_fts(db_path):
+        rows = pool.query_tuples(
+            f"SELECT DISTINCT io.tag FROM {FTS_TABLE} JOIN io ON io.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ? ORDER BY io.tag",
+            (f"tag : {_fts_phrase(q)}",),
+        )
+    else:
+        rows = pool.query_tuples(
+            "SELECT DISTINCT tag FROM io WHERE tag LIKE ? ORDER BY tag", (f"%{q}%",)
+        )
+    return [r[0] for r in rows if r[0]]
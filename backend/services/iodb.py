@@ -0,0 +1,148 @@
+# backend/services/iodb.py
+"""
+Sdílená read-only vrstva pro přístup k SQLite (data/io.db).
+
+- každé vlákno má vlastní spojení (sqlite3 spojení nejsou thread-safe),
+- spojení se otevírá přes URI v režimu `mode=ro` (+ volitelně `immutable=1`),
+- PRAGMA mmap_size / cache_size drží stránky DB v paměti mezi dotazy,
+- sqlite3 si drží cache připravených statementů (`cached_statements`),
+- když build_io_db.py soubor vymění (jiný inode/mtime/velikost), spojení se
+  při dalším dotazu tiše znovu otevře.
+"""
+
+import os
+import sqlite3
+import threading
+import urllib.parse as _up
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+IO_DB = os.getenv("IO_DB_PATH", os.path.join(ROOT, "data", "io.db"))
+
+# ladění (env); immutable=1 vypne zamykání a čtení journalu – bezpečné jen
+# pokud se DB mění výhradně výměnou souboru (viz build_io_db.py). Default vypnuto:
+# ingest_hwf.py zapisuje fb_blocks do io.db na místě.
+IO_DB_IMMUTABLE = os.getenv("IO_DB_IMMUTABLE", "false").lower() == "true"
+IO_DB_MMAP_BYTES = int(os.getenv("IO_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+IO_DB_CACHE_KIB = int(os.getenv("IO_DB_CACHE_KIB", str(64 * 1024)))
+IO_DB_STMT_CACHE = int(os.getenv("IO_DB_STMT_CACHE", "256"))
+
+FileSig = Tuple[int, int, int]  # (inode, mtime_ns, size)
+
+
+def file_signature(path: str) -> Optional[FileSig]:
+    """Otisk souboru pro detekci výměny/přepisu; None pokud soubor neexistuje."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class SQLiteReadPool:
+    """Per-thread read-only spojení na jeden SQLite soubor."""
+
+    def __init__(
+        self,
+        path: str,
+        immutable: bool = IO_DB_IMMUTABLE,
+        mmap_bytes: int = IO_DB_MMAP_BYTES,
+        cache_kib: int = IO_DB_CACHE_KIB,
+        stmt_cache: int = IO_DB_STMT_CACHE,
+    ):
+        self.path = os.path.abspath(path)
+        self.immutable = immutable
+        self.mmap_bytes = mmap_bytes
+        self.cache_kib = cache_kib
+        self.stmt_cache = stmt_cache
+        self._local = threading.local()
+
+    # ----- spojení -----
+    def _uri(self) -> str:
+        params = {"mode": "ro"}
+        if self.immutable:
+            params["immutable"] = "1"
+        return f"file:{_up.quote(self.path)}?{_up.urlencode(params)}"
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(
+            self._uri(),
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.stmt_cache,
+        )
+        con.row_factory = sqlite3.Row
+        con.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        con.execute(f"PRAGMA cache_size = {-int(self.cache_kib)}")  # záporné = KiB
+        con.execute("PRAGMA query_only = 1")
+        return con
+
+    def connection(self) -> sqlite3.Connection:
+        """Vrátí spojení aktuálního vlákna; při změně souboru ho znovu otevře."""
+        sig = file_signature(self.path)
+        if sig is None:
+            self.close()
+            raise FileNotFoundError(self.path)
+        loc = self._local
+        con = getattr(loc, "con", None)
+        if con is None or loc.sig != sig:
+            if con is not None:
+                try:
+                    con.close()
+                except Exception:
+                    pass
+            loc.con = None
+            loc.con = self._open()
+            loc.sig = sig
+        return loc.con
+
+    def signature(self) -> Optional[FileSig]:
+        return file_signature(self.path)
+
+    def close(self) -> None:
+        """Zavře spojení aktuálního vlákna (ostatní vlákna se zavřou s GC)."""
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            try:
+                con.close()
+            except Exception:
+                pass
+        self._local.con = None
+        self._local.sig = None
+
+    # ----- dotazy -----
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        cur = self.connection().execute(sql, params)
+        return [dict(r) for r in cur.fetchall()]
+
+    def query_tuples(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        cur = self.connection().execute(sql, params)
+        return [tuple(r) for r in cur.fetchall()]
+
+    def has_table(self, name: str) -> bool:
+        rows = self.query_tuples(
+            "SELECT 1 FROM sqlite_master WHERE type IN ('table','view') AND name = ?", (name,)
+        )
+        return bool(rows)
+
+
+_POOLS: Dict[str, SQLiteReadPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: str = IO_DB) -> SQLiteReadPool:
+    """Sdílený pool pro danou cestu (jeden na proces)."""
+    key = os.path.abspath(path)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = SQLiteReadPool(key)
+                _POOLS[key] = pool
+    return pool
+
+
+def query(sql: str, params: Sequence[Any] = (), path: str = IO_DB) -> List[Dict[str, Any]]:
+    """Zkratka: dotaz nad io.db (nebo jinou DB) přes sdílený pool."""
+    return get_pool(path).query(sql, params)
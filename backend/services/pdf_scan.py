@@ -0,0 +1,191 @@
+# backend/services/pdf_scan.py
+"""
+Paralelní (multi-process) živé prohledávání PDF výkresů.
+
+- soubory (a u velkých PDF úseky stránek) se rozdělí mezi ProcessPoolExecutor,
+- každý worker čte text přes pdf_text.iter_pdf_pages (PyMuPDF, fallback pypdf),
+- v běhu je nanejvýš ~2× workers úloh → po dosažení stop_after_matches (nebo při
+  zavření generátoru, např. odpojení klienta) se zbytek zruší dřív, než začne,
+- iter_scan() průběžně vrací nálezy i progress (hotové soubory / celkem).
+
+Pro 1 worker nebo jedinou úlohu se skenuje přímo v procesu (bez režie poolu).
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from .drawing_index import norm_text
+from .pdf_text import iter_pdf_pages, pdf_page_count
+
+PDF_SCAN_WORKERS = int(os.getenv("PDF_SCAN_WORKERS", "0")) or (os.cpu_count() or 1)
+# PDF větší než SPLIT_BYTES se dělí na úseky po SPLIT_PAGES stránkách
+PDF_SCAN_SPLIT_BYTES = int(os.getenv("PDF_SCAN_SPLIT_BYTES", str(8 * 1024 * 1024)))
+PDF_SCAN_SPLIT_PAGES = int(os.getenv("PDF_SCAN_SPLIT_PAGES", "64"))
+
+Task = Tuple[str, int, int]  # (cesta, start, stop) – stránky [start, stop)
+Event = Dict[str, Any]
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Sdílený pool (spawn – bezpečné i z vícevláknového API procesu)."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProcessPoolExecutor(
+                    max_workers=PDF_SCAN_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _POOL
+
+
+def _reset_pool() -> None:
+    """Rozbitý pool (spadlý worker) zahodíme; další scan si vytvoří nový."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_range(path: str, needle_norm: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Worker: [(0-index stránky, text)] v rozsahu [start, stop), kde je needle."""
+    hits: List[Tuple[int, str]] = []
+    for pidx, text in iter_pdf_pages(path, stop, start):
+        if needle_norm in norm_text(text):
+            hits.append((pidx, text))
+    return hits
+
+
+def plan_tasks(files: List[str], max_pages_per_file: int) -> List[Task]:
+    """Rozdělí soubory na úlohy; velké PDF na úseky stránek."""
+    tasks: List[Task] = []
+    for f in files:
+        try:
+            size = os.path.getsize(f)
+        except OSError:
+            continue
+        if size > PDF_SCAN_SPLIT_BYTES:
+            n = min(pdf_page_count(f), max_pages_per_file)
+            if n > PDF_SCAN_SPLIT_PAGES:
+                for s in range(0, n, PDF_SCAN_SPLIT_PAGES):
+                    tasks.append((f, s, min(n, s + PDF_SCAN_SPLIT_PAGES)))
+                continue
+        tasks.append((f, 0, max_pages_per_file))
+    return tasks
+
+
+def iter_scan(
+    files: List[str],
+    needle_norm: str,
+    max_pages_per_file: int = 300,
+    stop_after_matches: int = 20,
+    workers: Optional[int] = None,
+    progress_every: int = 1,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[Event]:
+    """
+    Generuje události:
+      {"type": "match", "path", "page" (0-index), "text"}
+      {"type": "progress", "files_scanned", "files_total"}   (každých progress_every souborů)
+    Zavření generátoru (break / close()) nebo nastavení `cancel` zruší nezahájené
+    úlohy; `cancel` jde nastavit i z jiného vlákna, když generátor zrovna čeká.
+    """
+    tasks = plan_tasks(files, max_pages_per_file)
+    files_total = len(files)
+    remaining: Dict[str, int] = {}
+    for f, _, _ in tasks:
+        remaining[f] = remaining.get(f, 0) + 1
+    done_files = files_total - len(remaining)  # nečitelné/nedostupné soubory
+    found = 0
+    workers = workers or PDF_SCAN_WORKERS
+
+    def _progress() -> Optional[Event]:
+        if progress_every and done_files % progress_every == 0:
+            return {"type": "progress", "files_scanned": done_files, "files_total": files_total}
+        return None
+
+    def _finish(path: str) -> Optional[Event]:
+        nonlocal done_files
+        remaining[path] -= 1
+        if remaining[path] == 0:
+            done_files += 1
+            return _progress()
+        return None
+
+    queue: Deque[Task] = deque(tasks)
+
+    # --- paralelně přes pool ---
+    if workers > 1 and len(tasks) > 1:
+        pool = _get_pool()
+        inflight: Dict[Future, Task] = {}
+        max_inflight = max(2, workers * 2)
+        try:
+            while queue or inflight:
+                if cancel is not None and cancel.is_set():
+                    return
+                while queue and len(inflight) < max_inflight:
+                    t = queue.popleft()
+                    inflight[pool.submit(scan_range, t[0], needle_norm, t[1], t[2])] = t
+                # krátký timeout → reakce na `cancel` i při dlouhé úloze
+                done: Set[Future] = wait(list(inflight), timeout=0.25,
+                                         return_when=FIRST_COMPLETED).done
+                for fut in done:
+                    path, start, stop = inflight.pop(fut)
+                    hits = fut.result()
+                    for pidx, text in hits:
+                        found += 1
+                        yield {"type": "match", "path": path, "page": pidx, "text": text}
+                        if found >= stop_after_matches:
+                            return
+                    ev = _finish(path)
+                    if ev:
+                        yield ev
+        except BrokenProcessPool:
+            # worker spadl (např. segfault v PDF knihovně) → zbytek dojedeme sériově
+            _reset_pool()
+            queue.extendleft(reversed(list(inflight.values())))
+            inflight.clear()
+        finally:
+            for fut in inflight:
+                fut.cancel()
+
+    # --- sériově v procesu (1 worker / 1 úloha / fallback) ---
+    while queue:
+        path, start, stop = queue.popleft()
+        for pidx, text in iter_pdf_pages(path, stop, start):
+            if cancel is not None and cancel.is_set():
+                return
+            if needle_norm in norm_text(text):
+                found += 1
+                yield {"type": "match", "path": path, "page": pidx, "text": text}
+                if found >= stop_after_matches:
+                    return
+        ev = _finish(path)
+        if ev:
+            yield ev
+
+
+def scan_pdfs(
+    files: List[str],
+    needle_norm: str,
+    max_pages_per_file: int = 300,
+    stop_after_matches: int = 20,
+    workers: Optional[int] = None,
+) -> List[Tuple[str, int, str]]:
+    """Blokující varianta: [(cesta, 0-index stránky, text)] seřazené podle souboru a strany."""
+    out = [
+        (ev["path"], ev["page"], ev["text"])
+        for ev in iter_scan(files, needle_norm, max_pages_per_file, stop_after_matches, workers, 0)
+        if ev["type"] == "match"
+    ]
+    out.sort(key=lambda x: (x[0], x[1]))
+    return out
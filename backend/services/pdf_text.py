@@ -0,0 +1,101 @@
+# backend/services/pdf_text.py
+"""
+Extrakce textu ze stránek PDF: rychle přes PyMuPDF, fallback pypdf.
+Sdílí ji živé hledání ve výkresech (tools.find_electrical_drawing) i indexer výkresů.
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+# --- RYCHLÝ PDF text (PyMuPDF) + fallback pypdf ---
+try:
+    import fitz  # PyMuPDF (rychlé)
+except Exception:
+    fitz = None  # type: ignore
+
+try:
+    from pypdf import PdfReader  # fallback (pomalejší)
+except Exception:
+    PdfReader = None  # type: ignore
+
+
+# slovo s obdélníkem v souřadnicích stránky (PDF body): (x0, y0, x1, y1, text)
+Word = Tuple[float, float, float, float, str]
+PageLayout = Tuple[float, float, List[Word]]  # (šířka, výška, slova)
+
+
+def _iter_pages(
+    path: str, max_pages: Optional[int], start: int, layout: bool
+) -> Iterator[Tuple[int, str, Optional[PageLayout]]]:
+    nxt = start
+
+    # 1) Rychlá cesta: PyMuPDF (umí i souřadnice slov)
+    if fitz is not None:
+        try:
+            doc = fitz.open(path)
+            try:
+                stop = len(doc) if max_pages is None else min(len(doc), max_pages)
+                while nxt < stop:
+                    page = doc.load_page(nxt)
+                    text = page.get_text("text") or ""
+                    lay = None
+                    if layout:
+                        words = [(w[0], w[1], w[2], w[3], w[4]) for w in page.get_text("words")]
+                        lay = (page.rect.width, page.rect.height, words)
+                    nxt += 1
+                    yield nxt - 1, text, lay
+                return
+            finally:
+                doc.close()
+        except Exception:
+            # spadlo – zkus fallback
+            pass
+
+    # 2) Fallback: pypdf (pomalejší, bez souřadnic)
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+            stop = len(reader.pages) if max_pages is None else min(len(reader.pages), max_pages)
+        except Exception:
+            # nepovedlo se otevřít
+            return
+        for pidx in range(nxt, stop):
+            try:
+                text = reader.pages[pidx].extract_text() or ""
+            except Exception:
+                continue
+            yield pidx, text, None
+
+
+def iter_pdf_pages(
+    path: str, max_pages: Optional[int] = None, start: int = 0
+) -> Iterator[Tuple[int, str]]:
+    """
+    Generuje (0-index stránky, text) pro stránky [start, max_pages).
+    Když PyMuPDF selže (i uprostřed souboru), pokračuje pypdf od další stránky.
+    Nečitelný soubor = prázdný generátor.
+    """
+    for pidx, text, _ in _iter_pages(path, max_pages, start, False):
+        yield pidx, text
+
+
+def iter_pdf_page_layout(
+    path: str, max_pages: Optional[int] = None, start: int = 0
+) -> Iterator[Tuple[int, str, Optional[PageLayout]]]:
+    """Jako iter_pdf_pages, navíc (šířka, výška, slova s obdélníky); None u pypdf fallbacku."""
+    return _iter_pages(path, max_pages, start, True)
+
+
+def pdf_page_count(path: str) -> int:
+    """Počet stránek (0 když soubor nejde otevřít)."""
+    if fitz is not None:
+        try:
+            with fitz.open(path) as doc:
+                return len(doc)
+        except Exception:
+            pass
+    if PdfReader is not None:
+        try:
+            return len(PdfReader(path).pages)
+        except Exception:
+            pass
+    return 0
@@ -0,0 +1,244 @@
+# backend/services/preview_cache.py
+"""
+Diskový cache dynamických náhledů (/preview/electrical, dlaždice …).
+
+- vlastní jmenný prostor data/preview_cache (statické prerendery zůstávají v data/previews),
+- soubory <dir>/<ab>/<klíč>.<ext>, zápis přes dočasný soubor + os.replace → čtenář
+  nikdy nedostane napůl zapsaný obrázek,
+- metadata (velikost, poslední přístup, počet hitů) v malém SQLite indexu,
+- bajtový rozpočet PREVIEW_CACHE_MAX_BYTES; obsazení se vede průběžně (čítač
+  total_bytes, žádné SUM při zápisu); při překročení se maže podle LRU (nejdéle
+  nepoužité) nebo LFU (nejméně používané) až pod ~90 % rozpočtu – právě zapsaná
+  položka nikdy; nejdřív se smažou řádky v DB, pak soubory → get() smazanou
+  položku už nevrátí (soubor vrácený těsně před evikcí musí volající tolerovat),
+- čítače hit/miss/put/eviction (perzistentní, sdílené mezi procesy) pro stats.
+
+Klíč skládá volající (PreviewCache.key) – u náhledů PDF vždy včetně mtime/velikosti
+zdrojového souboru, takže změněný výkres automaticky dostane nové náhledy.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", os.path.join(ROOT, "data", "preview_cache"))
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+PREVIEW_CACHE_POLICY = os.getenv("PREVIEW_CACHE_POLICY", "lru").lower()  # lru | lfu
+# po evikci zůstane zaplněno nanejvýš LOW_WATER × rozpočet (ať se nemaže při každém zápisu)
+PREVIEW_CACHE_LOW_WATER = float(os.getenv("PREVIEW_CACHE_LOW_WATER", "0.9"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+  key         TEXT PRIMARY KEY,
+  ext         TEXT NOT NULL,
+  size        INTEGER NOT NULL,
+  created     REAL NOT NULL,
+  last_access REAL NOT NULL,
+  hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries(last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_lfu ON entries(hits, last_access);
+CREATE TABLE IF NOT EXISTS counters (
+  name  TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("hits", "misses", "puts", "evictions", "evicted_bytes")
+
+MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "json": "application/json"}
+
+
+class PreviewCache:
+    """Obsahově adresovaný cache souborů s bajtovým rozpočtem a LRU/LFU evikcí."""
+
+    def __init__(self, base_dir: str = PREVIEW_CACHE_DIR,
+                 max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+                 policy: str = PREVIEW_CACHE_POLICY):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Neznámá politika cache: {policy}")
+        self.base_dir = os.path.abspath(base_dir)
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.db_path = os.path.join(self.base_dir, "index.db")
+        self._local = threading.local()
+        self._evict_lock = threading.Lock()
+        os.makedirs(self.base_dir, exist_ok=True)
+        con = self._con()
+        con.executescript(SCHEMA)
+        con.executemany("INSERT OR IGNORE INTO counters(name, value) VALUES(?, 0)",
+                        [(c,) for c in COUNTERS])
+        # průběžné obsazení; u existujícího cache bez čítače jednou dopočítat
+        con.execute("INSERT OR IGNORE INTO counters(name, value) "
+                    "VALUES('total_bytes', (SELECT COALESCE(SUM(size), 0) FROM entries))")
+
+    # ----- interní -----
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # autocommit; WAL → čtení neblokuje zápisy jiných procesů (uvicorn workery)
+            con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                  check_same_thread=False)
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+            self._local.con = con
+        return con
+
+    def _bump(self, con: sqlite3.Connection, name: str, n: int = 1) -> None:
+        con.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.base_dir, key[:2], f"{key}.{ext}")
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Klíč z libovolných částí (cesta, mtime, strana, zoom, formát …)."""
+        return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    # ----- API -----
+    def get(self, key: str) -> Optional[str]:
+        """Cesta k souboru v cache (a zaznamená přístup) nebo None."""
+        con = self._con()
+        row = con.execute("SELECT ext FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            path = self._path(key, row[0])
+            if os.path.exists(path):
+                con.execute(
+                    "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._bump(con, "hits")
+                return path
+            # soubor zmizel (ruční úklid) → zahoď záznam
+            con.execute("BEGIN IMMEDIATE")
+            cur = con.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if cur is not None:
+                con.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(con, "total_bytes", -cur[0])
+            con.execute("COMMIT")
+        self._bump(con, "misses")
+        return None
+
+    def put(self, key: str, data: bytes, ext: str) -> str:
+        """Atomicky uloží data a vrátí cestu; případně uvolní místo podle politiky."""
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{key}.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        now = time.time()
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            # nová položka má hits=1 (právě vzniklý náhled se hned posílá) → LFU ji nevybere
+            # dřív než skutečně nepoužívané
+            con.execute(
+                """
+                INSERT INTO entries(key, ext, size, created, last_access, hits) VALUES(?,?,?,?,?,1)
+                ON CONFLICT(key) DO UPDATE SET ext = excluded.ext, size = excluded.size,
+                                               last_access = excluded.last_access
+                """,
+                (key, ext, len(data), now, now),
+            )
+            self._bump(con, "total_bytes", len(data) - (row[0] if row else 0))
+            self._bump(con, "puts")
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        if self.total_bytes() > self.max_bytes:
+            self.evict(protect=key)
+        return path
+
+    def total_bytes(self) -> int:
+        row = self._con().execute("SELECT value FROM counters WHERE name = 'total_bytes'").fetchone()
+        return int(row[0]) if row else 0
+
+    def evict(self, target_bytes: Optional[int] = None, protect: Optional[str] = None) -> int:
+        """
+        Smaže nejméně cenné položky (kromě `protect`), dokud obsazení neklesne
+        pod target_bytes. Vrací počet.
+        """
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * PREVIEW_CACHE_LOW_WATER)
+        order = "last_access" if self.policy == "lru" else "hits, last_access"
+        with self._evict_lock:
+            con = self._con()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                total = self.total_bytes()
+                victims = []
+                if total > target_bytes:
+                    for key, ext, size in con.execute(
+                            f"SELECT key, ext, size FROM entries WHERE key IS NOT ? ORDER BY {order}",
+                            (protect,)):
+                        if total <= target_bytes:
+                            break
+                        victims.append((key, ext, size))
+                        total -= size
+                freed = sum(v[2] for v in victims)
+                if victims:
+                    con.executemany("DELETE FROM entries WHERE key = ?", [(v[0],) for v in victims])
+                    self._bump(con, "total_bytes", -freed)
+                    self._bump(con, "evictions", len(victims))
+                    self._bump(con, "evicted_bytes", freed)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            # soubory až po commitu – get() je od teď nevrátí
+            for key, ext, _ in victims:
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+            return len(victims)
+
+    def clear(self) -> int:
+        """Vyprázdní cache (čítače zůstávají)."""
+        return self.evict(0)
+
+    def stats(self) -> Dict[str, Any]:
+        con = self._con()
+        out: Dict[str, Any] = dict(con.execute("SELECT name, value FROM counters").fetchall())
+        n, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = out.get("hits", 0) + out.get("misses", 0)
+        out.update(
+            dir=self.base_dir,
+            policy=self.policy,
+            entries=n,
+            bytes=size,
+            max_bytes=self.max_bytes,
+            fill_ratio=round(size / self.max_bytes, 4) if self.max_bytes else None,
+            hit_ratio=round(out.get("hits", 0) / lookups, 4) if lookups else None,
+        )
+        return out
+
+
+_CACHE: Optional[PreviewCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_preview_cache() -> PreviewCache:
+    """Sdílená instance (jedna na proces)."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = PreviewCache()
+    return _CACHE
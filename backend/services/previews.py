@@ -0,0 +1,93 @@
+# backend/services/previews.py
+"""
+Statické (předrenderované) náhledy výkresů v data/previews + jejich manifest.
+
+Soubory:  data/previews/<cesta pod data/electrical bez .pdf>_pNNNN[.<varianta>].jpg
+          (standard bez přípony – kompatibilní se staršími prerendery)
+Manifest: data/previews/manifest.json, zapisuje scripts/prerender_preview.py:
+  {"version": 1,
+   "files": {"data/electrical/Foo/Doc.pdf": {
+       "sha1", "size", "mtime_ns", "pages",          # zdrojové PDF
+       "variants": {"standard": {"scale", "quality", "rendered"}, ...}}}}
+  (rendered = N → předrenderované strany 1..N)
+
+PreviewManifest drží manifest v paměti a znovu ho načte, jen když se změní
+mtime/velikost souboru → _static_preview_urls nemusí na každý nález volat
+os.path.exists.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from .iodb import file_signature
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ELECTRICAL_DIR = os.getenv("ELECTRICAL_DIR", os.path.join(ROOT, "data", "electrical"))
+PREVIEWS_DIR = os.getenv("PREVIEWS_DIR", os.path.join(ROOT, "data", "previews"))
+PREVIEW_MANIFEST = os.path.join(PREVIEWS_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+
+# varianta → (přípona souboru, default měřítko, default JPEG kvalita)
+VARIANTS: Dict[str, Dict[str, Any]] = {
+    "thumb": {"suffix": ".thumb", "scale": 0.5, "quality": 75},
+    "standard": {"suffix": "", "scale": 2.0, "quality": 85},
+    "hidpi": {"suffix": ".hidpi", "scale": 4.0, "quality": 85},
+}
+
+
+def preview_rel_path(rel_pdf: str, page_idx: int, variant: str = "standard") -> str:
+    """'data/electrical/Foo/Doc.pdf', 0 → 'Foo/Doc_p0001.jpg' (relativně k data/previews)."""
+    rel_from_elec = os.path.relpath(os.path.join(ROOT, rel_pdf), ELECTRICAL_DIR)
+    base_no_ext, _ = os.path.splitext(rel_from_elec)
+    return f"{base_no_ext}_p{page_idx + 1:04d}{VARIANTS[variant]['suffix']}.jpg".replace("\\", "/")
+
+
+class PreviewManifest:
+    """Manifest prerenderů načtený do paměti; reload při změně souboru."""
+
+    def __init__(self, path: str = PREVIEW_MANIFEST):
+        self.path = path
+        self._sig = None
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def files(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """rel PDF → záznam; None když manifest neexistuje (nebo je nečitelný)."""
+        sig = file_signature(self.path)
+        if sig is None:
+            return None
+        if sig != self._sig:
+            with self._lock:
+                if sig != self._sig:
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                        self._files = data.get("files", {}) if data.get("version") == MANIFEST_VERSION else {}
+                    except (OSError, ValueError):
+                        return None
+                    self._sig = sig
+        return self._files
+
+    def has(self, rel_pdf: str, page_idx: int, variant: str = "standard") -> Optional[bool]:
+        """True/False podle manifestu; None = manifest chybí (volající ověří sám)."""
+        files = self.files()
+        if files is None:
+            return None
+        v = (files.get(rel_pdf) or {}).get("variants", {}).get(variant)
+        return bool(v) and page_idx < v.get("rendered", 0)
+
+
+_MANIFEST: Optional[PreviewManifest] = None
+_MANIFEST_LOCK = threading.Lock()
+
+
+def get_preview_manifest() -> PreviewManifest:
+    """Sdílená instance (jedna na proces)."""
+    global _MANIFEST
+    if _MANIFEST is None:
+        with _MANIFEST_LOCK:
+            if _MANIFEST is None:
+                _MANIFEST = PreviewManifest()
+    return _MANIFEST
@@ -1,13 +1,17 @@
 # backend/services/rag.py
 """
 Lehký RAG wrapper.
-- Pokud existuje FAISS index (data/faiss.index + data/store.npy), použije se.
+- Pokud existuje FAISS index (data/faiss.index + texty chunků v data/rag.cols), použije se.
+  Texty jsou v colstore (mmap) → načtení je okamžité a do paměti jdou jen
+  vrácené chunky; starší data/store.npy (pickle) se načte, když rag.cols chybí.
+- Vedle je BM25 index (data/rag.bm25) → hybridní hledání (FAISS + BM25 přes RRF);
+  dotaz jako tag / číslo zařízení jde jen přes BM25 bez volání embeddingu.
 - Když neexistuje, search() vrátí prázdný list a systém běží dál bez RAG.
 Index vytvoříš skriptem (např. scripts/build_rag.py).
 """
 
 import os
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 
 try:
@@ -17,47 +21,73 @@ except Exception:
 
 from openai import OpenAI
 
+from ..rag import colstore
+from .embeddings import get_embedding_service
+from ..rag.bm25 import BM25Index, open_bm25, retrieve
+
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 INDEX_PATH = os.getenv("RAG_INDEX_PATH", os.path.join(ROOT, "data", "faiss.index"))
-STORE_PATH = os.getenv("RAG_STORE_PATH", os.path.join(ROOT, "data", "store.npy"))
+STORE_PATH = os.getenv("RAG_STORE_PATH", os.path.join(ROOT, "data", "store.npy"))   # starší formát
+COLS_PATH = os.getenv("RAG_COLS_PATH", os.path.join(ROOT, "data", "rag.cols"))
+BM25_PATH = os.getenv("RAG_BM25_PATH", os.path.join(ROOT, "data", "rag.bm25"))
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "auto")   # auto | hybrid | dense | lexical
 
 class RagStore:
     def __init__(self, client: OpenAI):
         self.client = client
         self.index = None
-        self.texts: List[str] = []
+        self.texts: Sequence[str] = []
+        self.sources: Sequence[str] = []
+        self.lexical: Optional[BM25Index] = None
 
     def load(self) -> bool:
-        if faiss is None:
-            return False
-        if not (os.path.exists(INDEX_PATH) and os.path.exists(STORE_PATH)):
+        if faiss is None or not os.path.exists(INDEX_PATH):
             return False
         try:
-            self.index = faiss.read_index(INDEX_PATH)
-            self.texts = np.load(STORE_PATH, allow_pickle=True).tolist()
+            table = colstore.open_table(COLS_PATH)
+            if table is not None:
+                self.texts = colstore.TextColumn(table, "text")
+                self.sources = colstore.TextColumn(table, "source") if table.has("source") else []
+                lexical = open_bm25(BM25_PATH, source=table.gen)
+                self.lexical = lexical if lexical is not None and lexical.docs == len(self.texts) else None
+            elif os.path.exists(STORE_PATH):
+                self.texts = np.load(STORE_PATH, allow_pickle=True).tolist()
+            else:
+                return False
+            index = faiss.read_index(INDEX_PATH)
+            if index.ntotal != len(self.texts):
+                # index a texty z různých buildů (build_rag.py právě přepisuje) → nepoužít
+                raise ValueError(f"FAISS index má {index.ntotal} vektorů, textů je {len(self.texts)}")
+            self.index = index
             return True
         except Exception:
             self.index = None
             self.texts = []
+            self.sources = []
+            self.lexical = None
             return False
 
     def _embed(self, texts: List[str]) -> np.ndarray:
-        vecs = self.client.embeddings.create(model=EMBED_MODEL, input=texts)
-        arr = np.array([d.embedding for d in vecs.data], dtype="float32")
-        return arr
-
-    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
-        if faiss is None or self.index is None or not self.texts:
-            return []
-        q = self._embed([query]).astype("float32")
+        return get_embedding_service().embed(texts, EMBED_MODEL, client=self.client)
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        return get_embedding_service().embed_query(text, EMBED_MODEL, client=self.client)[None, :]
+
+    def _dense(self, query: str, k: int) -> List[Tuple[int, float]]:
+        q = self._embed_query(query).astype("float32")
         # kosinová podobnost (normalizace L2)
         faiss.normalize_L2(q)
         D, I = self.index.search(q, k)
-        out: List[Tuple[str, float]] = []
-        for idx, score in zip(I[0], D[0]):
-            if idx == -1:
-                continue
-            out.append((self.texts[idx], float(score)))
-        return out
+        return [(int(idx), float(score)) for idx, score in zip(I[0], D[0]) if idx != -1]
+
+    def search_rows(self, query: str, k: int = 4, mode: Optional[str] = None) -> Tuple[str, List[Tuple[int, float]]]:
+        """(použitý režim, [(řádek chunku, skóre)]); mode viz RAG_SEARCH_MODE."""
+        if faiss is None or self.index is None or not len(self.texts):
+            return "dense", []
+        return retrieve(query, k, mode or RAG_SEARCH_MODE, self.lexical, lambda n: self._dense(query, n))
+
+    def search(self, query: str, k: int = 4, mode: Optional[str] = None) -> List[Tuple[str, float]]:
+        _, hits = self.search_rows(query, k, mode)
+        return [(self.texts[row], score) for row, score in hits]
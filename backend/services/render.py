@@ -0,0 +1,198 @@
+# backend/services/render.py
+"""
+Renderování náhledů PDF mimo event loop.
+
+- omezený ThreadPoolExecutor (RENDER_WORKERS) → nával náhledů nevyčerpá
+  threadpool API ani CPU,
+- single-flight: souběžné požadavky na stejný klíč sdílí jeden Future
+  (stránku renderuje jen první, ostatní čekají na jeho výsledek),
+- LRU otevřených fitz.Document (RENDER_DOC_CACHE) s vlastním zámkem na dokument
+  (fitz.Document není thread-safe); změněné PDF (mtime/velikost) se otevře znovu,
+- PNG/JPEG se kóduje přímo z pixmapy (pix.tobytes), bez PNG→PIL→JPEG.
+
+Endpointy čekají přes asyncio.wrap_future(RenderService.submit(...)).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    fitz = None  # type: ignore
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+RENDER_DOC_CACHE = int(os.getenv("RENDER_DOC_CACHE", "16"))
+RENDER_JPEG_QUALITY = int(os.getenv("RENDER_JPEG_QUALITY", "90"))
+
+
+class PageOutOfRange(ValueError):
+    """Požadovaná strana v PDF není (nese počet stran)."""
+
+    def __init__(self, pages: int):
+        super().__init__(f"Strana mimo rozsah 1..{pages}")
+        self.pages = pages
+
+
+class _Doc:
+    __slots__ = ("sig", "doc", "lock")
+
+    def __init__(self, sig: Tuple[int, int], doc: Any):
+        self.sig = sig
+        self.doc = doc
+        self.lock = threading.Lock()
+
+
+def encode_pixmap(pix: Any, ext: str, quality: int = RENDER_JPEG_QUALITY) -> bytes:
+    """PNG nebo JPEG přímo z pixmapy."""
+    if ext == "jpg":
+        return pix.tobytes("jpeg", jpg_quality=quality)
+    return pix.tobytes("png")
+
+
+class RenderService:
+    """Sdílený renderer: pool workerů, single-flight a LRU otevřených PDF."""
+
+    def __init__(self, workers: int = RENDER_WORKERS, doc_cache: int = RENDER_DOC_CACHE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._doc_cache = doc_cache
+        self._docs: "OrderedDict[str, _Doc]" = OrderedDict()
+        self._docs_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0, "doc_hits": 0, "doc_opens": 0}
+
+    # ----- single-flight -----
+    def submit(self, key: str, fn: Callable[[], Any]) -> Future:
+        """Spustí fn ve workeru; běží-li už úloha se stejným klíčem, vrátí její Future."""
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats["coalesced"] += 1
+                return fut
+            fut = self._executor.submit(fn)
+            self._inflight[key] = fut
+            self.stats["submitted"] += 1
+
+        def _done(f: Future, key: str = key) -> None:
+            with self._inflight_lock:
+                if self._inflight.get(key) is f:
+                    del self._inflight[key]
+
+        fut.add_done_callback(_done)
+        return fut
+
+    # ----- otevřené dokumenty -----
+    def _get_doc(self, path: str) -> _Doc:
+        st = os.stat(path)
+        sig = (st.st_mtime_ns, st.st_size)
+        with self._docs_lock:
+            d = self._docs.get(path)
+            if d is not None and d.sig == sig:
+                self._docs.move_to_end(path)
+                self.stats["doc_hits"] += 1
+                return d
+        # otevření mimo globální zámek (velké PDF může chvíli trvat)
+        new = _Doc(sig, fitz.open(path))
+        evicted = []
+        with self._docs_lock:
+            d = self._docs.get(path)
+            if d is not None and d.sig == sig:
+                # mezitím otevřel jiný worker
+                evicted.append(new)
+                new = d
+            else:
+                if d is not None:
+                    evicted.append(d)
+                self._docs[path] = new
+                self.stats["doc_opens"] += 1
+            self._docs.move_to_end(path)
+            while len(self._docs) > self._doc_cache:
+                evicted.append(self._docs.popitem(last=False)[1])
+        for old in evicted:
+            # zavřít až ho nikdo nepoužívá
+            with old.lock:
+                old.doc.close()
+        return new
+
+    @contextmanager
+    def document(self, path: str) -> Iterator[Any]:
+        """Otevřený fitz.Document s výhradním přístupem po dobu bloku."""
+        if fitz is None:
+            raise RuntimeError("PyMuPDF (pymupdf) není nainstalováno")
+        while True:
+            d = self._get_doc(path)
+            with d.lock:
+                if d.doc.is_closed:
+                    # mezitím vyhozen z LRU → zkus znovu
+                    continue
+                yield d.doc
+                return
+
+    def render_page(
+        self,
+        path: str,
+        page: int,
+        scale: float,
+        ext: str = "png",
+        clip: Optional[Tuple[float, float, float, float]] = None,
+        decorate: Optional[Callable[[Any, Any], None]] = None,
+        quality: int = RENDER_JPEG_QUALITY,
+    ) -> bytes:
+        """
+        Vyrenderuje stranu (0-index) a vrátí zakódovaný obrázek.
+        `clip` = výřez v PDF bodech, `decorate(page, pix)` může kreslit do pixmapy
+        (např. zvýraznění tagu) – volá se pod zámkem dokumentu.
+        """
+        with self.document(path) as doc:
+            if page < 0 or page >= len(doc):
+                raise PageOutOfRange(len(doc))
+            pg = doc.load_page(page)
+            mat = fitz.Matrix(scale, scale)
+            pix = pg.get_pixmap(matrix=mat, alpha=False,
+                                clip=fitz.Rect(*clip) if clip is not None else None)
+            if decorate is not None:
+                decorate(pg, pix)
+            return encode_pixmap(pix, ext, quality)
+
+    def page_size(self, path: str, page: int) -> Tuple[float, float]:
+        """(šířka, výška) strany (0-index) v PDF bodech, po aplikaci rotace."""
+        with self.document(path) as doc:
+            if page < 0 or page >= len(doc):
+                raise PageOutOfRange(len(doc))
+            r = doc.load_page(page).rect
+            return (r.width, r.height)
+
+    def page_rotation(self, path: str, page: int) -> Tuple[int, Tuple[float, ...]]:
+        """(rotace ve stupních, matice neotočené souřadnice strany → souřadnice náhledu)."""
+        with self.document(path) as doc:
+            if page < 0 or page >= len(doc):
+                raise PageOutOfRange(len(doc))
+            pg = doc.load_page(page)
+            return pg.rotation, tuple(pg.rotation_matrix)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._docs_lock:
+            docs, self._docs = list(self._docs.values()), OrderedDict()
+        for d in docs:
+            with d.lock:
+                d.doc.close()
+
+
+_SERVICE: Optional[RenderService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_render_service() -> RenderService:
+    """Sdílená instance (jedna na proces)."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = RenderService()
+    return _SERVICE
@@ -0,0 +1,52 @@
+# backend/services/tiles.py
+"""
+Geometrie dlaždicové pyramidy (deep zoom) pro velké výkresy.
+
+Úroveň z má měřítko scale_z = TILE_SIZE · 2^z / max(šířka, výška) → z=0 je celá
+strana v jedné dlaždici (okamžitý přehled), každá další úroveň zdvojnásobí
+rozlišení až po PREVIEW_TILE_MAX_SCALE. Dlaždice jsou TILE_SIZE × TILE_SIZE px,
+krajní bývají menší (jako DZI). Renderují se přes `clip` (PDF body).
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+TILE_SIZE = int(os.getenv("PREVIEW_TILE_SIZE", "256"))
+PREVIEW_TILE_MAX_SCALE = float(os.getenv("PREVIEW_TILE_MAX_SCALE", "4.0"))
+
+
+def max_zoom(width: float, height: float, tile: int = TILE_SIZE,
+             max_scale: float = PREVIEW_TILE_MAX_SCALE) -> int:
+    longest = max(width, height, 1.0)
+    return max(0, math.ceil(math.log2(max_scale * longest / tile)))
+
+
+def level_scale(width: float, height: float, z: int, tile: int = TILE_SIZE) -> float:
+    return tile * (2 ** z) / max(width, height, 1.0)
+
+
+def levels(width: float, height: float, tile: int = TILE_SIZE,
+           max_scale: float = PREVIEW_TILE_MAX_SCALE) -> List[Dict[str, Any]]:
+    out = []
+    for z in range(max_zoom(width, height, tile, max_scale) + 1):
+        s = level_scale(width, height, z, tile)
+        w, h = math.ceil(width * s), math.ceil(height * s)
+        out.append({"z": z, "scale": round(s, 6), "width": w, "height": h,
+                    "cols": math.ceil(w / tile), "rows": math.ceil(h / tile)})
+    return out
+
+
+def tile_clip(width: float, height: float, z: int, x: int, y: int,
+              tile: int = TILE_SIZE,
+              max_scale: float = PREVIEW_TILE_MAX_SCALE) -> Optional[Tuple[float, Tuple[float, float, float, float]]]:
+    """(měřítko, výřez v PDF bodech) dlaždice; None mimo pyramidu."""
+    if z < 0 or z > max_zoom(width, height, tile, max_scale):
+        return None
+    s = level_scale(width, height, z, tile)
+    w, h = math.ceil(width * s), math.ceil(height * s)
+    if x < 0 or y < 0 or x * tile >= w or y * tile >= h:
+        return None
+    px0, py0 = x * tile, y * tile
+    px1, py1 = min(w, px0 + tile), min(h, py0 + tile)
+    return s, (px0 / s, py0 / s, min(width, px1 / s), min(height, py1 / s))
@@ -1,19 +1,15 @@
 # backend/services/tools.py
 import os
-import sqlite3
+import threading
 import urllib.parse as _up
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-# --- RYCHLÝ PDF text (PyMuPDF) + fallback pypdf ---
-try:
-    import fitz  # PyMuPDF (rychlé)
-except Exception:
-    fitz = None  # type: ignore
-
-try:
-    from pypdf import PdfReader  # fallback (pomalejší)
-except Exception:
-    PdfReader = None  # type: ignore
+from .iodb import get_pool
+from .io_index import get_tag_index, split_io_rows
+from .io_search import search_rows, search_tags
+from .drawing_index import get_drawing_index, iter_pdfs, rel_path
+from .pdf_scan import iter_scan
+from .previews import get_preview_manifest, preview_rel_path
 
 # Cesty: počítáme relativně od rootu repa (o adresář výš z backend/)
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -24,34 +20,15 @@ PUBLIC_API_BASE_URL = os.getenv("PUBLIC_API_BASE_URL", "")  # např. http://loca
 
 
 def _q(sql: str, params=()) -> List[Dict[str, Any]]:
-    con = sqlite3.connect(IO_DB)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute(sql, params)
-    rows = [dict(r) for r in cur.fetchall()]
-    con.close()
-    return rows
+    # sdílené per-thread read-only spojení (viz services/iodb.py)
+    return get_pool(IO_DB).query(sql, params)
 
 
 # --------------------------
 # Pomocné
 # --------------------------
 def _split_io(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
-    ins = [r for r in rows if str(r.get("io_type", "")).upper().startswith("E")]
-    outs = [r for r in rows if str(r.get("io_type", "")).upper().startswith("A")]
-
-    def pick(r: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "tag": r.get("tag"),
-            "io_type": r.get("io_type"),
-            "address": r.get("address"),
-            "datatype": r.get("datatype"),
-            "desc1": r.get("desc1"),
-            "desc2": r.get("desc2"),
-            "comment": r.get("comment"),
-        }
-
-    return {"inputs": [pick(r) for r in ins], "outputs": [pick(r) for r in outs]}
+    return split_io_rows(rows)
 
 
 def _norm_tag(s: str) -> str:
@@ -59,10 +36,13 @@ def _norm_tag(s: str) -> str:
     return "".join((s or "").split()).upper()
 
 
-def _page_snippet(text: str, needle: str, ctx: int = 60) -> str:
-    """Vrátí krátký kontext kolem nálezu pro UX."""
-    up = text.upper()
-    i = up.find(needle.upper())
+def _page_snippet(text: str, needle: str, ctx: int = 60, offset: Optional[int] = None) -> str:
+    """Vrátí krátký kontext kolem nálezu pro UX (offset = známá pozice z indexu)."""
+    if offset is not None and 0 <= offset < len(text):
+        i = offset
+    else:
+        up = text.upper()
+        i = up.find(needle.upper())
     if i == -1:
         return ""
     start = max(0, i - ctx)
@@ -73,23 +53,20 @@ def _page_snippet(text: str, needle: str, ctx: int = 60) -> str:
 def _static_preview_urls(rel_pdf: str, page_idx: int) -> Dict[str, Optional[str]]:
     """
     Z rel PDF cesty (např. 'data/electrical/Folder/Doc.pdf') a 0-index stránky
-    složí URL i diskovou cestu pro statický náhled JPG v data/previews.
-    Vrátí dict s klíči: url, abs_url (nebo None pokud soubor neexistuje).
+    složí URL pro statický náhled JPG v data/previews.
+    Vrátí dict s klíči: url, abs_url (nebo None pokud náhled není předrenderovaný).
+    Existenci ověřuje podle manifestu prerenderu (v paměti); bez manifestu os.path.exists.
     """
-    # relativní cesta PDF vůči data/electrical
-    elec_root = os.path.join(ROOT, "data", "electrical")
-    pdf_abs = os.path.join(ROOT, rel_pdf)
-    rel_from_elec = os.path.relpath(pdf_abs, elec_root)
-    base_no_ext, _ = os.path.splitext(rel_from_elec)
-    rel_jpg_path = f"{base_no_ext}_p{page_idx+1:04d}.jpg".replace("\\", "/")
-
-    # disková cesta k JPG a veřejná URL
-    jpg_abs = os.path.join(PREVIEWS_DIR, rel_jpg_path)
+    rel_jpg_path = preview_rel_path(rel_pdf, page_idx)
     # URL-encode (ponecháme lomítka)
     url = "/previews/" + _up.quote(rel_jpg_path, safe="/")
     abs_url = f"{PUBLIC_API_BASE_URL}{url}" if PUBLIC_API_BASE_URL else None
 
-    if os.path.exists(jpg_abs):
+    ok = get_preview_manifest().has(rel_pdf, page_idx)
+    if ok is None:
+        # starší prerender bez manifestu
+        ok = os.path.exists(os.path.join(PREVIEWS_DIR, rel_jpg_path))
+    if ok:
         return {"url": url, "abs_url": abs_url}
     # náhled není předrenderovaný
     return {"url": None, "abs_url": None}
@@ -104,182 +81,272 @@ def find_valve(tag: str) -> Dict[str, Any]:
     if not t:
         return {"query": tag, "match": "none", "error": "empty_tag"}
 
-    exact = _q("SELECT * FROM io WHERE tag = ? ORDER BY io_type, address", (t,))
+    idx = get_tag_index(IO_DB)
+    exact = idx.get(t)
     if exact:
-        return {"query": t, "match": "exact", **_split_io(exact)}
+        return {"query": t, "match": "exact", **exact}
 
-    like = f"%{t}%"
-    partial = _q("SELECT * FROM io WHERE tag LIKE ? ORDER BY tag, io_type, address", (like,))
+    # podřetězec přes FTS5 trigram index (fallback LIKE), řádky bereme z tag indexu
+    partial = search_tags(t, db_path=IO_DB)
     if partial:
-        grouped: Dict[str, List[Dict[str, Any]]] = {}
-        for r in partial:
-            grouped.setdefault(r["tag"], []).append(r)
-        candidates = {k: _split_io(v) for k, v in grouped.items()}
+        candidates = {k: idx.get(k) for k in partial if idx.get(k)}
         return {"query": t, "match": "partial", "candidates": candidates}
 
     return {"query": t, "match": "none"}
 
 
+# --------------------------
+# Tool: find_valves (dávka)
+# --------------------------
+MAX_BATCH_TAGS = 1000
+
+
+def find_valves(tags: List[str]) -> Dict[str, Any]:
+    """
+    Dávkové vyhledání I/O pro více tagů najednou (např. celý tank).
+    Vrací items klíčované dotazovaným tagem + seznam nenalezených.
+    Přesná shoda, jinak shoda bez ohledu na velikost písmen; vše z tag indexu.
+    """
+    if isinstance(tags, str):
+        tags = [tags]
+    elif tags is not None and not isinstance(tags, (list, tuple)):
+        return {"query": repr(tags), "error": "invalid_tags (expected list of strings)"}
+    # tagy z LLM / JSON můžou být i čísla → str; None a prázdné se přeskočí
+    wanted = list(dict.fromkeys(t for t in (str(t).strip() for t in (tags or []) if t is not None) if t))
+    if not wanted:
+        return {"query": tags, "error": "empty_tags"}
+    if len(wanted) > MAX_BATCH_TAGS:
+        return {"query_count": len(wanted), "error": f"too_many_tags (max {MAX_BATCH_TAGS})"}
+
+    idx = get_tag_index(IO_DB)
+    items: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for t in wanted:
+        io = idx.get(t)
+        if io is not None:
+            items[t] = {"match": "exact", "tag": t, **io}
+            continue
+        ci = idx.get_ci(t)
+        if len(ci) == 1:
+            items[t] = {"match": "case_insensitive", "tag": ci[0], **idx.get(ci[0])}
+        else:
+            missing.append(t)
+
+    return {
+        "query_count": len(wanted),
+        "found": len(items),
+        "missing": missing,
+        "items": items,
+    }
+
+
+# --------------------------
+# Tool: search_io
+# --------------------------
+def search_io(text: str, limit: int = 20) -> Dict[str, Any]:
+    """
+    Fulltext v I/O listu (tag, desc1, desc2, comment) – podřetězec i překlepy.
+    Výsledky jsou seřazené podle relevance; `match` je 'substring' nebo 'fuzzy'.
+    """
+    q = (text or "").strip()
+    if not q:
+        return {"query": text, "error": "empty_query"}
+
+    items = search_rows(q, limit=max(1, min(int(limit or 20), 500)), db_path=IO_DB)
+    return {"query": q, "count": len(items), "items": items}
+
+
 # --------------------------
 # Tool: list_valves_by_prefix
 # --------------------------
-def list_valves_by_prefix(prefix: str, limit: int = 200) -> Dict[str, Any]:
+def list_valves_by_prefix(prefix: str, limit: int = 200, cursor: Optional[str] = None) -> Dict[str, Any]:
     """
     Vrátí ventily (TAGy obsahující 'VA') začínající na zadaný prefix (např. '91002').
     Pro každý TAG vrátí rozdělené vstupy/výstupy.
+
+    Stránkuje se po TAGech (ne po I/O řádcích): `limit` = počet tagů na stránku,
+    `total` = počet všech ventilů pro prefix, `next_cursor` předej jako `cursor`
+    pro další stránku (None = konec).
     """
     pfx = (prefix or "").strip()
     if not pfx:
         return {"query": prefix, "error": "empty_prefix"}
 
-    like = f"{pfx}%"
-    rows = _q(
-        """
-        SELECT tag, io_type, address, datatype, desc1, desc2, comment
-        FROM io
-        WHERE tag LIKE ?
-        ORDER BY tag, io_type, address
-        LIMIT ?
-        """,
-        (like, max(1, min(int(limit or 200), 1000))),
-    )
-
-    rows = [r for r in rows if "VA" in str(r.get("tag", "")).upper()]
+    idx = get_tag_index(IO_DB)
+    tags, total, next_cursor = idx.valve_page(pfx, max(1, min(int(limit or 200), 1000)), cursor)
 
     grouped: Dict[str, Dict[str, Any]] = {}
-    for r in rows:
-        t = r["tag"]
-        g = grouped.setdefault(t, {"inputs": [], "outputs": []})
-        entry = {
-            "io_type": r.get("io_type"),
-            "address": r.get("address"),
-            "datatype": r.get("datatype"),
-            "desc1": r.get("desc1"),
-            "desc2": r.get("desc2"),
-            "comment": r.get("comment"),
+    for t in tags:
+        io = idx.get(t) or {"inputs": [], "outputs": []}
+        grouped[t] = {
+            "inputs": [{k: v for k, v in r.items() if k != "tag"} for r in io["inputs"]],
+            "outputs": [{k: v for k, v in r.items() if k != "tag"} for r in io["outputs"]],
         }
-        if str(r.get("io_type", "")).upper().startswith("E"):
-            g["inputs"].append(entry)
-        elif str(r.get("io_type", "")).upper().startswith("A"):
-            g["outputs"].append(entry)
 
-    return {"query": pfx, "count": len(grouped), "items": grouped}
+    return {
+        "query": pfx,
+        "count": len(grouped),
+        "total": total,
+        "items": grouped,
+        "next_cursor": next_cursor,
+    }
 
 
 # --------------------------
-# NEW Tool: find_electrical_drawing (rychlé přes PyMuPDF + fallback pypdf)
+# NEW Tool: find_electrical_drawing (index + paralelní živý scan)
 # --------------------------
-def find_electrical_drawing(
+def _match_entry(rel: str, page_idx: int, text: str, tag: str,
+                 offset: Optional[int] = None) -> Dict[str, Any]:
+    """Jeden nález ve výkresu včetně dynamického a statického náhledu."""
+    # dynamický (query string bezpečně zakódujeme)
+    qs = _up.urlencode({"file": rel, "page": page_idx + 1, "tag": tag})
+    rel_preview = f"/preview/electrical?{qs}"
+    abs_preview = f"{PUBLIC_API_BASE_URL}{rel_preview}" if PUBLIC_API_BASE_URL else None
+
+    # statický (už vrací URL-encoded)
+    static = _static_preview_urls(rel, page_idx)
+
+    return {
+        "file": rel,
+        "page": page_idx + 1,  # 1-index
+        "snippet": _page_snippet(text, tag, 60, offset),
+        "preview_url": rel_preview,
+        "preview_absolute_url": abs_preview,
+        "preview_static_url": static["url"],
+        "preview_static_absolute_url": static["abs_url"],
+    }
+
+
+def iter_electrical_drawing(
     tag: str,
     folder: Optional[str] = None,
     max_files: int = 200,
     max_pages_per_file: int = 300,
     stop_after_matches: int = 20,
-) -> Dict[str, Any]:
+    progress_every: int = 10,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[Dict[str, Any]]:
     """
-    Prohledá PDF výkresy ve složce (default: data/electrical) a vrátí seznam
-    [soubor, strana, snippet, preview_url, preview_static_url], kde se TAG vyskytuje v textové vrstvě PDF.
-
-    Výkonové limity:
-      - max_files: kolik PDF maximálně otevřít
-      - max_pages_per_file: kolik stránek max číst z jednoho PDF
-      - stop_after_matches: po kolika nálezech celkově skončit
+    Průběžné hledání TAGu ve výkresech – generuje události:
+      {"type": "start", "query", "dir", "indexed_files", "pending_files"}
+      {"type": "match", "source": "index"|"scan", **položka jako v find_electrical_drawing}
+      {"type": "progress", "files_scanned", "files_total"}   (živý scan)
+      {"type": "done", "count", "indexed_files", "live_scanned_files"}
+      {"type": "error", "error"}
+    Nejdřív nálezy z indexu, pak živý scan neindexovaných/změněných PDF.
+    Nastavení `cancel` (nebo close() generátoru) scan ukončí a zruší zbylé úlohy.
     """
     if not tag or not tag.strip():
-        return {"query": tag, "error": "empty_tag"}
+        yield {"type": "error", "query": tag, "error": "empty_tag"}
+        return
 
     base = folder or ELECTRICAL_DIR
     if not os.path.isdir(base):
-        return {"query": tag, "dir": base, "error": "directory_not_found"}
+        yield {"type": "error", "query": tag, "dir": base, "error": "directory_not_found"}
+        return
 
     needle_norm = _norm_tag(tag)
-    matches: List[Dict[str, Any]] = []
-    scanned = 0
-
-    def _add_match(fpath: str, page_idx: int, text: str):
-        rel = os.path.relpath(fpath, ROOT).replace("\\", "/")
-
-        # dynamický (query string bezpečně zakódujeme)
-        qs = _up.urlencode({"file": rel, "page": page_idx + 1, "tag": tag})
-        rel_preview = f"/preview/electrical?{qs}"
-        abs_preview = f"{PUBLIC_API_BASE_URL}{rel_preview}" if PUBLIC_API_BASE_URL else None
-
-        # statický (už vrací URL-encoded)
-        static = _static_preview_urls(rel, page_idx)
-        static_url = static["url"]
-        static_abs = static["abs_url"]
-
-        matches.append({
-            "file": rel,
-            "page": page_idx + 1,  # 1-index
-            "snippet": _page_snippet(text, tag, 60),
-            "preview_url": rel_preview,
-            "preview_absolute_url": abs_preview,
-            "preview_static_url": static_url,
-            "preview_static_absolute_url": static_abs,
-        })
-
-    for root, _, files in os.walk(base):
-        for fn in files:
-            if not fn.lower().endswith(".pdf"):
-                continue
-            fpath = os.path.join(root, fn)
-            scanned += 1
-            if scanned > max_files:
-                break
-
-            # 1) Rychlá cesta: PyMuPDF
-            if fitz is not None:
-                try:
-                    doc = fitz.open(fpath)
-                    pages_to_scan = min(len(doc), max_pages_per_file)
-                    for pidx in range(pages_to_scan):
-                        page = doc.load_page(pidx)
-                        text = page.get_text("text") or ""
-                        if needle_norm in _norm_tag(text):
-                            _add_match(fpath, pidx, text)
-                            if len(matches) >= stop_after_matches:
-                                break
-                    doc.close()
-                    if len(matches) >= stop_after_matches:
-                        break
-                    # už jsme soubor zkusili; jdi na další
+    count = 0
+
+    # 1) rozdělení PDF na aktuálně indexované (velikost+mtime sedí) a ostatní
+    idx = get_drawing_index()
+    indexed = idx.file_stats()
+    fresh: set = set()
+    pending: List[str] = []
+    for fpath in iter_pdfs(base):
+        rel = rel_path(fpath)
+        prev = indexed.get(rel)
+        if prev is not None:
+            try:
+                st = os.stat(fpath)
+                if prev == (st.st_size, st.st_mtime_ns):
+                    fresh.add(rel)
                     continue
-                except Exception:
-                    # spadlo – zkus fallback
-                    pass
-
-            # 2) Fallback: pypdf (pomalejší)
-            if PdfReader is not None:
-                try:
-                    reader = PdfReader(fpath)
-                    pages_to_scan = min(len(reader.pages), max_pages_per_file)
-                    for pidx in range(pages_to_scan):
-                        try:
-                            text = reader.pages[pidx].extract_text() or ""
-                            if needle_norm in _norm_tag(text):
-                                _add_match(fpath, pidx, text)
-                                if len(matches) >= stop_after_matches:
-                                    break
-                        except Exception:
-                            continue
-                    if len(matches) >= stop_after_matches:
-                        break
-                except Exception:
-                    # nepovedlo se otevřít, pokračuj
-                    continue
-
-        if len(matches) >= stop_after_matches:
-            break
+            except OSError:
+                continue
+        pending.append(fpath)
+    live = pending[:max_files]
 
-    return {
+    yield {
+        "type": "start",
         "query": tag,
         "dir": os.path.relpath(base, ROOT).replace("\\", "/"),
-        "count": len(matches),
-        "matches": matches,
+        "indexed_files": len(fresh),
+        "pending_files": len(live),
+    }
+
+    # 2) odpověď z indexu (ms)
+    if fresh:
+        for hit in idx.lookup(needle_norm, files=fresh, limit=stop_after_matches,
+                              max_pages=max_pages_per_file):
+            count += 1
+            yield {"type": "match", "source": "index",
+                   **_match_entry(hit["file"], hit["page"], hit["text"], tag, hit["offset"])}
+
+    # 3) živý scan jen pro neindexované/změněné soubory – paralelně (services/pdf_scan.py)
+    if live and count < stop_after_matches and not (cancel and cancel.is_set()):
+        for ev in iter_scan(live, needle_norm, max_pages_per_file,
+                            stop_after_matches - count, progress_every=progress_every,
+                            cancel=cancel):
+            if ev["type"] == "match":
+                count += 1
+                yield {"type": "match", "source": "scan",
+                       **_match_entry(rel_path(ev["path"]), ev["page"], ev["text"], tag)}
+            else:
+                yield ev
+
+    yield {
+        "type": "done",
+        "count": count,
+        "indexed_files": len(fresh),
+        "live_scanned_files": len(live),
     }
 
 
+def find_electrical_drawing(
+    tag: str,
+    folder: Optional[str] = None,
+    max_files: int = 200,
+    max_pages_per_file: int = 300,
+    stop_after_matches: int = 20,
+) -> Dict[str, Any]:
+    """
+    Prohledá PDF výkresy ve složce (default: data/electrical) a vrátí seznam
+    [soubor, strana, snippet, preview_url, preview_static_url], kde se TAG vyskytuje v textové vrstvě PDF.
+
+    Nejdřív odpovídá z perzistentního indexu (services/drawing_index.py, staví
+    scripts/build_drawing_index.py); živě se prohledávají jen PDF, které v indexu
+    nejsou nebo se od indexace změnily (velikost/mtime). Streamovaná varianta:
+    iter_electrical_drawing / GET /electrical/search/stream.
+
+    Výkonové limity:
+      - max_files: kolik PDF maximálně otevřít (živý scan)
+      - max_pages_per_file: kolik stránek max číst z jednoho PDF
+      - stop_after_matches: po kolika nálezech celkově skončit
+    """
+    out: Dict[str, Any] = {"query": tag}
+    indexed_matches: List[Dict[str, Any]] = []
+    live_matches: List[Dict[str, Any]] = []
+    for ev in iter_electrical_drawing(tag, folder, max_files, max_pages_per_file,
+                                      stop_after_matches, progress_every=0):
+        kind = ev.pop("type")
+        if kind == "error":
+            return ev
+        if kind == "start":
+            out["dir"] = ev["dir"]
+        elif kind == "match":
+            source = ev.pop("source")
+            (indexed_matches if source == "index" else live_matches).append(ev)
+        elif kind == "done":
+            out.update(ev)
+
+    # nálezy živého scanu chodí v pořadí dokončení → seřadíme je
+    live_matches.sort(key=lambda m: (m["file"], m["page"]))
+    out["matches"] = indexed_matches + live_matches
+    out["count"] = len(out["matches"])
+    return out
+
+
 # --------------------------
 # (Volitelné) další ukázkové nástroje
 # --------------------------
@@ -315,16 +382,53 @@ OPENAI_TOOLS = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_valves",
+            "description": "Najde I/O adresy pro více tagů najednou (až 1000) – použij místo opakovaného find_valve.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "tags": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 1,
+                        "maxItems": 1000,
+                        "description": "Seznam tagů, např. ['91002VA001', '91002VA002']",
+                    },
+                },
+                "required": ["tags"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_io",
+            "description": "Fulltextově hledá v I/O listu (tag, popisy, komentář) – část tagu, text popisu, toleruje překlepy.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string", "description": "Hledaný text, např. 'VA05' nebo 'Spülventil'"},
+                    "limit": {"type": "integer", "minimum": 1, "maximum": 500, "default": 20},
+                },
+                "required": ["text"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
             "name": "list_valves_by_prefix",
-            "description": "Vrátí všechny ventilové TAGy (obsahují 'VA') pro prefix, např. '91002'.",
+            "description": "Vrátí ventilové TAGy (obsahují 'VA') pro prefix, např. '91002'; stránkuje (total, next_cursor).",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "prefix": {"type": "string", "description": "Začátek TAGu, např. '91002'"},
-                    "limit": {"type": "integer", "minimum": 1, "maximum": 1000, "default": 200},
+                    "limit": {"type": "integer", "minimum": 1, "maximum": 1000, "default": 200,
+                              "description": "Počet TAGů na stránku"},
+                    "cursor": {"type": "string", "description": "next_cursor z předchozí stránky"},
                 },
                 "required": ["prefix"],
             },
@@ -373,6 +477,8 @@ OPENAI_TOOLS = [
 
 TOOL_IMPLS = {
     "find_valve": find_valve,
+    "find_valves": find_valves,
+    "search_io": search_io,
     "list_valves_by_prefix": list_valves_by_prefix,
     "find_electrical_drawing": find_electrical_drawing,
     "get_system_state": get_system_state,
@@ -0,0 +1,38 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+
+from scripts import build_io_db  # noqa: E402
+
+# tag; desc1; desc2; extra; io_type; address; datatype; comment
+IO_ROWS = [
+    ("91201PU001", "Recirculation pump", "CIP", "", "A", "20.0", "BOOL", "Start"),
+    ("91201PU001", "Recirculation pump", "CIP", "", "E", "10.0", "BOOL", "Running"),
+    ("91201VA101", "Inlet valve", "tank 1", "", "A", "20.1", "BOOL", ""),
+    ("91201VA102", "Outlet valve", "tank 1", "", "A", "20.2", "BOOL", ""),
+    ("91201VA103", "Drain valve", "tank 1", "", "E", "10.1", "BOOL", "open"),
+    ("91201VA104", "Steam valve", "tank 1", "", "A", "20.3", "BOOL", ""),
+    ("91201VA105", "Water valve", "tank 2", "", "A", "20.4", "BOOL", "near TT201"),
+    ("91202va201", "Return valve", "tank 3", "", "A", "21.0", "BOOL", ""),
+    ("91202TT201", "Temperature", "tank 3", "", "EW", "256", "INT", "degC"),
+]
+
+
+def write_io_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in rows:
+            f.write(";".join(r) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def io_db(tmp_path):
+    """Čerstvě postavená io.db (build_io_db.build) z IO_ROWS."""
+    db = str(tmp_path / "io.db")
+    build_io_db.build(write_io_csv(tmp_path / "io.txt", IO_ROWS), db)
+    return db
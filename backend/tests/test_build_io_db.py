@@ -0,0 +1,79 @@
+# backend/tests/test_build_io_db.py
+import os
+import sqlite3
+
+import pytest
+
+from backend.services.iodb import SQLiteReadPool
+from conftest import IO_ROWS, build_io_db, write_io_csv
+
+
+def _tags(db):
+    con = sqlite3.connect(db)
+    try:
+        return sorted({r[0] for r in con.execute("SELECT tag FROM io")})
+    finally:
+        con.close()
+
+
+def _leftovers(tmp_path):
+    return [p for p in os.listdir(tmp_path) if ".tmp-" in p]
+
+
+def test_build_creates_io_and_fts(io_db):
+    con = sqlite3.connect(io_db)
+    try:
+        assert con.execute("SELECT COUNT(*) FROM io").fetchone()[0] == len(IO_ROWS)
+        assert con.execute("SELECT COUNT(*) FROM io_fts WHERE io_fts MATCH ?", ('"PU001"',)).fetchone()[0] == 2
+        names = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_io_tag", "idx_io_tag_type", "idx_io_address"} <= names
+    finally:
+        con.close()
+
+
+def test_rebuild_swaps_file_and_keeps_other_tables(io_db, tmp_path):
+    con = sqlite3.connect(io_db)
+    con.execute("CREATE TABLE fb_blocks (name TEXT, body TEXT)")
+    con.execute("CREATE INDEX idx_fb_name ON fb_blocks(name)")
+    con.execute("INSERT INTO fb_blocks VALUES ('FB1', 'x')")
+    con.commit()
+    con.close()
+
+    pool = SQLiteReadPool(io_db)
+    assert pool.query_tuples("SELECT COUNT(*) FROM io")[0][0] == len(IO_ROWS)
+    ino = os.stat(io_db).st_ino
+
+    rows = IO_ROWS[:2] + [("91203PU300", "New pump", "", "", "A", "30.0", "BOOL", "")]
+    build_io_db.build(write_io_csv(tmp_path / "new.txt", rows), io_db)
+
+    # nový soubor (os.replace), otevřené spojení čtenáře se přepojí samo
+    assert os.stat(io_db).st_ino != ino
+    assert pool.query_tuples("SELECT COUNT(*) FROM io")[0][0] == 3
+    assert pool.query_tuples("SELECT name, body FROM fb_blocks") == [("FB1", "x")]
+    assert pool.has_table("io_fts")
+    assert pool.query_tuples(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_fb_name'") == [(1,)]
+    assert not _leftovers(tmp_path)
+    pool.close()
+
+
+def test_failed_build_keeps_previous_db(io_db, tmp_path):
+    before = _tags(io_db)
+    with pytest.raises(FileNotFoundError):
+        build_io_db.build(str(tmp_path / "missing.txt"), io_db)
+    assert _tags(io_db) == before
+    assert not _leftovers(tmp_path)
+
+
+def test_dry_run_diff_leaves_db(io_db, tmp_path, capsys):
+    sig = os.stat(io_db)
+    rows = [r for r in IO_ROWS if r[0] != "91202TT201"]
+    rows[0] = rows[0][:7] + ("Start CIP",)
+    rows.append(("91203PU300", "New pump", "", "", "A", "30.0", "BOOL", ""))
+    build_io_db.build(write_io_csv(tmp_path / "new.txt", rows), io_db, do_diff=True, dry_run=True)
+
+    out = capsys.readouterr().out
+    assert "+1 přidáno, -1 odebráno, ~1 změněno" in out
+    assert "91203PU300" in out and "91202TT201" in out
+    assert (os.stat(io_db).st_ino, os.stat(io_db).st_mtime_ns) == (sig.st_ino, sig.st_mtime_ns)
+    assert not _leftovers(tmp_path)
@@ -0,0 +1,197 @@
+# backend/tests/test_colstore_bm25.py
+import os
+
+import numpy as np
+import pytest
+
+from backend.rag import bm25, colstore
+
+PAGES = [
+    "P&ID 91201 CIP: čerpadlo 91201-PU-001, ventil V-102",
+    "Ventil V-103 a teploměr TT101 na nádrži T1",
+    "",
+    "Recirkulace CIP přes V-102 a V-104",
+]
+
+
+# ===== colstore =====
+def test_table_roundtrip(tmp_path):
+    path = str(tmp_path / "t.cols")
+    gen = colstore.write_table(path, {
+        "id": np.array([5, 3, 9], dtype="int64"),
+        "ocr": np.array([1, 0, 1], dtype="uint8"),
+        "text": ["první", "", "třetí řádek"],
+    }, extra={"model": "m", "files": {"a.pdf": {"size": 1}}})
+
+    t = colstore.open_table(path)
+    assert t.gen == gen and len(t) == 3
+    assert t.array("id").tolist() == [5, 3, 9] and t.array("ocr").dtype == np.uint8
+    assert [t.text("text", i) for i in range(3)] == ["první", "", "třetí řádek"]
+    assert t.extra == {"model": "m", "files": {"a.pdf": {"size": 1}}}
+    assert t.has("text") and not t.has("tags")
+
+    col = colstore.TextColumn(t, "text")
+    assert len(col) == 3 and col[-1] == "třetí řádek" and list(col) == ["první", "", "třetí řádek"]
+    with pytest.raises(IndexError):
+        col[3]
+
+
+def test_empty_text_column(tmp_path):
+    path = str(tmp_path / "t.cols")
+    colstore.write_table(path, {"text": ["", ""]})
+    t = colstore.open_table(path)
+    assert list(t.texts("text")) == ["", ""]
+
+
+def test_rows_must_match_unless_ragged(tmp_path):
+    path = str(tmp_path / "t.cols")
+    with pytest.raises(ValueError):
+        colstore.write_table(path, {"a": np.arange(3), "b": ["x"]})
+    assert colstore.open_table(path) is None
+
+    colstore.write_table(path, {"a": np.arange(3), "b": ["x"]}, ragged=True)
+    t = colstore.open_table(path)
+    assert len(t) == 3 and t.length("a") == 3 and t.length("b") == 1
+
+
+def test_new_generation_replaces_old(tmp_path):
+    path = str(tmp_path / "t.cols")
+    g1 = colstore.write_table(path, {"a": np.arange(2)})
+    old = colstore.open_table(path)
+    sig = colstore.table_signature(path)
+    g2 = colstore.write_table(path, {"a": np.arange(4)})
+
+    assert g1 != g2 and colstore.table_signature(path) != sig
+    assert len(colstore.open_table(path)) == 4
+    assert sorted(n for n in os.listdir(path) if not n.startswith(".")) == ["CURRENT", g2]
+    # už otevřená generace zůstává čitelná (mmap)
+    assert old.array("a").tolist() == [0, 1]
+
+    colstore.remove_table(path)
+    assert colstore.open_table(path) is None and colstore.table_signature(path) is None
+
+
+# ===== BM25 =====
+def test_tokenize_compound_codes():
+    assert bm25.tokenize("V-102") == ["v", "102", "v102"]
+    assert bm25.tokenize("91201_PU/001") == ["91201", "pu", "001", "91201pu001"]
+    assert bm25.tokenize("Čerpadlo NÁDRŽ") == ["cerpadlo", "nadrz"]
+
+
+def test_is_tag_query():
+    assert bm25.is_tag_query("91201PU001")
+    assert bm25.is_tag_query("TT101 V-102")
+    assert not bm25.is_tag_query("jak spustit CIP sanitaci")
+    assert not bm25.is_tag_query("V1")
+    assert not bm25.is_tag_query("")
+
+
+def test_bm25_roundtrip_ragged(tmp_path):
+    path = str(tmp_path / "bm25.cols")
+    bm25.write_bm25(path, PAGES, source="g1")
+
+    t = colstore.open_table(path)
+    terms = list(t.texts("term"))
+    assert terms == sorted(set(terms))
+    # ragged: slovník (V), offsety (V + 1), postingy (P), délky dokumentů (N)
+    assert t.length("start") == len(terms) + 1
+    assert t.length("doc") == t.length("tf") == int(t.array("start")[-1])
+    assert t.length("doc_len") == len(PAGES)
+    assert t.array("doc_len")[2] == 0
+
+    idx = bm25.open_bm25(path, source="g1")
+    assert idx is not None and idx.docs == len(PAGES)
+    assert bm25.open_bm25(path, source="jiná generace") is None
+    assert bm25.open_bm25(str(tmp_path / "chybí")) is None
+
+
+def test_bm25_search(tmp_path):
+    path = str(tmp_path / "bm25.cols")
+    bm25.write_bm25(path, PAGES, source="g1")
+    idx = bm25.open_bm25(path)
+
+    # spojený tvar dotazu najde i zápis s pomlčkou
+    assert {r for r, _ in idx.search("V102", 10)} == {0, 3}
+    # rozdělený dotaz trefí přes "v" i jiné ventily, spojený tvar je ale řadí výš
+    assert {r for r, _ in idx.search("v-102", 2)} == {0, 3}
+    assert [r for r, _ in idx.search("91201PU001", 10)] == [0]
+    assert idx.search("TT101", 10)[0][0] == 1
+    assert idx.search("neexistuje", 10) == []
+
+    hits = idx.search("CIP V-102 V-104", 10)
+    assert hits[0][0] == 3 and all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))
+    assert len(idx.search("CIP V-102 V-104", 1)) == 1
+
+
+def test_bm25_empty_corpus(tmp_path):
+    path = str(tmp_path / "bm25.cols")
+    bm25.write_bm25(path, ["", ""], source="g")
+    idx = bm25.open_bm25(path)
+    assert idx.docs == 2 and idx.search("cokoli", 5) == []
+
+
+# ===== retrieve =====
+@pytest.fixture
+def lexical(tmp_path):
+    path = str(tmp_path / "bm25.cols")
+    bm25.write_bm25(path, PAGES, source="g1")
+    return bm25.open_bm25(path)
+
+
+class Dense:
+    """Náhrada FAISS větve – zaznamenává volání (= volání embedding API)."""
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+        self.calls = []
+
+    def __call__(self, n):
+        self.calls.append(n)
+        return [(r, 1.0 - 0.1 * i) for i, r in enumerate(self.ranking[:n])]
+
+
+def test_rrf():
+    fused = bm25.rrf([[1, 2, 3], [3, 1]], k=60)
+    assert [d for d, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_retrieve_auto_tag_skips_dense(lexical):
+    dense = Dense([2, 1])
+    used, hits = bm25.retrieve("V-103", 5, "auto", lexical, dense)
+    assert used == "lexical" and hits[0][0] == 1
+    assert dense.calls == []
+
+
+def test_retrieve_auto_tag_without_hits_falls_back_to_dense(lexical):
+    dense = Dense([2, 1])
+    used, hits = bm25.retrieve("XY999", 5, "auto", lexical, dense)
+    assert used == "dense" and [r for r, _ in hits] == [2, 1]
+    assert dense.calls == [5]
+
+
+def test_retrieve_explicit_lexical_does_not_fall_back(lexical):
+    dense = Dense([2])
+    assert bm25.retrieve("XY999", 5, "lexical", lexical, dense) == ("lexical", [])
+    assert dense.calls == []
+
+
+def test_retrieve_auto_sentence_is_hybrid(lexical):
+    dense = Dense([2, 3, 1])
+    used, hits = bm25.retrieve("recirkulace CIP", 3, "auto", lexical, dense, depth=10)
+    assert used == "hybrid"
+    assert dense.calls == [10]
+    # 3 je v obou větvích → první; 2 jen z FAISS
+    assert hits[0][0] == 3 and {r for r, _ in hits} <= {0, 1, 2, 3} and len(hits) == 3
+    assert 2 in {r for r, _ in hits}
+
+
+def test_retrieve_without_lexical_is_dense():
+    dense = Dense([4, 0])
+    assert bm25.retrieve("91201PU001", 1, "auto", None, dense) == ("dense", [(4, 1.0)])
+    assert bm25.retrieve("91201PU001", 1, "lexical", None, dense)[0] == "dense"
+
+
+def test_retrieve_rejects_unknown_mode(lexical):
+    with pytest.raises(ValueError):
+        bm25.retrieve("x", 1, "semantic", lexical, Dense([]))
@@ -0,0 +1,55 @@
+# backend/tests/test_drawing_index.py
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from backend.services import drawing_index  # noqa: E402
+from backend.services.drawing_index import DrawingIndex  # noqa: E402
+
+PAGES = {
+    "a.pdf": ["Ventil 91002VA005 na přívodu"],
+    "b.pdf": ["Cívka 91002VA005-Y1"],
+    "c.pdf": ["Koncák 91002VA005.S1", "jiný ventil 91002VA0051"],
+    "d.pdf": ["rozdělený tag 91002 VA005"],
+}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(drawing_index, "ROOT", str(tmp_path))
+    base = tmp_path / "electrical"
+    base.mkdir()
+    for name, pages in PAGES.items():
+        doc = fitz.open()
+        for text in pages:
+            doc.new_page().insert_text((50, 100), text)
+        doc.save(str(base / name))
+    idx = DrawingIndex(str(tmp_path / "index.db"))
+    idx.refresh(str(base))
+    return idx
+
+
+def _hits(rows):
+    return [(r["file"], r["page"]) for r in rows]
+
+
+def test_lookup_exact_and_suffixed_tokens(index):
+    # přesný token i tokeny s příponou za -_. (ne však 91002VA0051)
+    rows = index.lookup("91002VA005")
+    assert _hits(rows) == [("electrical/a.pdf", 0), ("electrical/b.pdf", 0), ("electrical/c.pdf", 0)]
+    assert all(r["offset"] is not None for r in rows)
+    assert _hits(index.lookup("91002VA005", files={"electrical/b.pdf", "electrical/c.pdf"})) == [
+        ("electrical/b.pdf", 0), ("electrical/c.pdf", 0)]
+    assert len(index.lookup("91002VA005", limit=2)) == 2
+
+
+def test_lookup_full_suffixed_tag(index):
+    assert _hits(index.lookup("91002VA005-Y1")) == [("electrical/b.pdf", 0)]
+    assert _hits(index.lookup("91002VA0051")) == [("electrical/c.pdf", 1)]
+
+
+def test_lookup_substring_fallback(index):
+    # tag rozdělený mezerou není token → sken normalizovaného textu
+    rows = index.lookup("91002VA005", files={"electrical/d.pdf"})
+    assert _hits(rows) == [("electrical/d.pdf", 0)] and rows[0]["offset"] is None
+    assert index.lookup("NEEXISTUJE") == []
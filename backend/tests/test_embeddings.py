@@ -0,0 +1,193 @@
+# backend/tests/test_embeddings.py
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.services import embeddings
+from backend.services.embeddings import EmbeddingService
+
+MODEL = "text-embedding-3-small"
+
+
+def _vec(text, dims):
+    rng = np.random.default_rng(sum(text.encode("utf-8")) + 7 * len(text))
+    return rng.random(dims or 4).astype("float32")
+
+
+class FakeClient:
+    """Náhrada OpenAI klienta: embeddings.create(model, input, dimensions?)."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input, dimensions=None):
+        with self._lock:
+            self.calls.append({"model": model, "input": list(input), "dimensions": dimensions})
+        if self.fail:
+            raise RuntimeError("API nedostupné")
+        # API nemusí vracet data v pořadí vstupů → řadí se podle index
+        data = [SimpleNamespace(index=i, embedding=_vec(t, dimensions).tolist()) for i, t in enumerate(input)]
+        return SimpleNamespace(data=data[::-1], usage=SimpleNamespace(prompt_tokens=len(input)))
+
+    @property
+    def inputs(self):
+        return [t for c in self.calls for t in c["input"]]
+
+
+@pytest.fixture(autouse=True)
+def no_tiktoken(monkeypatch):
+    # bez sítě se BPE nestáhne → odhad délky (deterministické dávky)
+    monkeypatch.setattr(embeddings, "tiktoken", None)
+
+
+def _service(tmp_path, **kw):
+    kw.setdefault("coalesce_window_ms", 0)
+    return EmbeddingService(db_path=str(tmp_path / "embed_cache.db"), **kw)
+
+
+def test_embed_order_and_dedup(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client)
+    out = svc.embed(["a", "b", "a"], MODEL)
+    assert out.shape == (3, 4) and out.dtype == np.float32
+    assert np.allclose(out[0], _vec("a", 0)) and np.allclose(out[1], _vec("b", 0))
+    assert np.array_equal(out[0], out[2])
+    assert client.inputs == ["a", "b"]
+    assert svc.embed([], MODEL).shape == (0, 0)
+
+
+def test_sqlite_cache_hits_across_instances(tmp_path):
+    client = FakeClient()
+    first = _service(tmp_path, client=client).embed(["a", "b"], MODEL)
+
+    svc = _service(tmp_path, client=client)
+    out = svc.embed(["b", "c", "a"], MODEL)
+    assert client.inputs == ["a", "b", "c"]
+    assert np.array_equal(out[0], first[1]) and np.array_equal(out[2], first[0])
+    st = svc.stats()
+    assert (st["db_hits"], st["misses"], st["entries"], st["requests"]) == (2, 1, 3, 1)
+    assert st["saved_tokens"] > 0
+
+
+def test_cache_key_includes_model_and_dims(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client)
+    svc.embed(["a"], MODEL)
+    assert svc.embed(["a"], MODEL, dims=8).shape == (1, 8)
+    svc.embed(["a"], "text-embedding-3-large")
+    assert [(c["model"], c["dimensions"]) for c in client.calls] == [
+        (MODEL, None), (MODEL, 8), ("text-embedding-3-large", None)]
+
+
+def test_cache_disabled(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, enable_cache=False)
+    svc.embed(["a"], MODEL)
+    svc.embed(["a"], MODEL)
+    assert len(client.calls) == 2 and svc.stats()["cache_enabled"] is False
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_batches_by_count(tmp_path, concurrency):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, batch_size=2, concurrency=concurrency)
+    texts = [f"text {i}" for i in range(5)]
+    out = svc.embed(texts, MODEL)
+    assert sorted(len(c["input"]) for c in client.calls) == [1, 2, 2]
+    assert all(np.allclose(out[i], _vec(t, 0)) for i, t in enumerate(texts))
+
+
+def test_batches_by_tokens(tmp_path):
+    client = FakeClient()
+    # odhad tokenů = len // 3 + 1 → 12 znaků = 5 tokenů, dvě věty na dávku
+    svc = _service(tmp_path, client=client, batch_tokens=10, concurrency=1)
+    texts = [f"{i:02d}-abcdefghi" for i in range(5)]
+    svc.embed(texts, MODEL)
+    assert [c["input"] for c in client.calls] == [texts[0:2], texts[2:4], texts[4:5]]
+
+
+def test_oversized_text_gets_own_batch(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, batch_tokens=10, concurrency=1)
+    svc.embed(["x" * 100, "y"], MODEL)
+    assert [c["input"] for c in client.calls] == [["x" * 100], ["y"]]
+
+
+def test_query_lru(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, query_lru=1)
+    q = svc.embed_query("ventil", MODEL)
+    q[:] = 0  # vrácené pole je kopie
+    assert np.allclose(svc.embed_query("ventil", MODEL), _vec("ventil", 0))
+    assert len(client.calls) == 1 and svc.stats()["lru_hits"] == 1
+
+    svc.embed_query("čerpadlo", MODEL)       # vytlačí "ventil" z LRU
+    svc.embed_query("ventil", MODEL)         # → SQLite, ne API
+    st = svc.stats()
+    assert len(client.calls) == 2 and st["lru_hits"] == 1 and st["db_hits"] == 1
+
+
+def test_aembed_query_without_coalescer(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client)
+    vec = asyncio.run(svc.aembed_query("ventil", MODEL))
+    assert np.allclose(vec, _vec("ventil", 0))
+
+
+# ===== EmbeddingCoalescer =====
+def test_coalescer_merges_concurrent_queries(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, coalesce_window_ms=200, coalesce_max_batch=64)
+    texts = [f"dotaz {i}" for i in range(8)] + ["dotaz 0"]
+    start = threading.Barrier(len(texts))
+    out = {}
+
+    def run(i, t):
+        start.wait()
+        out[i] = svc.embed_query(t, MODEL)
+
+    threads = [threading.Thread(target=run, args=(i, t)) for i, t in enumerate(texts)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(10)
+
+    assert len(client.calls) == 1 and sorted(client.inputs) == sorted(set(texts))
+    assert all(np.allclose(out[i], _vec(t, 0)) for i, t in enumerate(texts))
+    st = svc.stats()["coalescer"]
+    assert st["batches"] == 1 and st["queries"] == len(texts) and st["requests_saved"] == len(texts) - 1
+
+
+def test_coalescer_max_batch_splits(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, coalesce_window_ms=200, coalesce_max_batch=2)
+    futs = [svc.coalescer.submit(f"q{i}", MODEL) for i in range(5)]
+    vecs = [f.result(10) for f in futs]
+    assert all(np.allclose(v, _vec(f"q{i}", 0)) for i, v in enumerate(vecs))
+    assert sorted(len(c["input"]) for c in client.calls) == [1, 2, 2]
+
+
+def test_coalescer_skips_cancelled(tmp_path):
+    client = FakeClient()
+    svc = _service(tmp_path, client=client, coalesce_window_ms=200)
+    cancelled = svc.coalescer.submit("zrušený", MODEL)
+    kept = svc.coalescer.submit("platný", MODEL)
+    assert cancelled.cancel()
+    assert np.allclose(kept.result(10), _vec("platný", 0))
+    assert client.inputs == ["platný"]
+
+
+def test_coalescer_propagates_errors(tmp_path):
+    svc = _service(tmp_path, client=FakeClient(fail=True), coalesce_window_ms=50)
+    futs = [svc.coalescer.submit(f"q{i}", MODEL) for i in range(3)]
+    for f in futs:
+        with pytest.raises(RuntimeError):
+            f.result(10)
+    with pytest.raises(RuntimeError):
+        svc.embed_query("další", MODEL)
@@ -0,0 +1,63 @@
+# backend/tests/test_io_index.py
+from backend.services.io_index import IOTagIndex
+
+VALVES_91201 = ["91201VA101", "91201VA102", "91201VA103", "91201VA104", "91201VA105"]
+
+
+def _all_pages(idx, prefix, limit):
+    tags, cursor, pages = [], None, 0
+    while True:
+        page, total, cursor = idx.valve_page(prefix, limit, cursor)
+        tags += page
+        pages += 1
+        if cursor is None:
+            return tags, total, pages
+
+
+def test_valve_page_cursor_walks_all(io_db):
+    idx = IOTagIndex(io_db)
+    tags, total, pages = _all_pages(idx, "91201", 2)
+    assert tags == VALVES_91201
+    assert total == 5 and pages == 3
+
+
+def test_valve_page_first_page(io_db):
+    page, total, cursor = IOTagIndex(io_db).valve_page("91201", 2)
+    assert page == VALVES_91201[:2]
+    assert total == 5 and cursor == "91201VA102"
+
+
+def test_valve_page_last_page_has_no_cursor(io_db):
+    page, total, cursor = IOTagIndex(io_db).valve_page("91201", 5)
+    assert page == VALVES_91201 and total == 5 and cursor is None
+
+
+def test_valve_page_prefix_case_insensitive(io_db):
+    idx = IOTagIndex(io_db)
+    # jen ventily (tag obsahuje VA); malými písmeny zapsaný tag drží původní tvar
+    tags, total, _ = _all_pages(idx, "", 4)
+    assert tags == VALVES_91201 + ["91202va201"] and total == 6
+    assert idx.valve_page("91202VA", 10) == (["91202va201"], 1, None)
+
+
+def test_valve_page_cursor_outside_prefix(io_db):
+    idx = IOTagIndex(io_db)
+    # kurzor za koncem rozsahu → prázdná stránka, total beze změny
+    assert idx.valve_page("91201", 2, "91201VA999") == ([], 5, None)
+    # kurzor před rozsahem → od začátku
+    assert idx.valve_page("91201", 2, "0")[0] == VALVES_91201[:2]
+
+
+def test_valve_page_unknown_prefix(io_db):
+    assert IOTagIndex(io_db).valve_page("99999", 10) == ([], 0, None)
+
+
+def test_lookups(io_db):
+    idx = IOTagIndex(io_db)
+    pu = idx.get("91201PU001")
+    assert [r["address"] for r in pu["inputs"]] == ["10.0"]
+    assert [r["address"] for r in pu["outputs"]] == ["20.0"]
+    assert idx.get("91201pu001") is None
+    assert idx.get_ci("91202VA201") == ["91202va201"]
+    assert idx.prefix("91202") == ["91202TT201", "91202va201"]
+    assert len(idx) == 8
@@ -0,0 +1,70 @@
+# backend/tests/test_io_search.py
+import sqlite3
+
+from backend.services import io_search
+
+
+def test_phrase_match_is_case_insensitive_substring(io_db):
+    rows = io_search.search_rows("pu001", db_path=io_db)
+    assert rows and {r["tag"] for r in rows} == {"91201PU001"}
+    assert all(r["match"] == "substring" for r in rows)
+    assert {r["io_type"] for r in rows} == {"A", "E"}
+
+
+def test_phrase_match_ranks_tag_column_first(io_db):
+    # "TT201" je v tagu jednoho řádku a v komentáři jiného → tag hit první
+    rows = io_search.search_rows("tt201", db_path=io_db, fuzzy=False)
+    assert [r["tag"] for r in rows] == ["91202TT201", "91201VA105"]
+    assert rows[0]["score"] > rows[1]["score"]
+
+
+def test_phrase_match_respects_columns(io_db):
+    assert io_search.search_rows("valve", columns=["tag"], db_path=io_db, fuzzy=False) == []
+    rows = io_search.search_rows("valve", columns=["desc1"], db_path=io_db, fuzzy=False)
+    assert len(rows) == 6
+
+
+def test_fuzzy_finds_typo(io_db):
+    assert io_search.search_rows("Recirculaton pump", db_path=io_db, fuzzy=False) == []
+    rows = io_search.search_rows("Recirculaton pump", db_path=io_db)
+    assert rows and {r["tag"] for r in rows} == {"91201PU001"}
+    assert all(r["match"] == "fuzzy" for r in rows)
+    assert all(0 < r["score"] <= 1 for r in rows)
+
+
+def test_fuzzy_does_not_repeat_exact_hits(io_db):
+    rows = io_search.search_rows("Steam valve", db_path=io_db)
+    assert rows[0]["tag"] == "91201VA104" and rows[0]["match"] == "substring"
+    tags = [(r["tag"], r["io_type"], r["address"]) for r in rows]
+    assert len(tags) == len(set(tags))
+
+
+def test_short_query_uses_like(io_db):
+    rows = io_search.search_rows("va", db_path=io_db)
+    assert {r["tag"] for r in rows} >= {"91201VA101", "91202va201"}
+    assert all(r["match"] == "substring" and r["score"] == 1.0 for r in rows)
+
+
+def test_like_fallback_without_fts(tmp_path):
+    db = str(tmp_path / "old.db")
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE io (tag, desc1, desc2, extra, io_type, address, datatype, comment)")
+    con.execute("INSERT INTO io VALUES ('91201PU001', 'Pump', '', '', 'A', '20.0', 'BOOL', '')")
+    con.execute("INSERT INTO io VALUES ('91201VA101', 'Valve', '', '', 'A', '20.1', 'BOOL', '')")
+    con.commit()
+    con.close()
+    assert not io_search.has_fts(db)
+    rows = io_search.search_rows("pu00", db_path=db)
+    assert [r["tag"] for r in rows] == ["91201PU001"]
+    assert io_search.search_tags("201", db_path=db) == ["91201PU001", "91201VA101"]
+
+
+def test_search_tags_distinct_sorted(io_db):
+    assert io_search.search_tags("pu001", db_path=io_db) == ["91201PU001"]
+    assert io_search.search_tags("9120", db_path=io_db) == sorted(io_search.search_tags("9120", db_path=io_db))
+    assert len(io_search.search_tags("9120", db_path=io_db)) == 8
+
+
+def test_empty_query(io_db):
+    assert io_search.search_rows("  ", db_path=io_db) == []
+    assert io_search.search_tags("", db_path=io_db) == []
@@ -0,0 +1,87 @@
+# backend/tests/test_ocr_cache.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from backend.rag import ocr_pipeline  # noqa: E402
+from backend.rag.ocr_cache import OCRCache  # noqa: E402
+from backend.rag.ocr_pipeline import OCRPipeline, OCRResult, OCRSettings  # noqa: E402
+
+PAGES = 4
+STRATEGY = "thr/11"
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    """Pool ve vláknech → náhrady OCR funkcí platí i „ve workerech“."""
+
+    def __init__(self, max_workers, mp_context=None, initializer=None):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    doc = fitz.open()
+    for i in range(PAGES):
+        # strany bez textové vrstvy, každá s jiným obsahem (jiný otisk)
+        doc.new_page().draw_rect(fitz.Rect(20 + 10 * i, 20, 200, 120 + 5 * i))
+    pdf = str(tmp_path / "scan.pdf")
+    doc.save(pdf)
+
+    calls = []
+
+    def fake_convert(path, dpi, first_page, last_page, fmt, output_folder, paths_only):
+        out = []
+        with fitz.open(path) as d:
+            for n in range(first_page, last_page + 1):
+                p = f"{output_folder}/p{n:04d}.png"
+                d.load_page(n - 1).get_pixmap(dpi=36).save(p)
+                out.append(p)
+        return out
+
+    def fake_ocr(path, s, langs=None, prefer=None):
+        calls.append((path, langs, prefer))
+        n = int(path[-8:-4])
+        return OCRResult(f"strana {n} čerpadlo 91201PU00{n}", STRATEGY, langs or s.langs, 1, 90.0, True)
+
+    cache = OCRCache(str(tmp_path / "ocr_cache.db"))
+    monkeypatch.setattr(ocr_pipeline, "tesseract_version", lambda: "5.3.0")
+    monkeypatch.setattr(ocr_pipeline, "get_ocr_cache", lambda: cache)
+    monkeypatch.setattr(ocr_pipeline, "ProcessPoolExecutor", _ThreadPool)
+    monkeypatch.setattr(ocr_pipeline, "convert_from_path", fake_convert)
+    monkeypatch.setattr(ocr_pipeline, "ocr_page_image", fake_ocr)
+
+    def run():
+        p = OCRPipeline(OCRSettings(tiled="off"), workers=1, raster_batch=1, use_cache=True)
+        pages = sorted(p.iter_pages([pdf]), key=lambda r: r["page"])
+        return p.stats, pages
+
+    return run, calls, cache, pdf
+
+
+def test_second_run_hits_cache_after_learning(pipeline):
+    run, calls, cache, pdf = pipeline
+    stats, first = run()
+    assert len(calls) == PAGES and stats["cache_misses"] == PAGES
+    # profil se během běhu naučil strategii → pozdější strany ji dostaly jako preferovanou
+    assert calls[0][2] is None and calls[-1][2] == STRATEGY
+    assert cache.get_profile(pdf)["strategy"] == STRATEGY
+
+    calls.clear()
+    stats, second = run()
+    assert calls == [] and stats["ocr_passes"] == 0
+    assert (stats["cache_hits"], stats["cache_misses"]) == (PAGES, 0)
+    assert [(r["page"], r["text"], r["ocr"]) for r in second] == [(r["page"], r["text"], r["ocr"]) for r in first]
+    assert cache.get_profile(pdf)["strategy"] == STRATEGY
+
+
+def test_cache_stores_strategy_and_langs(tmp_path):
+    cache = OCRCache(str(tmp_path / "ocr_cache.db"))
+    key = cache.key("otisk", OCRSettings(), "5.3.0")
+    cache.put(key, "text 91201PU001", ["91201PU001"], STRATEGY, "ces")
+    assert cache.get_many([key, "jiný"]) == {key: ("text 91201PU001", ["91201PU001"], STRATEGY, "ces")}
+    assert cache.key("otisk", OCRSettings(dpi=200), "5.3.0") != key
+    assert cache.key("otisk", OCRSettings(), "5.4.0") != key
+    st = cache.stats()
+    assert (st["hits"], st["misses"], st["puts"], st["entries"]) == (1, 1, 1, 1)
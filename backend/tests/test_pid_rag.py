@@ -0,0 +1,59 @@
+# backend/tests/test_pid_rag.py
+import json
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from backend.rag import pid_rag
+from backend.rag.pid_rag import PIDRAG
+
+
+def _page(i):
+    return {"id": i, "file": "a.pdf", "path": "a.pdf", "page": i + 1,
+            "text": f"strana {i} 91201PU00{i}", "tags": [f"91201PU00{i}"], "ocr": False}
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    reads = []
+    read_index = faiss.read_index
+
+    def counting_read(path):
+        reads.append(path)
+        return read_index(path)
+
+    monkeypatch.setattr(pid_rag.faiss, "read_index", counting_read)
+    r = PIDRAG(pids_dir=str(tmp_path / "pdf"), index_path=str(tmp_path / "faiss.index"),
+               meta_path=str(tmp_path / "meta.json"), openai_api_key="sk-test")
+    return r, reads
+
+
+def _write(r, n_vectors, pages, mtime):
+    # starý formát: IndexFlatIP (id = pozice) + meta.json se seznamem stran
+    flat = faiss.IndexFlatIP(4)
+    flat.add(np.eye(4, dtype="float32")[:n_vectors])
+    faiss.write_index(flat, r.index_path)
+    with open(r.meta_path, "w", encoding="utf-8") as f:
+        json.dump([_page(i) for i in range(pages)], f)
+    for p in (r.index_path, r.meta_path):
+        os.utime(p, ns=(mtime, mtime))
+
+
+def test_inconsistent_files_are_not_reread(rag):
+    r, reads = rag
+    _write(r, 2, 2, 1_000_000_000)
+    assert [m["page"] for m in r.find_tag("91201PU001")] == [2]
+    assert len(reads) == 1 and r.generation == 1
+
+    # index a metadata nesedí (rozepsaný zápis jiného workeru) → starý stav, jedno čtení
+    _write(r, 3, 2, 2_000_000_000)
+    for _ in range(3):
+        assert [m["page"] for m in r.find_tag("91201PU001")] == [2]
+    assert len(reads) == 2 and r.generation == 1
+
+    # soubory se znovu změnily a sedí → nový stav
+    _write(r, 3, 3, 3_000_000_000)
+    assert [m["page"] for m in r.find_tag("91201PU002")] == [3]
+    assert len(reads) == 3 and len(r.meta) == 3
@@ -0,0 +1,120 @@
+# backend/tests/test_preview_rotation.py
+import numpy as np
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.api.routers import electrical, preview  # noqa: E402
+from backend.services.drawing_index import page_words_live, transform_rect  # noqa: E402
+from backend.services.preview_cache import PreviewCache  # noqa: E402
+from backend.services.tiles import TILE_SIZE  # noqa: E402
+
+TAG = "TAG77X"
+
+
+class _NoIndex:
+    def page_words(self, rel, page):
+        return None
+
+
+class _LiveIndex:
+    """Jako index výkresů: slova v neotočených souřadnicích strany."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def page_words(self, rel, page):
+        return page_words_live(str(self.root / rel), page)
+
+
+@pytest.fixture(params=["index", "search_for"])
+def client(request, tmp_path, monkeypatch):
+    doc = fitz.open()
+    pg = doc.new_page(width=600, height=400)
+    pg.insert_text((50, 200), TAG, fontsize=20)
+    pg.set_rotation(90)      # ležatý list uložený s /Rotate 90
+    doc.save(str(tmp_path / "r.pdf"))
+
+    idx = _LiveIndex(tmp_path) if request.param == "index" else _NoIndex()
+    for mod in (preview, electrical):
+        monkeypatch.setattr(mod, "ROOT", str(tmp_path))
+        monkeypatch.setattr(mod, "get_drawing_index", lambda: idx)
+    cache = PreviewCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(preview, "get_preview_cache", lambda: cache)
+
+    app = FastAPI()
+    app.include_router(preview.router)
+    app.include_router(electrical.router)
+    return TestClient(app)
+
+
+def _bbox(mask):
+    ys, xs = np.nonzero(mask)
+    assert len(xs), "nic nenalezeno"
+    return xs.min(), ys.min(), xs.max(), ys.max()
+
+
+def _image(data):
+    pix = fitz.Pixmap(data)
+    return np.frombuffer(pix.samples, np.uint8).reshape(pix.h, pix.w, pix.n)
+
+
+def _assert_frame_around_text(img):
+    red = (img[:, :, 0] > 200) & (img[:, :, 1] < 80) & (img[:, :, 2] < 80)
+    dark = (img[:, :, 0] < 100) & (img[:, :, 1] < 100) & (img[:, :, 2] < 100)
+    rx0, ry0, rx1, ry1 = _bbox(red)
+    tx0, ty0, tx1, ty1 = _bbox(dark)
+    assert rx0 <= tx0 and ry0 <= ty0 and rx1 >= tx1 and ry1 >= ty1
+    # rámeček těsně kolem textu, ne přes celou stranu
+    assert (rx1 - rx0) < 3 * (tx1 - tx0 + 1) and (ry1 - ry0) < 3 * (ty1 - ty0 + 1)
+
+
+def test_transform_rect_rotation():
+    pg = fitz.open().new_page(width=600, height=400)
+    pg.set_rotation(90)
+    r = (50.0, 80.0, 130.0, 105.0)
+    assert transform_rect(r, tuple(pg.rotation_matrix)) == pytest.approx(tuple(fitz.Rect(r) * pg.rotation_matrix))
+    assert transform_rect(r, (1, 0, 0, 1, 0, 0)) == r
+
+
+def test_preview_highlight_on_rotated_page(client):
+    resp = client.get("/preview/electrical", params={"file": "r.pdf", "tag": TAG, "scale": 1.0, "fmt": "png"})
+    assert resp.status_code == 200
+    img = _image(resp.content)
+    assert img.shape[:2] == (600, 400)      # otočená strana
+    _assert_frame_around_text(img)
+
+
+def test_tile_highlight_on_rotated_page(client):
+    man = client.get("/preview/tiles/r.pdf/1/manifest.json", params={"fmt": "png"}).json()
+    assert (man["width"], man["height"]) == (400, 600)
+    words = client.get("/electrical/words", params={"file": "r.pdf", "tag": TAG}).json()
+    x0, y0, x1, y1 = words["rects"][0]
+    # nejhlubší úroveň s více dlaždicemi, kde se tag (s okrajem) vejde do jedné dlaždice
+    for lv in reversed(man["levels"]):
+        s = lv["scale"]
+        tiles = {(int(px // TILE_SIZE), int(py // TILE_SIZE))
+                 for px in ((x0 - 4) * s, (x1 + 4) * s) for py in ((y0 - 4) * s, (y1 + 4) * s)}
+        if len(tiles) == 1 and lv["cols"] * lv["rows"] > 1:
+            break
+    else:
+        pytest.fail("žádná vhodná úroveň")
+    (x, y), = tiles
+    resp = client.get(f"/preview/tiles/r.pdf/1/{lv['z']}/{x}/{y}", params={"tag": TAG, "fmt": "png"})
+    assert resp.status_code == 200
+    _assert_frame_around_text(_image(resp.content))
+
+
+def test_words_are_rotated(client):
+    out = client.get("/electrical/words", params={"file": "r.pdf", "tag": TAG}).json()
+    assert out["rotation"] == 90 and (out["width"], out["height"]) == (400, 600)
+    x0, y0, x1, y1 = out["rects"][0]
+    # x v neotočené straně → y po otočení o 90°; y → 400 − x; text jde svisle
+    assert 0 <= x0 < x1 <= 400 and 0 <= y0 < y1 <= 600
+    assert y0 == pytest.approx(50, abs=1) and 180 < x0 < x1 < 222 and (y1 - y0) > (x1 - x0)
+
+    words = client.get("/electrical/words", params={"file": "r.pdf"}).json()["words"]
+    assert words[0]["text"] == TAG and words[0]["rect"] == pytest.approx(out["rects"][0], abs=0.01)
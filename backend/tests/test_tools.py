@@ -0,0 +1,31 @@
+# backend/tests/test_tools.py
+import pytest
+
+from backend.services import tools
+
+
+@pytest.fixture(autouse=True)
+def io_db_path(io_db, monkeypatch):
+    monkeypatch.setattr(tools, "IO_DB", io_db)
+
+
+def test_find_valves_exact_and_case_insensitive():
+    out = tools.find_valves(["91201PU001", " 91202VA201 ", "91201PU001", "NEEXISTUJE"])
+    assert out["query_count"] == 3 and out["found"] == 2 and out["missing"] == ["NEEXISTUJE"]
+    assert out["items"]["91201PU001"]["match"] == "exact"
+    assert out["items"]["91202VA201"] == {**out["items"]["91202VA201"],
+                                          "match": "case_insensitive", "tag": "91202va201"}
+
+
+def test_find_valves_non_string_items():
+    out = tools.find_valves(["91201PU001", 5, None, "  "])
+    assert out["query_count"] == 2 and out["missing"] == ["5"]
+    assert list(out["items"]) == ["91201PU001"]
+
+
+def test_find_valves_invalid_input():
+    assert tools.find_valves("91201PU001")["found"] == 1
+    assert tools.find_valves([])["error"] == "empty_tags"
+    assert tools.find_valves(None)["error"] == "empty_tags"
+    assert tools.find_valves(5)["error"].startswith("invalid_tags")
+    assert tools.find_valves({"tag": "91201PU001"})["error"].startswith("invalid_tags")
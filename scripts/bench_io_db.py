@@ -0,0 +1,110 @@
+# scripts/bench_io_db.py
+"""
+Benchmark: connect-per-query (původní tools._q) vs. sdílený read-only pool (services/iodb.py).
+
+Použití:
+  python scripts/bench_io_db.py                 # syntetická DB (50k řádků) v temp složce
+  python scripts/bench_io_db.py --db data/io.db # reálná DB
+  python scripts/bench_io_db.py --threads 8 --seconds 3
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.services.iodb import SQLiteReadPool  # noqa: E402
+
+SQL_EXACT = "SELECT * FROM io WHERE tag = ? ORDER BY io_type, address"
+
+
+def make_synthetic_db(path: str, rows: int) -> None:
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE io (tag TEXT, desc1 TEXT, desc2 TEXT, extra TEXT,"
+        " io_type TEXT, address TEXT, datatype TEXT, comment TEXT)"
+    )
+    data = []
+    for i in range(rows):
+        tag = f"9{i // 400 % 10000:04d}VA{i % 400:03d}"
+        data.append((tag, f"Ventil {i}", "", "", "E" if i % 2 else "A", f"{i // 8}.{i % 8}", "Bool", ""))
+    con.executemany("INSERT INTO io VALUES (?,?,?,?,?,?,?,?)", data)
+    con.execute("CREATE INDEX idx_io_tag ON io(tag)")
+    con.commit()
+    con.close()
+
+
+def sample_tags(path: str, n: int = 500):
+    con = sqlite3.connect(path)
+    tags = [r[0] for r in con.execute("SELECT DISTINCT tag FROM io LIMIT ?", (n * 10,))]
+    con.close()
+    random.shuffle(tags)
+    return tags[:n] or ["X"]
+
+
+def q_connect_per_query(path: str, tag: str):
+    con = sqlite3.connect(path)
+    con.row_factory = sqlite3.Row
+    rows = [dict(r) for r in con.execute(SQL_EXACT, (tag,)).fetchall()]
+    con.close()
+    return rows
+
+
+def run(fn, tags, threads: int, seconds: float) -> float:
+    stop = time.perf_counter() + seconds
+    counts = [0] * threads
+
+    def worker(i: int):
+        k = i
+        while time.perf_counter() < stop:
+            fn(tags[k % len(tags)])
+            k += 1
+            counts[i] += 1
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return sum(counts) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=2.0)
+    args = ap.parse_args()
+
+    tmp = None
+    db = args.db
+    if not db:
+        tmp = tempfile.TemporaryDirectory()
+        db = os.path.join(tmp.name, "io.db")
+        make_synthetic_db(db, args.rows)
+
+    tags = sample_tags(db)
+    pool = SQLiteReadPool(db)
+
+    before = run(lambda t: q_connect_per_query(db, t), tags, args.threads, args.seconds)
+    after = run(lambda t: pool.query(SQL_EXACT, (t,)), tags, args.threads, args.seconds)
+
+    print(f"DB: {db}  threads={args.threads}")
+    print(f"connect-per-query : {before:10.0f} q/s")
+    print(f"read-only pool    : {after:10.0f} q/s  ({after / max(before, 1e-9):.1f}×)")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# scripts/bench_pdf_scan.py
+"""
+Benchmark: sériový vs. paralelní (ProcessPool) živý scan PDF výkresů (services/pdf_scan.py).
+
+Vygeneruje syntetický korpus (default 500 PDF × 20 stran, PyMuPDF) a změří
+čas plného průchodu (hledaný tag není nikde → žádné předčasné ukončení).
+
+Použití:
+  python scripts/bench_pdf_scan.py
+  python scripts/bench_pdf_scan.py --files 500 --pages 20 --workers 1,2,4,8
+  python scripts/bench_pdf_scan.py --dir data/electrical     # reálné výkresy
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.services import pdf_scan  # noqa: E402
+from backend.services.drawing_index import iter_pdfs  # noqa: E402
+
+
+def make_corpus(out_dir: str, files: int, pages: int) -> None:
+    import fitz  # PyMuPDF
+
+    for i in range(files):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page(width=1190, height=842)  # A3 na šířku
+            y = 40
+            for row in range(40):
+                page.insert_text((40, y), f"=A{i}+S{p} -K{row} 9{i % 10000:04d}VA{row:03d} Klemme X{row}:1 24VDC", fontsize=9)
+                y += 19
+        doc.save(os.path.join(out_dir, f"cab_{i:04d}.pdf"))
+        doc.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=None, help="Existující složka s PDF (jinak syntetický korpus)")
+    ap.add_argument("--files", type=int, default=500)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--workers", default=None, help="Čárkami oddělené počty workerů (default 1,2,4,…,cpu)")
+    ap.add_argument("--needle", default="NOTPRESENT000")
+    args = ap.parse_args()
+
+    tmp = None
+    base = args.dir
+    if not base:
+        tmp = tempfile.TemporaryDirectory()
+        base = tmp.name
+        t0 = time.perf_counter()
+        make_corpus(base, args.files, args.pages)
+        print(f"Korpus: {args.files} PDF × {args.pages} stran ({time.perf_counter() - t0:.1f}s)")
+
+    files = list(iter_pdfs(base))
+    cpu = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(x) for x in args.workers.split(",") if x.strip()]
+    else:
+        counts = sorted({1, 2, 4, 8, cpu} & set(range(1, cpu + 1)) | {1, cpu})
+
+    # zahřátí poolu (spawn workerů se do měření nepočítá)
+    if max(counts) > 1:
+        pdf_scan.PDF_SCAN_WORKERS = max(counts)
+        pdf_scan.scan_pdfs(files[:max(counts) * 2], args.needle, workers=max(counts))
+
+    base_t = None
+    for w in counts:
+        t0 = time.perf_counter()
+        pdf_scan.scan_pdfs(files, args.needle, max_pages_per_file=10_000,
+                           stop_after_matches=10**9, workers=w)
+        dt = time.perf_counter() - t0
+        base_t = base_t or dt
+        print(f"workers={w:<3} {dt:7.2f}s  {len(files) / dt:8.1f} PDF/s  speedup {base_t / dt:4.1f}×")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# scripts/build_drawing_index.py
+"""
+Inkrementální indexace textu elektro výkresů (tag/token → soubor/strana/offset).
+
+Použití:
+  python scripts/build_drawing_index.py                  # data/electrical → data/electrical_index.db
+  python scripts/build_drawing_index.py --dir X --db Y
+  python scripts/build_drawing_index.py --max-pages 300
+
+Nezměněné PDF (velikost+mtime, případně sha1) se přeskočí, smazané se z indexu odstraní.
+"""
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.services.drawing_index import (  # noqa: E402
+    DrawingIndex,
+    ELECTRICAL_DIR,
+    ELECTRICAL_INDEX_PATH,
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=ELECTRICAL_DIR, help="Kořen s PDF výkresy")
+    ap.add_argument("--db", default=ELECTRICAL_INDEX_PATH, help="Cílová SQLite DB indexu")
+    ap.add_argument("--max-pages", type=int, default=0, help="Max stran na PDF (0 = všechny)")
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"Složka neexistuje: {args.dir}", file=sys.stderr)
+        sys.exit(2)
+
+    stats = DrawingIndex(args.db).refresh(args.dir, max_pages=args.max_pages or None)
+    print(
+        f"Done. scanned={stats['scanned']} added={stats['added']} updated={stats['updated']} "
+        f"touched={stats['touched']} unchanged={stats['unchanged']} removed={stats['removed']} "
+        f"pages={stats['pages']} ({stats['elapsed_sec']}s) → {args.db}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,40 @@
 # scripts/build_io_db.py
-import csv, os, sqlite3, re
+"""
+Import I/O listu (CSV se středníky) do SQLite data/io.db.
 
-BASE = os.path.dirname(os.path.dirname(__file__))  # -> C:\Users\mr\Edmund-clone
+Použití:
+  python scripts/build_io_db.py                       # rebuild z data/IO-list/PLC4_IOList.txt
+  python scripts/build_io_db.py --src X.txt --db Y.db
+  python scripts/build_io_db.py --diff                # rebuild + report změn proti předchozímu buildu
+  python scripts/build_io_db.py --diff --dry-run      # jen report, DB se nemění
+
+Průběh:
+- CSV se čte streamem a vkládá po dávkách (executemany) do dočasné DB vedle cílové,
+- vytvoří se indexy (tag, (tag, io_type), address) a FTS5 trigram index io_fts,
+- ostatní tabulky z předchozí DB (např. fb_blocks z ingest_hwf.py) se zkopírují,
+- dočasná DB se atomicky přejmenuje na cílovou (os.replace) → čtenáři (API) nikdy
+  neuvidí rozpracovanou tabulku; read-only pool v API se při změně souboru sám přepojí.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterator, List, Set, Tuple
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SRC = os.path.join(BASE, "data", "IO-list", "PLC4_IOList.txt")
-DB  = os.path.join(BASE, "data", "io.db")
+DB = os.getenv("IO_DB_PATH", os.path.join(BASE, "data", "io.db"))
 
-os.makedirs(os.path.dirname(DB), exist_ok=True)
-con = sqlite3.connect(DB)
-cur = con.cursor()
-cur.execute("""
-CREATE TABLE IF NOT EXISTS io (
+IO_COLS = ("tag", "desc1", "desc2", "extra", "io_type", "address", "datatype", "comment")
+# klíč řádku pro diff; zbytek sloupců = "obsah"
+KEY_COLS = ("tag", "io_type", "address")
+VAL_COLS = tuple(c for c in IO_COLS if c not in KEY_COLS)
+
+SCHEMA = """
+CREATE TABLE io (
   tag      TEXT,
   desc1    TEXT,
   desc2    TEXT,
@@ -19,25 +44,196 @@ CREATE TABLE IF NOT EXISTS io (
   datatype TEXT,
   comment  TEXT
 );
-""")
-cur.execute("DELETE FROM io;")
-
-with open(SRC, "r", encoding="utf-8", errors="ignore") as f:
-    rdr = csv.reader(f, delimiter=';')
-    for row in rdr:
-        # zarovnání na 8 sloupců
-        row += [""] * (8 - len(row))
-        tag, desc1, desc2, extra, io_type, address, datatype, comment = row[:8]
-        tag = tag.strip()
-        io_type = io_type.strip()
-        address = address.strip()
-        if not tag and not io_type:
-            continue
-        cur.execute(
-            "INSERT INTO io(tag,desc1,desc2,extra,io_type,address,datatype,comment) VALUES(?,?,?,?,?,?,?,?)",
-            (tag,desc1,desc2,extra,io_type,address,datatype,comment)
-        )
-
-con.commit()
-con.close()
-print("✅ Imported into", DB)
+"""
+
+INDEXES = """
+CREATE INDEX idx_io_tag ON io(tag);
+CREATE INDEX idx_io_tag_type ON io(tag, io_type);
+CREATE INDEX idx_io_address ON io(address);
+"""
+
+# FTS5 trigram index (substring/typo vyhledávání přes tag + popisy) – external content nad io
+FTS = """
+CREATE VIRTUAL TABLE io_fts USING fts5(
+  tag, desc1, desc2, comment,
+  content='io', content_rowid='rowid',
+  tokenize='trigram'
+);
+INSERT INTO io_fts(io_fts) VALUES('rebuild');
+"""
+
+
+def read_rows(src: str) -> Iterator[Tuple[str, ...]]:
+    """Stream řádků CSV zarovnaných na 8 sloupců (prázdné řádky přeskočí)."""
+    with open(src, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        for row in csv.reader(f, delimiter=";"):
+            # zarovnání na 8 sloupců
+            row += [""] * (8 - len(row))
+            tag, desc1, desc2, extra, io_type, address, datatype, comment = row[:8]
+            tag = tag.strip()
+            io_type = io_type.strip()
+            address = address.strip()
+            if not tag and not io_type:
+                continue
+            yield (tag, desc1, desc2, extra, io_type, address, datatype, comment)
+
+
+def batched(it: Iterator[Tuple[str, ...]], size: int) -> Iterator[List[Tuple[str, ...]]]:
+    batch: List[Tuple[str, ...]] = []
+    for row in it:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _user_tables(con: sqlite3.Connection, schema: str = "main") -> List[Tuple[str, str]]:
+    """(name, sql) tabulek mimo io/io_fts* a interní sqlite_*."""
+    rows = con.execute(
+        f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'table' AND sql IS NOT NULL"
+    ).fetchall()
+    return [
+        (n, s) for n, s in rows
+        if n != "io" and not n.startswith("io_fts") and not n.startswith("sqlite_")
+    ]
+
+
+def copy_other_tables(con: sqlite3.Connection) -> List[str]:
+    """Zkopíruje z `prev` tabulky, které nepatří k I/O listu (+ jejich indexy)."""
+    copied = []
+    for name, sql in _user_tables(con, "prev"):
+        con.execute(sql)
+        con.execute(f'INSERT INTO main."{name}" SELECT * FROM prev."{name}"')
+        for (idx_sql,) in con.execute(
+            "SELECT sql FROM prev.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (name,),
+        ).fetchall():
+            con.execute(idx_sql)
+        copied.append(name)
+    return copied
+
+
+def _row_set(con: sqlite3.Connection, a: str, b: str) -> Set[Tuple[str, ...]]:
+    cols = ", ".join(f"IFNULL({c}, '')" for c in KEY_COLS + VAL_COLS)
+    sql = f"SELECT {cols} FROM {a}.io EXCEPT SELECT {cols} FROM {b}.io"
+    return set(con.execute(sql).fetchall())
+
+
+def diff(con: sqlite3.Connection) -> dict:
+    """
+    Porovná main.io (nový build) s prev.io (předchozí build).
+    Klíč řádku je (tag, io_type, address); změna = stejný klíč, jiný obsah.
+    """
+    new_only = _row_set(con, "main", "prev")
+    old_only = _row_set(con, "prev", "main")
+    k = len(KEY_COLS)
+    new_keys = {r[:k] for r in new_only}
+    old_keys = {r[:k] for r in old_only}
+    changed = sorted(new_keys & old_keys)
+    return {
+        "added": sorted(new_keys - old_keys),
+        "removed": sorted(old_keys - new_keys),
+        "changed": changed,
+    }
+
+
+def print_diff(d: dict, show: int) -> None:
+    print(f"Diff: +{len(d['added'])} přidáno, -{len(d['removed'])} odebráno, ~{len(d['changed'])} změněno")
+    for label, sign in (("added", "+"), ("removed", "-"), ("changed", "~")):
+        for key in d[label][:show]:
+            print(f"  {sign} {' | '.join(key)}")
+        if len(d[label]) > show:
+            print(f"  … a dalších {len(d[label]) - show}")
+
+
+def build(src: str, db: str, batch_size: int = 5000, do_diff: bool = False,
+          dry_run: bool = False, show: int = 20) -> None:
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(db)), exist_ok=True)
+    tmp = f"{db}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    con = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        # dočasná DB – durabilitu řeší až atomické přejmenování
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.execute("PRAGMA temp_store = MEMORY")
+        con.executescript(SCHEMA)
+
+        n = 0
+        insert = f"INSERT INTO io({','.join(IO_COLS)}) VALUES({','.join('?' * len(IO_COLS))})"
+        con.execute("BEGIN")
+        for chunk in batched(read_rows(src), batch_size):
+            con.executemany(insert, chunk)
+            n += len(chunk)
+        con.execute("COMMIT")
+
+        # indexy až po naplnění (rychlejší než průběžná údržba)
+        con.executescript(INDEXES)
+        con.executescript(FTS)
+
+        copied: List[str] = []
+        if os.path.exists(db):
+            con.execute("ATTACH DATABASE ? AS prev", (db,))
+            con.execute("BEGIN")
+            copied = copy_other_tables(con)
+            prev_has_io = con.execute(
+                "SELECT 1 FROM prev.sqlite_master WHERE type = 'table' AND name = 'io'"
+            ).fetchone()
+            if do_diff:
+                if prev_has_io:
+                    print_diff(diff(con), show)
+                else:
+                    print("Diff: předchozí DB nemá tabulku io – vše je nové.")
+            con.execute("COMMIT")
+            con.execute("DETACH DATABASE prev")
+        elif do_diff:
+            print("Diff: předchozí build neexistuje – vše je nové.")
+
+        con.execute("ANALYZE")
+    except BaseException:
+        con.close()
+        os.remove(tmp)  # rozpracovaný build nenecháváme ležet
+        raise
+    con.close()
+
+    if dry_run:
+        os.remove(tmp)
+        print(f"Dry-run: {n} řádků zpracováno, {db} beze změny ({time.perf_counter() - t0:.2f}s)")
+        return
+
+    # fsync dočasného souboru a atomická výměna
+    fd = os.open(tmp, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, db)
+
+    extra = f", přeneseno: {', '.join(copied)}" if copied else ""
+    print(f"✅ Imported {n} rows into {db} ({time.perf_counter() - t0:.2f}s{extra})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import I/O listu do SQLite (atomický rebuild).")
+    ap.add_argument("--src", default=SRC, help="CSV (;) s I/O listem")
+    ap.add_argument("--db", default=DB, help="Cílová SQLite DB")
+    ap.add_argument("--batch", type=int, default=5000, help="Velikost dávky pro executemany")
+    ap.add_argument("--diff", action="store_true", help="Vypsat přidané/odebrané/změněné řádky proti předchozí DB")
+    ap.add_argument("--dry-run", action="store_true", help="Nepřepisovat DB (typicky s --diff)")
+    ap.add_argument("--show", type=int, default=20, help="Kolik řádků diffu vypsat v každé kategorii")
+    args = ap.parse_args()
+
+    if not os.path.isfile(args.src):
+        print(f"Zdrojový soubor neexistuje: {args.src}", file=sys.stderr)
+        sys.exit(2)
+    build(args.src, args.db, batch_size=max(1, args.batch), do_diff=args.diff,
+          dry_run=args.dry_run, show=args.show)
+
+
+if __name__ == "__main__":
+    main()
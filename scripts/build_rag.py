@@ -5,18 +5,27 @@ Rebuild FAISS RAG index (semantic search) pro Edmunda.
 Použití:
   python scripts/build_rag.py \
       --out-index data/faiss.index \
-      --out-store data/store.npy \
+      --out-cols data/rag.cols \
       backend/caps/CAPABILITIES.md docs/**/*.md
 
 Poznámky:
 - Vektory normalizujeme (L2) a použijeme IndexFlatIP -> kosinová podobnost.
-- Texty ukládáme do numpy souboru (list[str]) -> kompatibilní s RagStore.
+- Texty chunků (+ zdrojový soubor) ukládáme do colstore (mmap, offsety + UTF-8 blob)
+  -> RagStore je nenačítá celé do paměti. --out-store zapíše navíc starý
+  numpy formát (pickle) pro starší nasazení.
+- BM25 index nad stejnými chunky (--out-bm25) -> hybridní / lexikální hledání.
+- Embeddingy jdou přes sdílenou službu (cache data/embed_cache.db) -> rebuild
+  platí jen za nové/změněné chunky.
+- FAISS index se zapíše do dočasného souboru a na místo (os.replace) přijde až
+  po texty a BM25 -> běžící RagStore nenačte nový index se starými texty
+  (a load() navíc ověří, že index.ntotal sedí na počet textů).
 """
 
 import os
 import sys
 import glob
 import argparse
+import tempfile
 from pathlib import Path
 
 import numpy as np
@@ -29,6 +38,13 @@ except Exception as e:
 
 from openai import OpenAI
 
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.rag import colstore  # noqa: E402
+from backend.rag.bm25 import write_bm25  # noqa: E402
+from backend.services.embeddings import get_embedding_service  # noqa: E402
+
 
 # ====== Konfigurace ======
 EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "text-embedding-3-small")
@@ -78,7 +94,9 @@ def chunk_text(text: str, max_chars: int = 1800, overlap: int = 200) -> list[str
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out-index", default="data/faiss.index")
-    ap.add_argument("--out-store", default="data/store.npy")
+    ap.add_argument("--out-cols", default="data/rag.cols", help="Texty chunků (colstore)")
+    ap.add_argument("--out-bm25", default="data/rag.bm25", help="BM25 index nad chunky (colstore)")
+    ap.add_argument("--out-store", default=None, help="Navíc starý formát store.npy (pickle)")
     ap.add_argument("inputs", nargs="+", help="Seznam souborů nebo glob patternů")
     args = ap.parse_args()
 
@@ -104,17 +122,12 @@ def main():
         print("Prázdné texty, končím.")
         sys.exit(3)
 
-    # 3) Vytvoř embeddingy
-    client = OpenAI()
-    # OpenAI API umí vzít batch -> rozdělíme po 100
-    vecs = []
-    batch = 100
-    for i in range(0, len(texts), batch):
-        sub = texts[i:i+batch]
-        resp = client.embeddings.create(model=EMBED_MODEL, input=sub)
-        vecs.extend([d.embedding for d in resp.data])
-
-    X = np.array(vecs, dtype="float32")
+    # 3) Vytvoř embeddingy (cache + dávky podle počtu a tokenů)
+    svc = get_embedding_service()
+    X = svc.embed(texts, EMBED_MODEL, client=OpenAI())
+    st = svc.stats()
+    print(f"Embedding: {st['misses']} nových, {st['db_hits']} z cache, "
+          f"{st['requests']} requestů, {st['tokens']} tokenů, ${st['cost_usd']:.4f}")
     # normalizace L2 (kosinová podobnost s IP indexem)
     faiss.normalize_L2(X)
 
@@ -124,15 +137,34 @@ def main():
 
     # 5) Ulož výsledky
     out_index = Path(args.out_index)
-    out_store = Path(args.out_store)
     out_index.parent.mkdir(parents=True, exist_ok=True)
-    out_store.parent.mkdir(parents=True, exist_ok=True)
 
-    faiss.write_index(idx, str(out_index))
-    # texts ukládáme jako numpy objektové pole -> kompatibilní s RagStore (list[str])
-    np.save(str(out_store), np.array(texts, dtype=object))
-
-    print(f"OK → {out_index} + {out_store}")
+    fd, tmp_index = tempfile.mkstemp(prefix=f".{out_index.name}.", suffix=".tmp", dir=str(out_index.parent))
+    os.close(fd)
+    try:
+        faiss.write_index(idx, tmp_index)
+        # texty + zdroj chunku -> colstore (RagStore je mapuje, nenačítá)
+        gen = colstore.write_table(args.out_cols, {"text": texts, "source": meta},
+                                   extra={"model": EMBED_MODEL, "files": len(pairs)})
+        # BM25 patří ke konkrétní generaci textů (RagStore jinak použije jen FAISS)
+        write_bm25(args.out_bm25, texts, source=gen)
+        # index až jako poslední -> ke starým textům se nový index nedostane
+        os.replace(tmp_index, out_index)
+    except BaseException:
+        try:
+            os.remove(tmp_index)
+        except OSError:
+            pass
+        raise
+    outputs = [str(out_index), args.out_cols, args.out_bm25]
+    if args.out_store:
+        out_store = Path(args.out_store)
+        out_store.parent.mkdir(parents=True, exist_ok=True)
+        # starý formát: numpy objektové pole (list[str])
+        np.save(str(out_store), np.array(texts, dtype=object))
+        outputs.append(str(out_store))
+
+    print(f"OK → {' + '.join(outputs)}")
     print(f"Model: {EMBED_MODEL}")
 
 
@@ -0,0 +1,171 @@
+# scripts/eval_ocr.py
+"""
+Srovnání OCR strategií na označeném vzorku stran P&ID (rychlost + recall tagů).
+
+Vzorek = JSONL, jeden řádek na stranu:
+  {"file": "Foo/PID-01.pdf", "page": 3, "tags": ["V101", "TT205", "91201PU001"]}
+(file relativně k PIDS_DIR nebo absolutně, page 1-index)
+
+Každá strana se rasterizuje jednou a projde:
+  - exhaustive: původní 6 průchodů (2 předzpracování × psm 6/11/4), vítězí nejdelší text,
+  - adaptive:   ocr_image_adaptive s profilem dokumentu (vítězná strategie
+                předchozích stran + jazyk detekovaný jednou na PDF).
+
+Použití:
+  python scripts/eval_ocr.py --labels data/pids/ocr_labels.jsonl
+  python scripts/eval_ocr.py --labels sample.jsonl --modes adaptive --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from pdf2image import convert_from_path  # noqa: E402
+
+from backend.rag.ocr_pipeline import (  # noqa: E402
+    TESSERACT_CONFIGS, OCRSettings, detect_langs, extract_tags, ocr_image_adaptive,
+    ocr_image_exhaustive, read_pdf_text,
+)
+
+PIDS_DIR = os.getenv("PIDS_DIR", os.path.join(ROOT, "data", "pids"))
+MODES = ("exhaustive", "adaptive")
+
+
+def load_labels(path: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            row = json.loads(line)
+            pdf = row["file"] if os.path.isabs(row["file"]) else os.path.join(PIDS_DIR, row["file"])
+            out.append({"pdf": pdf, "page": int(row["page"]),
+                        "tags": {t.upper() for t in row.get("tags", [])}})
+            if limit and len(out) >= limit:
+                break
+    # strany stejného PDF za sebou → adaptivní profil se učí jako v pipeline
+    out.sort(key=lambda r: (r["pdf"], r["page"]))
+    return out
+
+
+def _norm(tag: str) -> str:
+    return tag.upper().replace("-", "")
+
+
+def evaluate(labels: List[Dict[str, Any]], s: OCRSettings, modes: List[str]) -> Dict[str, Any]:
+    res = {m: {"pages": 0, "sec": 0.0, "passes": 0, "expected": 0, "found": 0, "extracted": 0,
+               "correct": 0, "early_stops": 0, "strategies": Counter()} for m in modes}
+    profiles: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"langs": None, "wins": Counter(), "init": False})
+
+    for row in labels:
+        pdf, page = row["pdf"], row["page"]
+        try:
+            images = convert_from_path(pdf, dpi=s.dpi, first_page=page, last_page=page, fmt="png")
+        except Exception as e:
+            print(f"[ERR] {pdf} p{page}: {e}", file=sys.stderr)
+            continue
+        if not images:
+            continue
+        im = images[0]
+        expected = {_norm(t) for t in row["tags"]}
+
+        for m in modes:
+            t0 = time.perf_counter()
+            if m == "exhaustive":
+                text, passes, early = ocr_image_exhaustive(im, s), 2 * len(TESSERACT_CONFIGS), False
+            else:
+                prof = profiles[pdf]
+                if not prof["init"]:
+                    prof["init"] = True
+                    if s.detect_lang:
+                        try:
+                            prof["langs"] = detect_langs(" ".join(read_pdf_text(pdf)), s.langs)
+                        except Exception:
+                            pass
+                prefer = prof["wins"].most_common(1)[0][0] if prof["wins"] else None
+                r = ocr_image_adaptive(im, s, prof["langs"], prefer)
+                text, passes, early = r.text, r.passes, r.early
+                if r.strategy:
+                    prof["wins"][r.strategy] += 1
+                    res[m]["strategies"][r.strategy] += 1
+                if s.detect_lang and prof["langs"] is None:
+                    prof["langs"] = detect_langs(r.text, s.langs)
+            dt = time.perf_counter() - t0
+
+            got = {_norm(t) for t in extract_tags(text)}
+            st = res[m]
+            st["pages"] += 1
+            st["sec"] += dt
+            st["passes"] += passes
+            st["early_stops"] += int(early)
+            st["expected"] += len(expected)
+            st["found"] += len(expected & got)
+            st["extracted"] += len(got)
+            st["correct"] += len(got & expected)
+
+    out: Dict[str, Any] = {}
+    for m, st in res.items():
+        n = st["pages"] or 1
+        out[m] = {
+            "pages": st["pages"],
+            "sec": round(st["sec"], 2),
+            "sec_per_page": round(st["sec"] / n, 3),
+            "passes_per_page": round(st["passes"] / n, 2),
+            "tag_recall": round(st["found"] / st["expected"], 4) if st["expected"] else None,
+            "tag_precision": round(st["correct"] / st["extracted"], 4) if st["extracted"] else None,
+            "early_stops": st["early_stops"],
+            "strategies": dict(st["strategies"]),
+        }
+    if "exhaustive" in out and "adaptive" in out and out["adaptive"]["sec"] > 0:
+        out["speedup"] = round(out["exhaustive"]["sec"] / out["adaptive"]["sec"], 2)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", default=os.path.join(PIDS_DIR, "ocr_labels.jsonl"),
+                    help="JSONL se stranami a očekávanými tagy")
+    ap.add_argument("--modes", default=",".join(MODES), help=f"Čárkami oddělené z {','.join(MODES)}")
+    ap.add_argument("--limit", type=int, default=None, help="Jen prvních N stran vzorku")
+    ap.add_argument("--min-conf", type=float, default=None, help="Přepíše PID_OCR_MIN_CONF")
+    ap.add_argument("--json", action="store_true", help="Výstup jako JSON")
+    args = ap.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for m in modes:
+        if m not in MODES:
+            ap.error(f"Neznámý režim: {m}")
+
+    s = OCRSettings.from_env()
+    if args.min_conf is not None:
+        s = replace(s, min_conf=args.min_conf)
+    labels = load_labels(args.labels, args.limit)
+    if not labels:
+        ap.error(f"Prázdný vzorek: {args.labels}")
+
+    out = evaluate(labels, s, modes)
+    if args.json:
+        print(json.dumps(out, ensure_ascii=False, indent=2))
+        return
+    print(f"Vzorek: {len(labels)} stran ({args.labels}), dpi={s.dpi}, langs={s.langs}, min_conf={s.min_conf}")
+    for m in modes:
+        r = out[m]
+        recall = "-" if r["tag_recall"] is None else f"{r['tag_recall']:.3f}"
+        precision = "-" if r["tag_precision"] is None else f"{r['tag_precision']:.3f}"
+        print(f"{m:>10}: {r['sec']:.1f}s ({r['sec_per_page']:.2f}s/str, {r['passes_per_page']} průchodů/str), "
+              f"recall tagů {recall}, precision {precision}, předčasně {r['early_stops']}")
+    if "speedup" in out:
+        print(f"Zrychlení adaptive vs exhaustive: {out['speedup']}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# scripts/eval_retrieval.py
+"""
+Srovnání režimů hledání (dense / lexical / hybrid / auto) na označené sadě dotazů.
+
+Sada = JSONL, jeden řádek na dotaz:
+  {"target": "pids", "query": "91201PU001", "relevant": ["PID-01.pdf#3", "PID-02.pdf"]}
+  {"target": "docs", "query": "jak spustit CIP sanitaci", "relevant": ["CAPABILITIES.md"]}
+target: pids = PIDRAG (relevant = název PDF, volitelně #strana),
+        docs = RagStore (relevant = zdrojový soubor chunku, stačí konec cesty).
+
+Pro každý režim: recall@k (podíl relevantních položek v top k, průměr přes
+dotazy) a latence jednoho hledání p50/p95 v ms (dense/hybrid včetně volání
+embedding API; lexical a auto pro tagy ho nevolají).
+
+Použití:
+  python scripts/eval_retrieval.py --labels data/retrieval_labels.jsonl
+  python scripts/eval_retrieval.py --labels q.jsonl --modes lexical,hybrid --k 1,5 --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.rag.bm25 import MODES  # noqa: E402
+
+DEFAULT_LABELS = os.path.join(ROOT, "data", "retrieval_labels.jsonl")
+
+
+def load_labels(path: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            row = json.loads(line)
+            target = row.get("target", "pids")
+            if target not in ("pids", "docs"):
+                raise ValueError(f"Neznámý target: {target}")
+            out.append({"target": target, "query": row["query"], "relevant": list(row.get("relevant", []))})
+            if limit and len(out) >= limit:
+                break
+    return out
+
+
+def _pid_key(rel: str) -> Tuple[str, Optional[int]]:
+    name, _, page = rel.partition("#")
+    return os.path.basename(name).lower(), int(page) if page else None
+
+
+def _matched_pids(relevant: List[str], hits: List[Dict[str, Any]]) -> Set[str]:
+    got = [(h["file"].lower(), int(h["page"])) for h in hits]
+    found = set()
+    for rel in relevant:
+        name, page = _pid_key(rel)
+        if any(f == name and (page is None or p == page) for f, p in got):
+            found.add(rel)
+    return found
+
+
+def _matched_docs(relevant: List[str], sources: List[str]) -> Set[str]:
+    norm = [s.replace("\\", "/").lower() for s in sources]
+    return {rel for rel in relevant if any(s.endswith(rel.replace("\\", "/").lower()) for s in norm)}
+
+
+def _backends(targets: Set[str]):
+    pid_rag = store = None
+    if "pids" in targets:
+        from backend.rag.pid_rag import PIDRAG
+        pid_rag = PIDRAG()
+        pid_rag._lazy_load()        # načtení indexu nezapočítat do latence
+    if "docs" in targets:
+        from openai import OpenAI
+        from backend.services.rag import RagStore
+        store = RagStore(OpenAI())
+        if not store.load():
+            print("[WARN] RagStore: index nenačten, dotazy 'docs' budou prázdné", file=sys.stderr)
+    return pid_rag, store
+
+
+def evaluate(labels: List[Dict[str, Any]], modes: List[str], ks: List[int]) -> Dict[str, Any]:
+    pid_rag, store = _backends({q["target"] for q in labels})
+    kmax = max(ks)
+    out: Dict[str, Any] = {}
+    for m in modes:
+        recall = {k: [] for k in ks}
+        lat: List[float] = []
+        used: Dict[str, int] = {}
+        for q in labels:
+            t0 = time.perf_counter()
+            if q["target"] == "pids":
+                hits = pid_rag.search(q["query"], kmax, mode=m)
+                used_mode = hits[0]["mode"] if hits else None
+            else:
+                used_mode, rows = store.search_rows(q["query"], kmax, mode=m)
+                hits = [store.sources[r] if len(store.sources) else "" for r, _ in rows]
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            if used_mode:
+                used[used_mode] = used.get(used_mode, 0) + 1
+            if not q["relevant"]:
+                continue
+            for k in ks:
+                if q["target"] == "pids":
+                    found = _matched_pids(q["relevant"], hits[:k])
+                else:
+                    found = _matched_docs(q["relevant"], hits[:k])
+                recall[k].append(len(found) / len(q["relevant"]))
+        out[m] = {
+            "queries": len(labels),
+            **{f"recall@{k}": round(float(np.mean(v)), 4) if v else None for k, v in recall.items()},
+            "p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "used": used,
+        }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", default=DEFAULT_LABELS, help="JSONL s dotazy a relevantními výsledky")
+    ap.add_argument("--modes", default=",".join(MODES), help=f"Čárkami oddělené z {','.join(MODES)}")
+    ap.add_argument("--k", default="1,5,10", help="Hodnoty k pro recall@k")
+    ap.add_argument("--limit", type=int, default=None, help="Jen prvních N dotazů")
+    ap.add_argument("--json", action="store_true", help="Výstup jako JSON")
+    args = ap.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for m in modes:
+        if m not in MODES:
+            ap.error(f"Neznámý režim: {m}")
+    try:
+        ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+    except ValueError:
+        ap.error(f"Neplatné --k: {args.k}")
+    if not ks or ks[0] <= 0:
+        ap.error("--k musí být kladná čísla")
+    labels = load_labels(args.labels, args.limit)
+    if not labels:
+        ap.error(f"Prázdná sada: {args.labels}")
+
+    out = evaluate(labels, modes, ks)
+    if args.json:
+        print(json.dumps(out, ensure_ascii=False, indent=2))
+        return
+    print(f"Sada: {len(labels)} dotazů ({args.labels})")
+    for m in modes:
+        r = out[m]
+        recalls = ", ".join(
+            f"R@{k} {'-' if r[f'recall@{k}'] is None else format(r[f'recall@{k}'], '.3f')}" for k in ks)
+        used = ", ".join(f"{u} {n}" for u, n in sorted(r["used"].items()))
+        print(f"{m:>8}: {recalls}; p50 {r['p50_ms']:.1f} ms, p95 {r['p95_ms']:.1f} ms"
+              + (f" (použito: {used})" if used else ""))
+
+
+if __name__ == "__main__":
+    main()
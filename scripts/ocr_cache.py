@@ -0,0 +1,41 @@
+# scripts/ocr_cache.py
+"""
+Správa OCR cache P&ID stran (backend/rag/ocr_cache.py).
+
+Použití:
+  python scripts/ocr_cache.py stats
+  python scripts/ocr_cache.py purge                    # vše
+  python scripts/ocr_cache.py purge --unused-days 90   # jen dlouho nepoužité
+  python scripts/ocr_cache.py --db data/pids/ocr_cache.db stats
+"""
+
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.rag.ocr_cache import PID_OCR_CACHE_PATH, OCRCache  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=PID_OCR_CACHE_PATH, help="Cesta k ocr_cache.db (env PID_OCR_CACHE_PATH)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    p = sub.add_parser("purge")
+    p.add_argument("--unused-days", type=float, default=None)
+    args = ap.parse_args()
+
+    cache = OCRCache(args.db)
+    if args.cmd == "stats":
+        print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+    else:
+        n = cache.purge(args.unused_days)
+        print(f"Smazáno {n} záznamů z {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,281 @@
-# scripts/prerender_previews.py
-import os, sys
-from typing import Optional
-import fitz  # PyMuPDF
+# scripts/prerender_preview.py
+"""
+Předrenderování statických JPG náhledů výkresů (data/electrical → data/previews).
+
+- strany se rozdělí na úseky (CHUNK_PAGES) a renderují v ProcessPoolExecutor,
+- manifest data/previews/manifest.json (sha1, počet stran, měřítko, kvalita
+  pro každou variantu) → nezměněné PDF se přeskočí, u doplněných stran se
+  renderují jen nové,
+- náhledy smazaných PDF a stran, které v PDF ubyly, se odstraní,
+- volitelně více rozlišení v jednom průchodu: thumb / standard / hidpi
+  (standard = původní pojmenování Doc_pNNNN.jpg),
+- zápis přes dočasný soubor + os.replace (API nikdy neservíruje rozepsaný JPG),
+- PDF, jehož render selže nebo nedoběhne (přerušení), vypadne z manifestu a jeho
+  už zapsané náhledy se smažou → na disku nezůstanou osiřelé JPG.
+
+Použití:
+  python scripts/prerender_preview.py
+  python scripts/prerender_preview.py --variants thumb,standard,hidpi --workers 8
+  python scripts/prerender_preview.py --force            # vše znovu
+  python scripts/prerender_preview.py --dry-run          # jen vypiš plán
+
+Env (zpětně kompatibilní): PREVIEW_SCALE, PREVIEW_JPG_QUALITY, PREVIEW_MAX_PAGES,
+PREVIEW_VARIANTS, PREVIEW_WORKERS.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-ELEC = os.path.join(ROOT, "data", "electrical")
-OUT  = os.path.join(ROOT, "data", "previews")
+sys.path.insert(0, ROOT)
+
+from backend.services.drawing_index import iter_pdfs, rel_path, sha1_file  # noqa: E402
+from backend.services.pdf_text import pdf_page_count  # noqa: E402
+from backend.services.previews import (  # noqa: E402
+    ELECTRICAL_DIR, MANIFEST_VERSION, PREVIEW_MANIFEST, PREVIEWS_DIR, VARIANTS, preview_rel_path,
+)
+
+CHUNK_PAGES = 16
+
+Spec = Dict[str, Tuple[float, int]]  # varianta → (měřítko, kvalita)
+Task = Tuple[str, str, int, int, Spec]  # (abs pdf, rel pdf, start, stop, varianty)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".prerender.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def render_chunk(pdf: str, rel: str, start: int, stop: int, spec: Spec) -> int:
+    """Worker: strany [start, stop) ve všech variantách; vrací počet stran."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf) as doc:
+        stop = min(stop, len(doc))
+        for p in range(start, stop):
+            pg = doc.load_page(p)
+            for variant, (scale, quality) in spec.items():
+                pix = pg.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+                _atomic_write(os.path.join(PREVIEWS_DIR, preview_rel_path(rel, p, variant)),
+                              pix.tobytes("jpeg", jpg_quality=quality))
+    return max(0, stop - start)
+
+
+def remove_pages(rel: str, variant: str, start: int, stop: int) -> int:
+    n = 0
+    for p in range(start, stop):
+        try:
+            os.remove(os.path.join(PREVIEWS_DIR, preview_rel_path(rel, p, variant)))
+            n += 1
+        except OSError:
+            pass
+    return n
+
+
+def discard_outputs(rel: str, *entries: Optional[Dict[str, Any]]) -> int:
+    """Smaže všechny náhledy PDF podle záznamů manifestu (nový plán i předchozí stav)."""
+    upto: Dict[str, int] = {}
+    for entry in entries:
+        for v, meta in ((entry or {}).get("variants") or {}).items():
+            upto[v] = max(upto.get(v, 0), meta.get("rendered", 0))
+    return sum(remove_pages(rel, v, 0, n) for v, n in upto.items())
+
+
+def load_manifest() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(PREVIEW_MANIFEST, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {}) if data.get("version") == MANIFEST_VERSION else {}
 
-def out_path_for(pdf_rel: str, page: int) -> str:
+
+def save_manifest(files: Dict[str, Dict[str, Any]]) -> None:
+    data = {"version": MANIFEST_VERSION, "generated_at": time.time(), "files": files}
+    _atomic_write(PREVIEW_MANIFEST, json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8"))
+
+
+def plan(base: str, manifest: Dict[str, Dict[str, Any]], spec: Spec,
+         max_pages: Optional[int], force: bool, stats: Dict[str, int],
+         dry_run: bool = False) -> Tuple[List[Task], Dict[str, Dict[str, Any]]]:
     """
-    data/electrical/Foo/Doc.pdf + page -> data/previews/Foo/Doc_p0001.jpg
+    Porovná PDF pod `base` s manifestem: vrátí úlohy k renderu a nové záznamy
+    manifestu (zapíšou se až po úspěšném renderu). Úklid dělá rovnou
+    (při dry_run jen počítá, co by smazal).
     """
-    rel_no_root = os.path.relpath(pdf_rel, os.path.join(ROOT, "data", "electrical"))
-    base, _ = os.path.splitext(rel_no_root)
-    out_rel = os.path.join(OUT, base + f"_p{page:04d}.jpg")
-    os.makedirs(os.path.dirname(out_rel), exist_ok=True)
-    return out_rel
-
-def render_pdf(pdf_path: str, scale: float = 2.0, quality: int = 85,
-               max_pages: Optional[int] = None) -> int:
-    doc = fitz.open(pdf_path)
-    pages = range(1, min(len(doc), max_pages) + 1) if max_pages else range(1, len(doc) + 1)
-    cnt = 0
-    for p in pages:
-        pg = doc.load_page(p - 1)
-        pix = pg.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
-        outp = out_path_for(pdf_path, p)
-        # ulož JPEG
-        pix.save(outp, jpg_quality=quality)
-        cnt += 1
-    doc.close()
-    return cnt
+    def remove(rel: str, variant: str, start: int, stop: int) -> int:
+        return max(0, stop - start) if dry_run else remove_pages(rel, variant, start, stop)
+
+    tasks: List[Task] = []
+    pending: Dict[str, Dict[str, Any]] = {}
+    base_rel = rel_path(base)
+    seen = set()
+
+    for pdf in iter_pdfs(base):
+        rel = rel_path(pdf)
+        seen.add(rel)
+        stats["pdfs"] += 1
+        try:
+            st = os.stat(pdf)
+        except OSError:
+            continue
+        prev = manifest.get(rel) or {}
+        if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            sha, pages = prev["sha1"], prev["pages"]
+        else:
+            sha, pages = sha1_file(pdf), pdf_page_count(pdf)
+        same = not force and prev.get("sha1") == sha
+        want = min(pages, max_pages) if max_pages else pages
+
+        entry = {"sha1": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                 "pages": pages, "variants": {}}
+        prev_variants = prev.get("variants", {})
+
+        # varianty, které se tentokrát nerenderují: při stejném obsahu ponechat
+        for v, meta in prev_variants.items():
+            if v in spec:
+                continue
+            if same:
+                keep = min(meta.get("rendered", 0), want)
+                stats["removed"] += remove(rel, v, keep, meta.get("rendered", 0))
+                entry["variants"][v] = dict(meta, rendered=keep)
+            else:
+                stats["removed"] += remove(rel, v, 0, meta.get("rendered", 0))
+
+        # požadované varianty → rozsah stran k renderu (start..want)
+        ranges: Dict[int, Spec] = {}
+        for v, (scale, quality) in spec.items():
+            meta = prev_variants.get(v) or {}
+            done = meta.get("rendered", 0)
+            if done > want:
+                # PDF se zkrátilo (nebo nižší --max-pages) → smaž přebývající strany
+                stats["removed"] += remove(rel, v, want, done)
+            start = min(done, want) if same and (meta.get("scale"), meta.get("quality")) == (scale, quality) else 0
+            entry["variants"][v] = {"scale": scale, "quality": quality, "rendered": want}
+            if start < want:
+                ranges.setdefault(start, {})[v] = (scale, quality)
+
+        if not ranges:
+            stats["skipped"] += 1
+            manifest[rel] = entry
+            continue
+        pending[rel] = entry
+        for start, sub in sorted(ranges.items()):
+            for s in range(start, want, CHUNK_PAGES):
+                tasks.append((pdf, rel, s, min(want, s + CHUNK_PAGES), sub))
+
+    # smazané PDF (jen pod aktuální `base`)
+    for rel in list(manifest):
+        under = base_rel in (".", "") or rel.startswith(base_rel + "/")
+        if under and rel not in seen:
+            for v, meta in manifest[rel].get("variants", {}).items():
+                stats["removed"] += remove(rel, v, 0, meta.get("rendered", 0))
+            del manifest[rel]
+            stats["deleted_pdfs"] += 1
+    return tasks, pending
+
 
 def main():
-    scale = float(os.getenv("PREVIEW_SCALE", "2.0"))
-    quality = int(os.getenv("PREVIEW_JPG_QUALITY", "85"))
-    max_pages = int(os.getenv("PREVIEW_MAX_PAGES", "0")) or None
-
-    total = 0
-    for root, _, files in os.walk(ELEC):
-        for fn in files:
-            if fn.lower().endswith(".pdf"):
-                pdf = os.path.join(root, fn)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=ELECTRICAL_DIR, help="Složka s PDF (default data/electrical)")
+    ap.add_argument("--variants", default=os.getenv("PREVIEW_VARIANTS", "standard"),
+                    help=f"Čárkami oddělené varianty z {','.join(VARIANTS)}")
+    ap.add_argument("--scale", type=float, default=float(os.getenv("PREVIEW_SCALE", VARIANTS["standard"]["scale"])),
+                    help="Měřítko varianty standard")
+    ap.add_argument("--quality", type=int, default=int(os.getenv("PREVIEW_JPG_QUALITY", VARIANTS["standard"]["quality"])),
+                    help="JPEG kvalita varianty standard")
+    ap.add_argument("--max-pages", type=int, default=int(os.getenv("PREVIEW_MAX_PAGES", "0")) or None)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("PREVIEW_WORKERS", "0")) or (os.cpu_count() or 1))
+    ap.add_argument("--force", action="store_true", help="Ignorovat manifest a vše vyrenderovat znovu")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    spec: Spec = {}
+    for v in [x.strip() for x in args.variants.split(",") if x.strip()]:
+        if v not in VARIANTS:
+            ap.error(f"Neznámá varianta: {v}")
+        if v == "standard":
+            spec[v] = (args.scale, args.quality)
+        else:
+            spec[v] = (VARIANTS[v]["scale"], VARIANTS[v]["quality"])
+
+    t0 = time.perf_counter()
+    manifest = load_manifest()
+    stats = {"pdfs": 0, "skipped": 0, "rendered_pages": 0, "removed": 0, "deleted_pdfs": 0, "errors": 0}
+    tasks, pending = plan(os.path.abspath(args.dir), manifest, spec, args.max_pages, args.force,
+                          stats, args.dry_run)
+    n_pages = sum(t[3] - t[2] for t in tasks)
+    print(f"PDF: {stats['pdfs']} (beze změny {stats['skipped']}, k renderu {len(pending)}), "
+          f"stran k renderu: {n_pages}, úloh: {len(tasks)}, varianty: {','.join(spec)}")
+    if args.dry_run:
+        print(f"[dry-run] k odstranění: {stats['removed']} náhledů, smazaných PDF: {stats['deleted_pdfs']}")
+        return
+
+    left = {rel: 0 for rel in pending}
+    for t in tasks:
+        left[t[1]] += 1
+    failed = set()
+
+    def _done(rel: str, pages: int, err: Optional[BaseException]) -> None:
+        if err is not None:
+            stats["errors"] += 1
+            if rel not in failed:
+                failed.add(rel)
+                print(f"[ERR] {rel}: {err}", file=sys.stderr)
+        stats["rendered_pages"] += pages
+        left[rel] -= 1
+        if left[rel] == 0:
+            if rel in failed:
+                # rozpracované PDF z manifestu vyřadíme i s náhledy (API se vrátí k dynamickému náhledu)
+                stats["removed"] += discard_outputs(rel, pending[rel], manifest.pop(rel, None))
+            else:
+                manifest[rel] = pending[rel]
+                print(f"[OK] {rel} -> {pending[rel]['pages']} pages")
+
+    try:
+        if args.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as ex:
+                futs = {ex.submit(render_chunk, *t): t for t in tasks}
+                for fut in as_completed(futs):
+                    t = futs[fut]
+                    try:
+                        _done(t[1], fut.result(), None)
+                    except Exception as e:
+                        _done(t[1], 0, e)
+        else:
+            for t in tasks:
                 try:
-                    done = render_pdf(pdf, scale=scale, quality=quality, max_pages=max_pages)
-                    print(f"[OK] {pdf} -> {done} pages")
-                    total += done
+                    _done(t[1], render_chunk(*t), None)
                 except Exception as e:
-                    print(f"[ERR] {pdf}: {e}", file=sys.stderr)
-    print(f"Done. Rendered {total} pages to {OUT}")
+                    _done(t[1], 0, e)
+    finally:
+        # po přerušení: nedokončená PDF pryč, hotová se uloží
+        for rel, n in left.items():
+            if n > 0:
+                stats["removed"] += discard_outputs(rel, pending[rel], manifest.pop(rel, None))
+        save_manifest(manifest)
+
+    dt = time.perf_counter() - t0
+    rate = stats["rendered_pages"] / dt if dt > 0 else 0.0
+    print(f"Done. {stats['rendered_pages']} stran za {dt:.1f}s ({rate:.1f} stran/s, workers={args.workers}); "
+          f"odstraněno {stats['removed']} náhledů, smazaných PDF {stats['deleted_pdfs']}, chyb {stats['errors']} → {PREVIEWS_DIR}")
+
 
 if __name__ == "__main__":
     main()